@@ -0,0 +1,360 @@
+"""Performance benchmarks for the mood tracker.
+
+Generates deterministic synthetic journals and times the main operations,
+headless through MoodRepository and, when a display is available (or Xvfb
+can be started), through MoodTrackerApp itself. Results are printed as JSON
+so runs can be compared between versions:
+
+    python benchmark_mood_tracker.py --sizes 10000 100000 --output bench.json
+    python benchmark_mood_tracker.py --compare old.json bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import mood_io
+import mood_sentiment
+import mood_snapshot
+import mood_sync
+from mood_repository import MoodRepository, TIMESTAMP_FORMAT, tombstone_token
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+# Same long entry as test_database_with_longer_entries
+LONG_TEXT = ("This is a longer mood entry that would require word wrapping to display properly. "
+             "I'm feeling a mix of emotions today - happy about my accomplishments, but also a bit "
+             "anxious about upcoming deadlines. The weather is nice though, which helps improve my mood.")
+
+MOODS = ("happy", "tired", "anxious", "calm", "excited", "sad", "grateful", "stressed",
+         "content", "restless", "hopeful", "frustrated", "relaxed", "lonely", "proud")
+CONTEXTS = ("after work", "this morning", "with friends", "before the meeting", "at the gym",
+            "on the bus", "after a long walk", "with family", "about deadlines", "at home")
+
+# Share of generated entries that use LONG_TEXT
+LONG_ENTRY_RATIO = 0.1
+
+# Hashtags added to generated entries, and the share of entries that get each one
+TAGS = ("work", "family", "sleep", "exercise", "friends", "health", "travel", "reading")
+TAG_RATIO = 0.15
+
+# Saves in quick succession timed by gui.save_mood_burst
+SAVE_BURST = 20
+
+
+def generate_journal(count, seed=0, start=datetime(2015, 1, 1, 7, 0, 0)):
+    """Yield count deterministic (mood_text, timestamp, created_at) rows, oldest first"""
+    rng = random.Random(seed)
+    # Tags come from their own generator, so the texts are the same as without tags
+    tag_rng = random.Random(seed + 1)
+    when = start
+    for _ in range(count):
+        when += timedelta(seconds=rng.randint(600, 6 * 3600))
+        if rng.random() < LONG_ENTRY_RATIO:
+            text = LONG_TEXT
+        else:
+            words = [f"Feeling {rng.choice(MOODS)} {rng.choice(CONTEXTS)}"]
+            words += rng.choices(MOODS, k=rng.randint(0, 6))
+            text = " ".join(words)
+        tags = [f"#{tag}" for tag in TAGS if tag_rng.random() < TAG_RATIO]
+        if tags:
+            text = " ".join([text, *tags])
+        yield (text, when.strftime(TIMESTAMP_FORMAT), int(when.timestamp()))
+
+
+def build_journal(path, count, seed=0):
+    """Create a database file at path filled with a synthetic journal"""
+    with MoodRepository(path) as repo:
+        rows = generate_journal(count, seed)
+        while True:
+            chunk = [row for _, row in zip(range(mood_io.IMPORT_CHUNK_SIZE), rows)]
+            if not chunk:
+                break
+            repo.add_entries(chunk)
+
+
+def timed(func, repeat=1):
+    """Return the median wall-clock seconds of calling func repeat times"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+class Results:
+    """Collects benchmark timings"""
+
+    def __init__(self):
+        self.results = []
+
+    def add(self, case, size, seconds, **extra):
+        self.results.append({'case': case, 'size': size, 'seconds': round(seconds, 6), **extra})
+        print(f"  {case:<32} {size:>9}  {seconds * 1000:10.2f} ms", file=sys.stderr)
+
+
+def bench_repository(results, size, work_dir):
+    """Time the headless data-access operations"""
+    path = os.path.join(work_dir, f"journal_{size}.db")
+    results.add('generate_and_bulk_insert', size, timed(lambda: build_journal(path, size)))
+
+    with MoodRepository(path) as repo:
+        # Bulk inserts are not scored, so this scores the whole journal
+        def score_all():
+            while repo.score_entries():
+                pass
+        results.add('repo.score_entries', size, timed(score_all))
+
+        # The same for the hashtags, which the tag filter reads from the index
+        def tag_all():
+            while repo.tag_entries():
+                pass
+        results.add('repo.tag_entries', size, timed(tag_all))
+
+        results.add('repo.add_entry', size,
+                    timed(lambda: repo.add_entry("Quick benchmark entry"), repeat=20))
+        results.add('repo.count', size, timed(repo.count, repeat=5))
+        results.add('repo.newest_entries', size, timed(lambda: repo.newest_entries(40), repeat=20))
+
+        def page_through(pages=50):
+            page = repo.newest_entries(40)
+            for _ in range(pages):
+                page = repo.entries_before(page[-1], 40) or page
+        results.add('repo.page_50_pages', size, timed(page_through, repeat=3))
+
+        results.add('repo.search', size, timed(lambda: repo.search("anxious walk"), repeat=5))
+        results.add('repo.tag_counts', size, timed(repo.tag_counts, repeat=20))
+        results.add('repo.count_tag', size, timed(lambda: repo.count(tags=["work"]), repeat=5))
+        results.add('repo.newest_tagged', size,
+                    timed(lambda: repo.newest_entries(40, tags=["work"]), repeat=20))
+        for match_all, case in ((True, 'repo.newest_tagged_all'),
+                                (False, 'repo.newest_tagged_any')):
+            results.add(case, size, timed(lambda: repo.newest_entries(
+                40, tags=["work", "sleep"], match_all=match_all), repeat=5))
+        results.add('repo.stats_summary', size, timed(repo.stats_summary, repeat=5))
+
+        ids = [entry[0] for entry in repo.newest_entries(100)]
+        repo.set_sync_value(mood_sync.EXPORTED_KEY, str(repo.last_change()))
+        results.add('repo.delete_entries_100', size, timed(lambda: repo.delete_entries(ids)))
+        delta_path = os.path.join(work_dir, "changes.delta.gz")
+        results.add('sync.export_100_changes', size,
+                    timed(lambda: mood_sync.export_changes(repo, delta_path)))
+        os.remove(delta_path)
+
+        export_path = os.path.join(work_dir, "export.jsonl")
+        results.add('export_jsonl', size, timed(lambda: mood_io.export_file(repo, export_path)))
+        os.remove(export_path)
+
+        results.add('repo.delete_all', size, timed(repo.delete_all))
+
+        def purge_and_vacuum():
+            while repo.purge_deleted(tombstone_token(), 1000) == 1000:
+                pass
+            repo.incremental_vacuum(10 ** 9)
+        results.add('repo.purge_and_vacuum', size, timed(purge_and_vacuum))
+    return path
+
+
+def start_virtual_display():
+    """Start Xvfb when there is no display, returning the process or None"""
+    if os.environ.get('DISPLAY') or sys.platform in ('win32', 'darwin'):
+        return None
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        return None
+    display = ':%d' % (90 + os.getpid() % 100)
+    process = subprocess.Popen([xvfb, display, '-screen', '0', '1280x1024x24'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ['DISPLAY'] = display
+    return process
+
+
+def bench_gui(results, size, work_dir):
+    """Time the GUI operations of MoodTrackerApp against a synthetic journal"""
+    import tkinter as tk
+    from tkinter import messagebox
+    from mood_tracker import MoodTrackerApp
+
+    path = os.path.join(work_dir, f"gui_{size}.db")
+    build_journal(path, size)
+
+    # The app keeps its config next to the working directory
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    root = tk.Tk()
+    try:
+        app = MoodTrackerApp(root, db_path=path)
+        root.protocol("WM_DELETE_WINDOW", app.on_closing)
+
+        def settle():
+            """Process events until the database worker is idle"""
+            root.update()
+            while app.db_worker.busy_for() is not None:
+                time.sleep(0.001)
+                root.update()
+            app.db_worker.poll()
+            root.update()
+
+        settle()
+
+        def save():
+            app.mood_entry.insert("1.0", "Benchmark entry written through the GUI")
+            app.save_mood()
+            settle()
+        results.add('gui.save_mood', size, timed(save, repeat=10))
+
+        def save_burst():
+            # Saves in quick succession, committed together
+            for i in range(SAVE_BURST):
+                app.mood_entry.insert("1.0", f"Burst entry {i} written through the GUI")
+                app.save_mood()
+            app.flush_pending()
+            settle()
+        results.add('gui.save_mood_burst', size, timed(save_burst, repeat=5), saves=SAVE_BURST)
+
+        def load():
+            app.load_mood_entries()
+            settle()
+        results.add('gui.load_mood_entries', size, timed(load, repeat=5))
+
+        def delete():
+            app.mood_listbox.selection_clear(0, tk.END)
+            app.mood_listbox.selection_set(0)
+            app.delete_selected()
+            settle()
+        results.add('gui.delete_selected', size, timed(delete, repeat=10))
+
+        widths = iter([900, 500] * 10)
+
+        def resize():
+            root.geometry(f"{next(widths)}x600")
+            root.update_idletasks()
+            app.relayout_entries(visible_only=True)
+            settle()
+        results.add('gui.relayout_on_resize', size, timed(resize, repeat=10))
+
+        def clear_all():
+            ask = messagebox.askyesno
+            messagebox.askyesno = lambda *args, **kwargs: True
+            try:
+                app.clear_all()
+                settle()
+            finally:
+                messagebox.askyesno = ask
+        results.add('gui.clear_all', size, timed(clear_all))
+
+        app.on_closing()
+
+        # Start without a snapshot, which writes one on close, then again with it
+        build_journal(path, size)
+        snapshot = os.path.join(work_dir, mood_snapshot.SNAPSHOT_FILE)
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+        for case in ('gui.startup', 'gui.startup_from_snapshot'):
+            root = tk.Tk()
+            app = MoodTrackerApp(root, db_path=path)
+            settle()
+            timings = app.startup_timings
+            results.add(case, size, timings['interactive'] / 1000,
+                        first_paint=timings['first_paint'] / 1000)
+            app.on_closing()
+    finally:
+        os.chdir(previous_dir)
+        try:
+            root.destroy()
+        except tk.TclError:
+            pass
+
+
+def git_revision():
+    """Return the short git revision of the working tree, if available"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(sizes, gui=True):
+    """Run every benchmark and return the JSON report as a dict"""
+    results = Results()
+    display = start_virtual_display() if gui else None
+    gui_available = gui and (bool(os.environ.get('DISPLAY')) or sys.platform in ('win32', 'darwin'))
+    try:
+        with tempfile.TemporaryDirectory(prefix='mood_bench_') as work_dir:
+            for size in sizes:
+                print(f"Journal of {size} entries", file=sys.stderr)
+                bench_repository(results, size, work_dir)
+                if gui_available:
+                    bench_gui(results, size, work_dir)
+    finally:
+        if display is not None:
+            display.terminate()
+
+    return {
+        'revision': git_revision(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': getattr(mood_sentiment.load_numpy(), '__version__', None),
+        'platform': platform.platform(),
+        'gui': gui_available,
+        'results': results.results,
+    }
+
+
+def compare(old_path, new_path, threshold=0.2):
+    """Print cases that got slower than threshold, returning how many regressed"""
+    with open(old_path) as f:
+        old = {(r['case'], r['size']): r['seconds'] for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {(r['case'], r['size']): r['seconds'] for r in json.load(f)['results']}
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before if before else 0.0
+        flag = "REGRESSION" if change > threshold else ""
+        regressions += bool(flag)
+        print(f"{key[0]:<32} {key[1]:>9} {before * 1000:10.2f} -> {after * 1000:10.2f} ms "
+              f"{change:+7.1%} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mood tracker benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="journal sizes to benchmark (default: %(default)s)")
+    parser.add_argument("--no-gui", action="store_true", help="skip the GUI benchmarks")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two JSON reports and flag regressions")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare) else 0
+
+    report = run(args.sizes, gui=not args.no_gui)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Background thread that owns the database connection.
+
+SQLite connections can only be used from the thread that opened them, so the
+worker opens the repository itself and runs every job on its own thread.
+Results are queued and handed back by poll(), which the GUI calls from the
+Tk main loop via root.after, so callbacks always run on the Tk thread.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+
+class JobCancelled(Exception):
+    """Raised into a job's error callback when it was cancelled while running"""
+
+
+class Job:
+    """A unit of database work submitted to the worker"""
+
+    def __init__(self, func, on_success=None, on_error=None, cancellable=True, description="",
+                 background=False):
+        self.func = func
+        self.on_success = on_success
+        self.on_error = on_error
+        self.cancellable = cancellable
+        self.description = description
+        self.background = background
+        self.cancelled = False
+
+
+class DatabaseWorker:
+    """Runs func(repository) jobs one at a time on a dedicated thread"""
+
+    def __init__(self, open_repository):
+        self._open_repository = open_repository
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._running = None
+        self._repo = None
+        self._busy_since = None
+        # Optional mood_metrics.Metrics that records how long each job took
+        self.metrics = None
+        self._thread = threading.Thread(target=self._run, name="mood-db-worker", daemon=True)
+
+    def start(self):
+        """Start the worker thread"""
+        self._thread.start()
+        return self
+
+    def submit(self, func, on_success=None, on_error=None, cancellable=True, description="",
+               background=False):
+        """Queue func(repository) to run on the worker thread and return its Job
+
+        Background jobs, such as maintenance, do not make the worker busy.
+        """
+        job = Job(func, on_success, on_error, cancellable, description, background)
+        with self._lock:
+            self._pending.append(job)
+            if self._busy_since is None and not background:
+                self._busy_since = time.monotonic()
+        self._requests.put(job)
+        return job
+
+    def cancel(self, job):
+        """Cancel a job, interrupting its SQL if it is already running"""
+        with self._lock:
+            if not job.cancellable or job.cancelled:
+                return False
+            job.cancelled = True
+            if job is self._running and self._repo is not None:
+                self._repo.conn.interrupt()
+        return True
+
+    def cancel_all(self):
+        """Cancel every cancellable job that has not finished, returning how many"""
+        with self._lock:
+            jobs = list(self._pending)
+        return sum(1 for job in jobs if self.cancel(job))
+
+    def busy_for(self):
+        """Return for how many seconds foreground jobs have been outstanding, or None when idle"""
+        with self._lock:
+            if self._busy_since is None:
+                return None
+            return time.monotonic() - self._busy_since
+
+    def running_description(self):
+        """Return the description of the job currently running"""
+        with self._lock:
+            return self._running.description if self._running else ""
+
+    def poll(self):
+        """Run callbacks for finished jobs on the calling thread
+
+        A job that ran to completion gets on_success even if it was cancelled
+        meanwhile, since its work is done; only jobs that never started or
+        were interrupted report JobCancelled.
+        """
+        while True:
+            try:
+                job, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            callback = job.on_success if ok else job.on_error
+            if callback is not None:
+                callback(value)
+
+    def stop(self, timeout=None):
+        """Finish the queued jobs, close the repository and stop the thread"""
+        if self._thread.is_alive():
+            self._requests.put(None)
+            self._thread.join(timeout)
+        self.poll()
+
+    def _run(self):
+        open_error = None
+        try:
+            self._repo = self._open_repository()
+        except Exception as e:
+            open_error = e
+
+        while True:
+            job = self._requests.get()
+            if job is None:
+                break
+            with self._lock:
+                self._running = job
+                cancelled = job.cancelled
+            started = time.perf_counter()
+            if cancelled:
+                result = (job, False, JobCancelled(job.description))
+            elif open_error is not None:
+                result = (job, False, open_error)
+            else:
+                try:
+                    result = (job, True, job.func(self._repo))
+                except sqlite3.OperationalError as e:
+                    if job.cancelled:
+                        e = JobCancelled(job.description)
+                    result = (job, False, e)
+                except Exception as e:
+                    result = (job, False, e)
+            metrics = self.metrics
+            if metrics is not None:
+                # Recorded before the result is queued, so callbacks see the job's queries
+                metrics.job_finished(job.description, time.perf_counter() - started, result[1])
+            with self._lock:
+                self._running = None
+                self._pending.remove(job)
+                if all(pending.background for pending in self._pending):
+                    self._busy_since = None
+            self._results.put(result)
+
+        if self._repo is not None:
+            self._repo.close()
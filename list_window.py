@@ -0,0 +1,134 @@
+def line_ids(entry_id, line_count, separated):
+    """Return the entry id of each of an entry's listbox lines
+
+    With separated, the last line is the blank separator after a wrapped
+    entry, which does not belong to any entry and maps to None.
+    """
+    if separated:
+        return [entry_id] * (line_count - 1) + [None]
+    return [entry_id] * line_count
+
+
+class ListWindow:
+    """Entries loaded into the history list, newest first, and the lines they take
+
+    Keeps the bookkeeping of the paged listbox without touching tkinter:
+    each method returns the lines to insert or the line ranges to delete,
+    and the caller applies them to the widget.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = []
+        self.line_counts = []
+        # Entry id for every listbox line (None for separator lines)
+        self.line_ids = []
+        # Whether older or newer entries exist beyond the loaded ones
+        self.has_older = False
+        self.has_newer = False
+
+    def clear(self):
+        self.entries = []
+        self.line_counts = []
+        self.line_ids = []
+        self.has_older = False
+        self.has_newer = False
+
+    def append(self, entries, lines_for, separated):
+        """Add older entries at the bottom
+
+        lines_for(entry) returns the display lines of an entry. Returns the
+        lines to insert at the end and how many lines to delete from the
+        top, as the newest entries are dropped once there are more than
+        max_entries.
+        """
+        added = []
+        for entry in entries:
+            lines = lines_for(entry)
+            added.extend(lines)
+            self.entries.append(entry)
+            self.line_counts.append(len(lines))
+            self.line_ids.extend(line_ids(entry[0], len(lines), separated))
+
+        removed = 0
+        excess = len(self.entries) - self.max_entries
+        if excess > 0:
+            removed = sum(self.line_counts[:excess])
+            del self.entries[:excess]
+            del self.line_counts[:excess]
+            del self.line_ids[:removed]
+            self.has_newer = True
+        return added, removed
+
+    def prepend(self, entries, lines_for, separated):
+        """Add newer entries at the top
+
+        Returns the lines to insert at the top and how many lines to delete
+        from the bottom, as the oldest entries are dropped once there are
+        more than max_entries.
+        """
+        added = []
+        counts = []
+        ids = []
+        for entry in entries:
+            lines = lines_for(entry)
+            added.extend(lines)
+            counts.append(len(lines))
+            ids.extend(line_ids(entry[0], len(lines), separated))
+        self.entries[0:0] = entries
+        self.line_counts[0:0] = counts
+        self.line_ids[0:0] = ids
+
+        removed = 0
+        excess = len(self.entries) - self.max_entries
+        if excess > 0:
+            removed = sum(self.line_counts[-excess:])
+            del self.entries[-excess:]
+            del self.line_counts[-excess:]
+            del self.line_ids[-removed:]
+            self.has_older = True
+        return added, removed
+
+    def remove(self, position):
+        """Forget the entry at position and return the (start, end) range of its lines"""
+        start = sum(self.line_counts[:position])
+        end = start + self.line_counts[position]
+        del self.entries[position]
+        del self.line_counts[position]
+        del self.line_ids[start:end]
+        return start, end
+
+    def positions_of(self, entry_ids):
+        """Return the positions of the loaded entries among entry_ids, top first"""
+        return [position for position, entry in enumerate(self.entries) if entry[0] in entry_ids]
+
+    def ids_at(self, lines):
+        """Return the ids of the entries shown on the given line indices"""
+        ids = {self.line_ids[line] for line in lines}
+        ids.discard(None)
+        return ids
+
+    def position_at(self, line):
+        """Return the position of the entry shown on line, or 0 past the last one"""
+        start = 0
+        for position, count in enumerate(self.line_counts):
+            if start + count > line:
+                return position
+            start += count
+        return 0
+
+    def line_of(self, position):
+        """Return the index of the first line of the entry at position"""
+        return sum(self.line_counts[:position])
+
+    def replace(self, entries):
+        """Swap loaded entries for new versions, by the id they are shown under
+
+        entries maps the old id to the new entry, e.g. once an entry shown
+        under its placeholder id is committed. Its lines get the new id.
+        """
+        if not entries:
+            return
+        self.entries = [entries.get(entry[0], entry) for entry in self.entries]
+        ids = {old_id: entry[0] for old_id, entry in entries.items()}
+        self.line_ids = [ids.get(entry_id, entry_id) for entry_id in self.line_ids]
@@ -0,0 +1,137 @@
+"""Load test for the mood tracker JSON API.
+
+Runs many concurrent clients against a server, each sending requests over
+one keep-alive connection, and reports throughput, latency percentiles and
+how many commits the server needed for the entries it saved. By default a
+local instance is started on a temporary database:
+
+    python load_test_mood_server.py --requests 5000 --concurrency 50
+    python load_test_mood_server.py --batch-size 1     # one commit per entry, for comparison
+    python load_test_mood_server.py --url http://127.0.0.1:8765 --token secret
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import mood_server
+
+# Share of requests that read the newest entries instead of saving one
+READ_RATIO = 0.2
+
+
+async def request(reader, writer, method, path, payload=None, token=None):
+    """Send one request on a keep-alive connection and return (status, JSON body)"""
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    if payload is not None:
+        head += "Content-Type: application/json\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write((head + "\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, count, token, latencies, failures):
+    """Send count requests one after another over a single connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(count):
+            start = time.perf_counter()
+            if i % round(1 / READ_RATIO) == 0:
+                status, _ = await request(reader, writer, 'GET', '/moods?limit=20', token=token)
+            else:
+                status, _ = await request(reader, writer, 'POST', '/moods',
+                                          {'mood_text': f"Load test entry {i}"}, token)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                failures.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def load_test(host, port, requests=2000, concurrency=50, token=None):
+    """Run the load and return a report dict"""
+    latencies, failures = [], []
+    per_client = max(1, requests // concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, per_client, token, latencies, failures)
+                           for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, health = await request(reader, writer, 'GET', '/health', token=token)
+    writer.close()
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'failures': len(failures),
+        'seconds': round(seconds, 3),
+        'requests_per_second': round(len(latencies) / seconds, 1),
+        'latency_ms': {
+            'median': round(statistics.median(latencies) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+        },
+        'entries_written': health['entries_written'],
+        'commits': health['commits'],
+        'largest_batch': health['largest_batch'],
+    }
+
+
+async def run_local(requests, concurrency, batch_size):
+    """Start a server on a temporary database, load it and shut it down"""
+    with tempfile.TemporaryDirectory(prefix='mood_load_') as work_dir:
+        server = mood_server.MoodServer(os.path.join(work_dir, 'load.db'), port=0,
+                                        batch_size=batch_size)
+        await server.start()
+        try:
+            return await load_test(server.host, server.port, requests, concurrency)
+        finally:
+            await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mood tracker API load test")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="total requests (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=50,
+                        help="concurrent connections (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=mood_server.BATCH_SIZE,
+                        help="entries per commit of the local server (default: %(default)s)")
+    parser.add_argument("--url", help="load a running server instead of starting one")
+    parser.add_argument("--token", help="token of the running server")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        url = urlsplit(args.url)
+        report = asyncio.run(load_test(url.hostname, url.port or 80, args.requests,
+                                       args.concurrency, args.token))
+    else:
+        report = asyncio.run(run_local(args.requests, args.concurrency, args.batch_size))
+    print(json.dumps(report, indent=2))
+    return 1 if report['failures'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
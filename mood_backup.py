@@ -0,0 +1,174 @@
+"""Online backups of the mood tracker database.
+
+Snapshots are taken with sqlite3's backup API through a separate read-only
+connection, copying BACKUP_STEP_PAGES pages at a time with a short sleep in
+between, so the app can keep reading and writing while a backup runs. Every
+snapshot must pass PRAGMA quick_check before it replaces the .partial file it
+was written to, and only the newest snapshots are kept.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+import mood_schema
+
+BACKUP_DIR_SUFFIX = '_backups'
+SNAPSHOT_PREFIX = 'mood_tracker-'
+SNAPSHOT_SUFFIX = '.db'
+SNAPSHOT_TIME_FORMAT = '%Y%m%d-%H%M%S-%f'
+
+# Snapshots kept by rotation
+KEEP_BACKUPS = 7
+
+# Pages copied per backup step and the pause between steps
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.005
+
+
+class BackupCancelled(Exception):
+    """Raised when a backup is stopped before it completes"""
+
+
+def default_backup_dir(db_path=mood_schema.DB_PATH):
+    """Return the backup directory that sits next to a database file"""
+    root, _ = os.path.splitext(os.path.abspath(db_path))
+    return root + BACKUP_DIR_SUFFIX
+
+
+def list_backups(backup_dir):
+    """Return the snapshot paths in backup_dir, newest first"""
+    try:
+        names = os.listdir(backup_dir)
+    except FileNotFoundError:
+        return []
+    snapshots = [name for name in names
+                 if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)]
+    return [os.path.join(backup_dir, name) for name in sorted(snapshots, reverse=True)]
+
+
+def last_modified(db_path):
+    """Return when a database or its write-ahead log was last written"""
+    times = [os.path.getmtime(db_path)]
+    wal_path = db_path + '-wal'
+    # Opening a database, even read-only, can leave an empty log behind
+    if os.path.exists(wal_path) and os.path.getsize(wal_path):
+        times.append(os.path.getmtime(wal_path))
+    return max(times)
+
+
+def snapshot_time(path):
+    """Return when a snapshot was taken, from its file name"""
+    stamp = os.path.basename(path)[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+    return datetime.strptime(stamp, SNAPSHOT_TIME_FORMAT)
+
+
+def backup_age(db_path, backup_dir=None):
+    """Return the seconds since the newest snapshot was taken, or None without one"""
+    snapshots = list_backups(backup_dir or default_backup_dir(db_path))
+    if not snapshots:
+        return None
+    return (datetime.now() - snapshot_time(snapshots[0])).total_seconds()
+
+
+def quick_check(conn):
+    """Raise sqlite3.DatabaseError unless PRAGMA quick_check reports ok"""
+    problems = [row[0] for row in conn.execute("PRAGMA quick_check")]
+    if problems != ['ok']:
+        raise sqlite3.DatabaseError("Integrity check failed: " + "; ".join(problems[:5]))
+
+
+def copy_database(source, target, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP,
+                  should_stop=None):
+    """Copy the source connection into target in steps of pages"""
+    def progress(status, remaining, total):
+        if should_stop is not None and should_stop():
+            raise BackupCancelled("Backup cancelled")
+
+    source.backup(target, pages=pages, progress=progress, sleep=sleep)
+
+
+def create_backup(db_path=mood_schema.DB_PATH, backup_dir=None, keep=KEEP_BACKUPS, force=False,
+                  pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP, should_stop=None):
+    """Snapshot a database into backup_dir and rotate old snapshots
+
+    Returns the path of the new snapshot, or None if the database has not
+    changed since the newest snapshot (unless force is set).
+    """
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"No database at {db_path}")
+    modified = last_modified(db_path)
+    snapshots = list_backups(backup_dir)
+    if snapshots and not force and os.path.getmtime(snapshots[0]) >= modified:
+        return None
+
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"{SNAPSHOT_PREFIX}{datetime.now().strftime(SNAPSHOT_TIME_FORMAT)}{SNAPSHOT_SUFFIX}"
+    path = os.path.join(backup_dir, name)
+    partial = path + '.partial'
+
+    # A read-only connection never checkpoints the app's write-ahead log
+    source = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    target = sqlite3.connect(partial)
+    try:
+        copy_database(source, target, pages, sleep, should_stop)
+        # Snapshots are single self-contained files
+        target.execute("PRAGMA journal_mode = DELETE")
+        quick_check(target)
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    target.close()
+
+    os.replace(partial, path)
+    # Remember which version of the database the snapshot holds
+    os.utime(path, (modified, modified))
+    for old in list_backups(backup_dir)[keep:]:
+        os.remove(old)
+    return path
+
+
+def backup_if_due(db_path=mood_schema.DB_PATH, interval=24 * 3600, backup_dir=None,
+                  keep=KEEP_BACKUPS, should_stop=None):
+    """Take a snapshot if the newest one is at least interval seconds old
+
+    Returns the path of the new snapshot, or None if none was needed.
+    """
+    age = backup_age(db_path, backup_dir)
+    if age is not None and age < interval:
+        return None
+    return create_backup(db_path, backup_dir, keep, should_stop=should_stop)
+
+
+def restore_backup(backup_path, db_path=mood_schema.DB_PATH, pages=BACKUP_STEP_PAGES,
+                   sleep=BACKUP_STEP_SLEEP):
+    """Replace the contents of a database with a snapshot
+
+    The snapshot is checked before anything is written, and the current
+    database is snapshotted first so the restore itself can be undone.
+    Returns the path of that safety snapshot, if one was taken.
+    """
+    source = sqlite3.connect(f"file:{os.path.abspath(backup_path)}?mode=ro", uri=True)
+    try:
+        quick_check(source)
+        safety = None
+        if os.path.exists(db_path):
+            # Kept next to the snapshot, without rotating any snapshot away
+            backup_dir = os.path.dirname(os.path.abspath(backup_path))
+            safety = create_backup(db_path, backup_dir, keep=len(list_backups(backup_dir)) + 1,
+                                   force=True, pages=pages, sleep=sleep)
+        # Copying into a live connection keeps other connections consistent
+        target = sqlite3.connect(db_path)
+        try:
+            copy_database(source, target, pages, sleep)
+            mood_schema.configure_connection(target)
+            # Snapshots from older versions are upgraded like any other database
+            mood_schema.migrate(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return safety
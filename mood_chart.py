@@ -0,0 +1,295 @@
+"""Mood trend chart drawn on a tk.Canvas.
+
+The chart shows the number of entries per day and the average sentiment of
+the days with scored entries. Only the visible date range is read, from the
+daily rollup tables, so a query costs one row per day whatever the number
+of entries. Series with more days than the canvas has pixel columns are
+downsampled before drawing:
+
+- entry counts go into min/max buckets of one column each, so busy and empty
+  days stay visible;
+- the sentiment line uses Largest-Triangle-Three-Buckets (LTTB), which keeps
+  its shape with a few hundred points.
+
+Each series is then a single canvas line item.
+
+The mouse wheel zooms around the pointer and dragging pans. Both redraw at
+once from the days already loaded and re-query the visible range after a
+short pause.
+"""
+import math
+import tkinter as tk
+from datetime import date
+
+
+def lttb(points, threshold):
+    """Downsample (x, y) points, sorted by x, to threshold points with LTTB
+
+    The first and last points are always kept. In between, the points are
+    split into threshold - 2 buckets, and from each the point that forms
+    the largest triangle with the point kept before it and the average of
+    the next bucket is kept.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+    buckets = threshold - 2
+    sampled = [points[0]]
+    kept_x, kept_y = points[0]
+    for bucket in range(buckets):
+        start = 1 + bucket * (count - 2) // buckets
+        end = 1 + (bucket + 1) * (count - 2) // buckets
+        next_end = 1 + (bucket + 2) * (count - 2) // buckets if bucket + 1 < buckets else count
+        next_points = points[end:next_end]
+        average_x = sum(x for x, _ in next_points) / len(next_points)
+        average_y = sum(y for _, y in next_points) / len(next_points)
+
+        best, best_area = None, -1.0
+        for point in points[start:end]:
+            x, y = point
+            # Twice the triangle area, which ranks the same
+            area = abs((kept_x - average_x) * (y - kept_y) - (kept_x - x) * (average_y - kept_y))
+            if area > best_area:
+                best, best_area = point, area
+        sampled.append(best)
+        kept_x, kept_y = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def min_max_buckets(values, buckets):
+    """Split values into at most buckets runs and return (first index, last index, min, max) of each"""
+    count = len(values)
+    buckets = min(buckets, count)
+    if buckets < 1:
+        return []
+    result = []
+    for bucket in range(buckets):
+        start = bucket * count // buckets
+        end = (bucket + 1) * count // buckets
+        run = values[start:end]
+        result.append((start, end - 1, min(run), max(run)))
+    return result
+
+
+class TrendChart:
+    """Entries per day and average mood over a date range, with zoom and pan"""
+
+    # Shortest and default visible ranges
+    MIN_SPAN_DAYS = 14
+    DEFAULT_SPAN_DAYS = 365
+    # Pause in zooming or panning after which the visible range is read
+    REQUERY_DELAY_MS = 150
+    # Scale of the visible range per mouse wheel step
+    ZOOM_STEP = 1.25
+    # Space around the plots for labels, in pixels
+    MARGIN_LEFT = 44
+    MARGIN_RIGHT = 12
+    MARGIN_TOP = 20
+    MARGIN_BOTTOM = 22
+    PLOT_GAP = 24
+
+    def __init__(self, parent, load, theme):
+        """Create the canvas in parent
+
+        load(start_day, end_day, on_loaded) must read daily_trend() rows for
+        two ISO dates and pass them to on_loaded on the Tk thread.
+        """
+        self.load = load
+        self.theme = theme
+        self.canvas = tk.Canvas(parent, width=560, height=320, highlightthickness=0,
+                                bg=theme['bg'])
+        # First and last day with entries, as ordinals, None while there are none
+        self.first = None
+        self.last = None
+        # Visible range: first ordinal (fractional while panning) and length in days
+        self.start = 0.0
+        self.span = float(self.DEFAULT_SPAN_DAYS)
+        # ordinal -> (entry count, average sentiment or None) of the loaded range
+        self.days = {}
+        self.loaded = (0, -1)
+        # Results of older queries are dropped
+        self.generation = 0
+        self._requery_request = None
+        self._drag_x = None
+
+        self.canvas.bind("<Configure>", lambda event: self.draw())
+        self.canvas.bind("<MouseWheel>", lambda event: self.zoom(event.x, event.delta < 0))
+        self.canvas.bind("<Button-4>", lambda event: self.zoom(event.x, False))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom(event.x, True))
+        self.canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_drag_end)
+
+    def set_theme(self, theme):
+        """Redraw with the colors of a theme"""
+        self.theme = theme
+        self.canvas.configure(bg=theme['bg'])
+        self.draw()
+
+    def set_range(self, first_day, last_day):
+        """Set the days with entries, ISO dates or None, and reload the visible range
+
+        The first call shows the last DEFAULT_SPAN_DAYS days. Later calls, after
+        entries changed, keep the visible range where possible.
+        """
+        if first_day is None:
+            self.first = self.last = None
+            self.days = {}
+            self.draw()
+            return
+        initial = self.first is None
+        self.first = date.fromisoformat(first_day).toordinal()
+        self.last = date.fromisoformat(last_day).toordinal()
+        if initial:
+            self.span = float(self.DEFAULT_SPAN_DAYS)
+            self.start = self.last + 1 - self.span
+        self.clamp_view()
+        self.draw()
+        self.requery()
+
+    def full_span(self):
+        """Return the widest visible range, in days"""
+        return float(max(self.last - self.first + 1, self.MIN_SPAN_DAYS))
+
+    def clamp_view(self):
+        """Keep the visible range within the history"""
+        self.span = min(max(self.span, self.MIN_SPAN_DAYS), self.full_span())
+        self.start = min(max(self.start, self.first), self.first + self.full_span() - self.span)
+
+    def visible_days(self):
+        """Return the first and last ordinal that are at least partly visible"""
+        return math.floor(self.start), math.ceil(self.start + self.span) - 1
+
+    def plot_width(self):
+        return max(self.canvas.winfo_width() - self.MARGIN_LEFT - self.MARGIN_RIGHT, 1)
+
+    # Zoom and pan
+
+    def zoom(self, x, zoom_out):
+        """Zoom in or out one step, keeping the day under x in place"""
+        if self.first is None:
+            return
+        fraction = min(max((x - self.MARGIN_LEFT) / self.plot_width(), 0.0), 1.0)
+        pointer = self.start + fraction * self.span
+        self.span *= self.ZOOM_STEP if zoom_out else 1 / self.ZOOM_STEP
+        self.clamp_view()
+        self.start = pointer - fraction * self.span
+        self.clamp_view()
+        self.draw()
+        self.schedule_requery()
+
+    def on_drag_start(self, event):
+        self._drag_x = event.x
+
+    def on_drag(self, event):
+        if self.first is None or self._drag_x is None:
+            return
+        self.start -= (event.x - self._drag_x) / self.plot_width() * self.span
+        self._drag_x = event.x
+        self.clamp_view()
+        self.draw()
+        self.schedule_requery()
+
+    def on_drag_end(self, event):
+        self._drag_x = None
+
+    def schedule_requery(self):
+        """Read the visible range once zooming or panning pauses"""
+        if self._requery_request is not None:
+            self.canvas.after_cancel(self._requery_request)
+        self._requery_request = self.canvas.after(self.REQUERY_DELAY_MS, self.requery)
+
+    def requery(self):
+        """Read the rows of the visible range"""
+        self._requery_request = None
+        self.generation += 1
+        generation = self.generation
+        first, last = self.visible_days()
+
+        def on_loaded(rows):
+            if generation == self.generation:
+                self.show(first, last, rows)
+
+        self.load(date.fromordinal(first).isoformat(), date.fromordinal(last).isoformat(),
+                  on_loaded)
+
+    def show(self, first, last, rows):
+        """Replace the loaded days with the daily_trend() rows of first..last and redraw"""
+        if not self.canvas.winfo_exists():
+            # The window was closed while the rows were loading
+            return
+        self.days = {date.fromisoformat(day).toordinal(): (count, sentiment)
+                     for day, count, sentiment in rows}
+        self.loaded = (first, last)
+        self.draw()
+
+    # Drawing
+
+    def draw(self):
+        """Redraw both plots from the loaded days"""
+        canvas = self.canvas
+        canvas.delete(tk.ALL)
+        theme = self.theme
+        width = canvas.winfo_width()
+        height = canvas.winfo_height()
+        if self.first is None:
+            canvas.create_text(width / 2, height / 2, text="No entries yet", fill=theme['fg'])
+            return
+
+        left = self.MARGIN_LEFT
+        right = left + self.plot_width()
+        plot_height = max((height - self.MARGIN_TOP - self.MARGIN_BOTTOM - self.PLOT_GAP) / 2, 1)
+        counts_top = self.MARGIN_TOP
+        counts_bottom = counts_top + plot_height
+        mood_top = counts_bottom + self.PLOT_GAP
+        mood_bottom = mood_top + plot_height
+        scale = (right - left) / self.span
+
+        def x_of(ordinal):
+            # Centre of the day's column
+            return left + (ordinal + 0.5 - self.start) * scale
+
+        first, last = self.visible_days()
+        first = max(first, self.loaded[0])
+        last = min(last, self.loaded[1])
+        ordinals = range(first, last + 1)
+
+        # Entries per day: the min and max of each pixel column, as one line
+        counts = [self.days.get(ordinal, (0, None))[0] for ordinal in ordinals]
+        busiest = max(counts, default=0) or 1
+        coords = []
+        for start, end, low, high in min_max_buckets(counts, round(right - left)):
+            x = x_of(first + (start + end) / 2)
+            coords += (x, counts_bottom - low / busiest * plot_height,
+                       x, counts_bottom - high / busiest * plot_height)
+        canvas.create_line(left, counts_bottom, right, counts_bottom, fill=theme['chart_grid'])
+        if len(coords) >= 4:
+            canvas.create_line(*coords, fill=theme['chart_entries'])
+        canvas.create_text(left, counts_top - 4, text="Entries per day", anchor=tk.SW,
+                           fill=theme['fg'])
+        canvas.create_text(left - 4, counts_top, text=str(busiest), anchor=tk.NE, fill=theme['fg'])
+        canvas.create_text(left - 4, counts_bottom, text="0", anchor=tk.E, fill=theme['fg'])
+
+        # Average mood between -1 and 1, downsampled with LTTB
+        middle = (mood_top + mood_bottom) / 2
+        points = [(ordinal, self.days[ordinal][1]) for ordinal in ordinals
+                  if ordinal in self.days and self.days[ordinal][1] is not None]
+        coords = []
+        for ordinal, sentiment in lttb(points, round(right - left) // 2):
+            coords += (x_of(ordinal), middle - sentiment * plot_height / 2)
+        canvas.create_line(left, middle, right, middle, fill=theme['chart_grid'], dash=(2, 2))
+        if len(coords) >= 4:
+            canvas.create_line(*coords, fill=theme['chart_mood'])
+        elif coords:
+            x, y = coords
+            canvas.create_oval(x - 2, y - 2, x + 2, y + 2, fill=theme['chart_mood'], outline="")
+        canvas.create_text(left, mood_top - 4, text="Average mood", anchor=tk.SW, fill=theme['fg'])
+        for value, y in (("+1", mood_top), ("0", middle), ("-1", mood_bottom)):
+            canvas.create_text(left - 4, y, text=value, anchor=tk.E, fill=theme['fg'])
+
+        # Dates of the visible range
+        start, end = self.visible_days()
+        for ordinal, x, anchor in ((start, left, tk.NW), (end, right, tk.NE)):
+            label = date.fromordinal(max(ordinal, 1)).isoformat()
+            canvas.create_text(x, mood_bottom + 4, text=label, anchor=anchor, fill=theme['fg'])
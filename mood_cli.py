@@ -0,0 +1,330 @@
+"""Command-line access to the mood tracker database.
+
+Starts without tkinter so it is quick enough for terminals and cron jobs.
+Usage:
+    python mood_cli.py add "Feeling rested after a long walk"
+    python mood_cli.py list --since 7d
+    python mood_cli.py count --since 2024-01-01
+    python mood_cli.py import journal.csv
+    python mood_cli.py export backup.jsonl
+    python mood_cli.py backup
+    python mood_cli.py restore latest
+    python mood_cli.py sync-export laptop.delta.gz
+    python mood_cli.py sync-export --to phone laptop-to-phone.delta.gz
+    python mood_cli.py sync-apply desktop.delta.gz
+    python mood_cli.py serve --port 8765
+    python mood_cli.py score
+    python mood_cli.py archive --older-than 365
+    python mood_cli.py years
+    python mood_cli.py tags --limit 20
+
+Only sqlite3 is imported up front; everything else is imported by the
+command that needs it.
+"""
+import argparse
+import sqlite3
+import sys
+
+import mood_schema
+
+# Wall-clock budget for starting the CLI and running a simple command
+COLD_START_BUDGET_SECONDS = 0.5
+
+SINCE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_since(value):
+    """Convert '7d'/'12h'/'30m'/'2w' or a local date/time into epoch seconds"""
+    import time
+    from datetime import datetime
+
+    value = value.strip()
+    unit = SINCE_UNITS.get(value[-1:].lower())
+    if unit is not None and value[:-1].isdigit():
+        return int(time.time()) - int(value[:-1]) * unit
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid --since value '{value}', use e.g. 7d, 12h or 2024-01-31"
+        )
+
+
+def positive_int(value):
+    """Convert a count such as --chunk-size, which must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            f"invalid value '{value}', expected a whole number of 1 or more"
+        )
+    return number
+
+
+def open_repository(args):
+    from mood_repository import MoodRepository
+    return MoodRepository(args.db)
+
+
+def cmd_add(args):
+    text = " ".join(args.text).strip()
+    if not text:
+        raise ValueError("Please enter your mood before saving.")
+    with open_repository(args) as repo:
+        entry = repo.add_entry(text)
+    print(f"Mood saved at {entry[2]}")
+
+
+def cmd_list(args):
+    with open_repository(args) as repo:
+        since = args.since if args.since is not None else -2 ** 63
+        for _, mood_text, timestamp, _ in repo.iter_entries_since(since, args.limit):
+            print(f"{timestamp} - {mood_text}")
+
+
+def cmd_count(args):
+    with open_repository(args) as repo:
+        print(repo.count(args.since))
+
+
+def cmd_import(args):
+    import mood_io
+
+    with open_repository(args) as repo:
+        imported = mood_io.import_file(repo, args.path, args.format, args.chunk_size)
+    print(f"Imported {imported} entries from {args.path}")
+
+
+def cmd_export(args):
+    import mood_io
+
+    with open_repository(args) as repo:
+        exported = mood_io.export_file(repo, args.path, args.format)
+    print(f"Exported {exported} entries to {args.path}")
+
+
+def cmd_backup(args):
+    import mood_backup
+
+    path = mood_backup.create_backup(args.db, args.dir, args.keep, force=args.force)
+    if path is None:
+        print("No changes since the last backup")
+    else:
+        print(f"Backup saved to {path}")
+
+
+def cmd_backups(args):
+    import mood_backup
+
+    backup_dir = args.dir or mood_backup.default_backup_dir(args.db)
+    for path in mood_backup.list_backups(backup_dir):
+        print(f"{mood_backup.snapshot_time(path):%Y-%m-%d %H:%M:%S} - {path}")
+
+
+def cmd_restore(args):
+    import mood_backup
+
+    path = args.path
+    if path == "latest":
+        snapshots = mood_backup.list_backups(args.dir or mood_backup.default_backup_dir(args.db))
+        if not snapshots:
+            raise ValueError("There are no backups to restore")
+        path = snapshots[0]
+    safety = mood_backup.restore_backup(path, args.db)
+    print(f"Restored {args.db} from {path}")
+    if safety is not None:
+        print(f"The previous database was saved to {safety}")
+
+
+def cmd_sync_export(args):
+    import mood_sync
+
+    with open_repository(args) as repo:
+        count, until = mood_sync.export_changes(repo, args.path, 0 if args.all else None,
+                                                args.to)
+    print(f"Exported {count} changes to {args.path} (up to change {until})")
+
+
+def cmd_sync_apply(args):
+    import mood_sync
+
+    with open_repository(args) as repo:
+        applied, skipped = mood_sync.apply_delta(repo, args.path)
+    print(f"Applied {applied} changes from {args.path}, {skipped} were already up to date")
+
+
+def cmd_serve(args):
+    import asyncio
+    import mood_server
+
+    server = mood_server.MoodServer(args.db, args.host, args.port, args.token)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def cmd_score(args):
+    with open_repository(args) as repo:
+        scored = 0
+        while True:
+            batch = repo.score_entries()
+            if not batch:
+                break
+            scored += batch
+    print(f"Scored the sentiment of {scored} entries")
+
+
+def cmd_archive(args):
+    import time
+
+    older_than = int(time.time()) - args.older_than * 86400
+    with open_repository(args) as repo:
+        archived = 0
+        while True:
+            batch = repo.archive_entries(older_than)
+            if not batch:
+                break
+            archived += batch
+        # Give the pages of the moved entries back to the file system
+        while repo.incremental_vacuum():
+            pass
+    print(f"Archived {archived} entries older than {args.older_than} days")
+
+
+def cmd_years(args):
+    with open_repository(args) as repo:
+        for year, entries, length, sentiment, words in repo.year_summaries(args.workers):
+            mood = "unscored" if sentiment is None else f"mood {sentiment:+.2f}"
+            print(f"{year}: {entries} entries, {length:.0f} characters on average, {mood}, "
+                  f"top words: {', '.join(words) or '-'}")
+
+
+def cmd_tags(args):
+    with open_repository(args) as repo:
+        # Index the hashtags of entries added in bulk or synced first
+        while repo.tag_entries():
+            pass
+        for name, count in repo.tag_counts(args.limit):
+            print(f"#{name}: {count}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="mood_cli", description="Mood tracker command line")
+    parser.add_argument("--db", default=mood_schema.DB_PATH,
+                        help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="save a mood entry")
+    add_parser.add_argument("text", nargs="+")
+    add_parser.set_defaults(func=cmd_add)
+
+    list_parser = commands.add_parser("list", help="print entries, newest first")
+    list_parser.add_argument("--since", type=parse_since,
+                             help="only entries since a date or age, e.g. 2024-01-31 or 7d")
+    list_parser.add_argument("--limit", type=int, default=-1,
+                             help="maximum number of entries (default: all)")
+    list_parser.set_defaults(func=cmd_list)
+
+    count_parser = commands.add_parser("count", help="print the number of entries")
+    count_parser.add_argument("--since", type=parse_since,
+                              help="only entries since a date or age, e.g. 2024-01-31 or 7d")
+    count_parser.set_defaults(func=cmd_count)
+
+    import_parser = commands.add_parser("import", help="import entries from CSV or JSONL")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"),
+                               help="file format (default: from the file extension)")
+    import_parser.add_argument("--chunk-size", type=positive_int, default=10000,
+                               help="rows per transaction (default: %(default)s)")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = commands.add_parser("export", help="export all entries to CSV or JSONL")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"),
+                               help="file format (default: from the file extension)")
+    export_parser.set_defaults(func=cmd_export)
+
+    backup_parser = commands.add_parser("backup", help="snapshot the database")
+    backup_parser.add_argument("--dir", help="backup directory (default: next to the database)")
+    backup_parser.add_argument("--keep", type=positive_int, default=7,
+                               help="snapshots to keep (default: %(default)s)")
+    backup_parser.add_argument("--force", action="store_true",
+                               help="back up even if nothing changed since the last backup")
+    backup_parser.set_defaults(func=cmd_backup)
+
+    backups_parser = commands.add_parser("backups", help="list snapshots, newest first")
+    backups_parser.add_argument("--dir", help="backup directory (default: next to the database)")
+    backups_parser.set_defaults(func=cmd_backups)
+
+    restore_parser = commands.add_parser("restore", help="replace the database with a snapshot")
+    restore_parser.add_argument("path", help="snapshot file, or 'latest'")
+    restore_parser.add_argument("--dir", help="backup directory (default: next to the database)")
+    restore_parser.set_defaults(func=cmd_restore)
+
+    sync_export_parser = commands.add_parser(
+        "sync-export", help="write the changes since the last sync export to a delta file")
+    sync_export_parser.add_argument("path", help="delta file, compressed if it ends in .gz")
+    sync_export_parser.add_argument("--all", action="store_true",
+                                    help="export every entry, not just the new changes")
+    sync_export_parser.add_argument("--to", metavar="NAME",
+                                    help="computer the delta is for; each one gets its own "
+                                         "export position (needed with more than two computers)")
+    sync_export_parser.set_defaults(func=cmd_sync_export)
+
+    sync_apply_parser = commands.add_parser(
+        "sync-apply", help="merge a delta file from another copy of the journal")
+    sync_apply_parser.add_argument("path")
+    sync_apply_parser.set_defaults(func=cmd_sync_apply)
+
+    serve_parser = commands.add_parser("serve", help="serve the JSON API over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1",
+                              help="address to listen on, e.g. 0.0.0.0 for the LAN "
+                                   "(default: %(default)s)")
+    serve_parser.add_argument("--port", type=int, default=8765,
+                              help="port to listen on (default: %(default)s)")
+    serve_parser.add_argument("--token", help="require 'Authorization: Bearer TOKEN'")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    score_parser = commands.add_parser(
+        "score", help="score the sentiment of entries that have no score from the current lexicon")
+    score_parser.set_defaults(func=cmd_score)
+
+    archive_parser = commands.add_parser(
+        "archive", help="move old entries into per-year archive files next to the database")
+    archive_parser.add_argument("--older-than", type=int, default=365, metavar="DAYS",
+                                help="archive entries older than this (default: %(default)s)")
+    archive_parser.set_defaults(func=cmd_archive)
+
+    years_parser = commands.add_parser(
+        "years", help="summarize every year, reading the archives in parallel")
+    years_parser.add_argument("--workers", type=positive_int,
+                              help="worker processes (default: one per CPU)")
+    years_parser.set_defaults(func=cmd_years)
+
+    tags_parser = commands.add_parser("tags", help="print hashtags with their entry counts")
+    tags_parser.add_argument("--limit", type=int, default=-1,
+                             help="print at most this many, most used first")
+    tags_parser.set_defaults(func=cmd_tags)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        # Output was piped into e.g. head, which stopped reading
+        import os
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
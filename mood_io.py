@@ -0,0 +1,146 @@
+"""Streaming import and export of mood entries as CSV or JSON Lines.
+
+Readers and writers work one row at a time, so memory use stays constant no
+matter how large the file or the database is.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+from mood_repository import make_timestamp
+
+FORMATS = ('csv', 'jsonl')
+
+# Rows inserted per transaction during import
+IMPORT_CHUNK_SIZE = 10000
+
+FIELDS = ('mood_text', 'timestamp', 'created_at')
+
+
+def detect_format(path, fmt=None):
+    """Return the file format from an explicit name or the file extension"""
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        fmt = 'jsonl' if extension in ('jsonl', 'ndjson', 'json') else extension
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def parse_timestamp(timestamp, record):
+    """Return the (display text, epoch seconds) pair of an imported ISO 8601 timestamp
+
+    Timestamps with a UTC offset are shown in local time, like the others.
+    """
+    try:
+        when = datetime.fromisoformat(timestamp.strip())
+    except ValueError:
+        raise ValueError(f"Invalid timestamp {timestamp!r} in record: {record!r}") from None
+    if when.tzinfo is not None:
+        when = when.astimezone()
+    return make_timestamp(when)
+
+
+def parse_created_at(created_at, record):
+    """Return imported created_at epoch seconds as an int"""
+    try:
+        return int(created_at)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid created_at {created_at!r} in record: {record!r}") from None
+
+
+def to_row(record):
+    """Convert an imported record into a (mood_text, timestamp, created_at) row"""
+    mood_text = str(record.get('mood_text') or '').strip()
+    timestamp = str(record.get('timestamp') or '').strip()
+    if not mood_text or not timestamp:
+        raise ValueError(f"Record needs mood_text and timestamp: {record!r}")
+    timestamp, created_at = parse_timestamp(timestamp, record)
+    if record.get('created_at') not in (None, ''):
+        created_at = parse_created_at(record['created_at'], record)
+    return (mood_text, timestamp, created_at)
+
+
+def read_csv(path):
+    """Yield rows from a CSV file with a mood_text,timestamp[,created_at] header"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [name.strip() for name in header]
+        if columns[:3] == list(FIELDS):
+            # Fast path for files written by write_csv
+            for values in reader:
+                if not values:
+                    # Blank lines, e.g. one left at the end by an editor
+                    continue
+                if len(values) < 3 or not values[0].strip() or not values[2]:
+                    # Short rows, empty text or no created_at get the full checks
+                    yield to_row(dict(zip(columns, values)))
+                    continue
+                mood_text, timestamp, created_at = values[:3]
+                yield (mood_text.strip(), parse_timestamp(timestamp, values)[0],
+                       parse_created_at(created_at, values))
+        else:
+            for values in reader:
+                if values:
+                    yield to_row(dict(zip(columns, values)))
+
+
+def read_jsonl(path):
+    """Yield rows from a file with one JSON object per line"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield to_row(json.loads(line))
+
+
+def write_csv(entries, path):
+    """Write entries to a CSV file, returning how many were written"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for _, mood_text, timestamp, created_at in entries:
+            writer.writerow((mood_text, timestamp, created_at))
+            count += 1
+    return count
+
+
+def write_jsonl(entries, path):
+    """Write entries as JSON Lines, returning how many were written"""
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for _, mood_text, timestamp, created_at in entries:
+            f.write(f'{{"mood_text": {encode(mood_text)}, "timestamp": {encode(timestamp)}, '
+                    f'"created_at": {created_at}}}\n')
+            count += 1
+    return count
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def import_file(repo, path, fmt=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Stream a file into the repository one transaction per chunk
+
+    Returns the number of imported entries. If a chunk fails, the chunks
+    before it stay committed.
+    """
+    rows = READERS[detect_format(path, fmt)](path)
+    imported = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return imported
+        imported += repo.add_entries(chunk)
+
+
+def export_file(repo, path, fmt=None):
+    """Stream every entry, oldest first, into a file and return the count"""
+    return WRITERS[detect_format(path, fmt)](repo.iter_entries(oldest_first=True), path)
@@ -0,0 +1,189 @@
+"""Opt-in performance instrumentation for the mood tracker.
+
+Metrics records three kinds of measurements:
+
+* SQL statements, through sqlite3's trace and progress callbacks. The trace
+  callback fires when a statement starts, so a statement's latency is the
+  time until the next statement starts or its database job finishes. The
+  progress callback counts virtual machine steps, which shows full scans.
+* Database jobs run by DatabaseWorker.
+* Named operations timed on the Tk thread with timer() or start().
+
+Each measurement is appended as one JSON object per line to a rotating log
+that can be collected from a user's machine.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+METRICS_LOG = 'mood_tracker_metrics.jsonl'
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# Virtual machine instructions between progress callbacks
+PROGRESS_STEPS = 1000
+
+# Statements kept in memory for attributing queries to operations
+RECENT_STATEMENTS = 500
+
+# Longest SQL text written to the log
+MAX_SQL_LENGTH = 300
+
+
+class OperationTimer:
+    """A running timer for an operation that completes asynchronously"""
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = time.perf_counter()
+
+    def stop(self, **extra):
+        """Record the operation and return its summary"""
+        return self.metrics.record_operation(self.name, self.start, time.perf_counter(), **extra)
+
+
+class Metrics:
+    """Collects query, job and operation timings"""
+
+    def __init__(self, log_path=METRICS_LOG, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+        self._lock = threading.Lock()
+        self._statement = None
+        self.recent_statements = deque(maxlen=RECENT_STATEMENTS)
+        self.last_operation = None
+        self._logger = None
+        if log_path:
+            self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._handler = RotatingFileHandler(log_path, maxBytes=max_bytes,
+                                                backupCount=backup_count, encoding='utf-8')
+            self._handler.setFormatter(logging.Formatter('%(message)s'))
+            self._logger.addHandler(self._handler)
+
+    def close(self):
+        """Flush any pending statement and close the log"""
+        self.statement_boundary()
+        if self._logger is not None:
+            self._logger.removeHandler(self._handler)
+            self._handler.close()
+            self._logger = None
+
+    def log(self, record):
+        """Append a record to the metrics log"""
+        if self._logger is not None:
+            record.setdefault('time', round(time.time(), 3))
+            self._logger.info(json.dumps(record))
+
+    # SQL statements
+
+    def attach(self, conn):
+        """Trace every statement run on a connection"""
+        conn.set_trace_callback(self._on_trace)
+        conn.set_progress_handler(self._on_progress, PROGRESS_STEPS)
+
+    def detach(self, conn):
+        """Stop tracing a connection"""
+        self.statement_boundary()
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, PROGRESS_STEPS)
+
+    def _on_trace(self, sql):
+        if sql.startswith('--'):
+            # Statements run internally by SQLite and its extensions
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if self._statement is not None and self._statement[0] == sql:
+                # Trigger programs are traced again with their statement's text
+                return
+            finished = self._finish_statement(now)
+            self._statement = [sql, now, 0]
+        if finished is not None:
+            self.log(finished)
+
+    def _on_progress(self):
+        statement = self._statement
+        if statement is not None:
+            statement[2] += PROGRESS_STEPS
+        return 0
+
+    def _finish_statement(self, now):
+        """Close the current statement and return its record; caller holds the lock"""
+        if self._statement is None:
+            return None
+        sql, start, steps = self._statement
+        self._statement = None
+        record = {
+            'type': 'query',
+            'sql': ' '.join(sql.split())[:MAX_SQL_LENGTH],
+            'ms': round((now - start) * 1000, 3),
+            'vm_steps': steps,
+        }
+        self.recent_statements.append((start, record))
+        return record
+
+    def statement_boundary(self):
+        """Mark the end of the current statement, e.g. when a job finishes"""
+        with self._lock:
+            finished = self._finish_statement(time.perf_counter())
+        if finished is not None:
+            self.log(finished)
+
+    # Database jobs and operations
+
+    def job_finished(self, description, seconds, ok):
+        """Record a finished database job"""
+        self.statement_boundary()
+        self.log({'type': 'job', 'name': description, 'ms': round(seconds * 1000, 3), 'ok': ok})
+
+    def start(self, name):
+        """Start timing an operation that finishes in a later callback"""
+        return OperationTimer(self, name)
+
+    @contextmanager
+    def timer(self, name, on_recorded=None, **extra):
+        """Time a block of code running on the calling thread
+
+        on_recorded, if given, is called with the operation summary.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            summary = self.record_operation(name, start, time.perf_counter(), **extra)
+            if on_recorded is not None:
+                on_recorded(summary)
+
+    def record_operation(self, name, start, end, **extra):
+        """Record an operation together with the queries that started during it"""
+        with self._lock:
+            queries = [record for started, record in self.recent_statements
+                       if start <= started <= end]
+        slowest = max(queries, key=lambda record: record['ms'], default=None)
+        summary = {
+            'type': 'operation',
+            'name': name,
+            'ms': round((end - start) * 1000, 3),
+            'queries': len(queries),
+            'query_ms': round(sum(record['ms'] for record in queries), 3),
+            'slowest_query_ms': slowest['ms'] if slowest else 0.0,
+            'slowest_query': slowest['sql'] if slowest else '',
+            **extra,
+        }
+        self.last_operation = summary
+        self.log(summary)
+        return summary
+
+
+def format_operation(summary):
+    """Return a one-line description of an operation summary for the status bar"""
+    text = f"{summary['name']}: {summary['ms']:.1f} ms"
+    if summary['queries']:
+        text += (f" | {summary['queries']} queries {summary['query_ms']:.1f} ms"
+                 f" | slowest {summary['slowest_query_ms']:.1f} ms")
+    return text
@@ -0,0 +1,302 @@
+"""Journal of saved entries that are not yet committed to the database.
+
+The GUI does not commit every save on its own. Entries saved close together
+are collected and written in one transaction a moment later, when enough
+of them are waiting, or when the window closes. Until then each entry is
+appended to a small journal file next to the configuration, one JSON line
+per entry, so a crash loses nothing: the next start commits what the
+journal holds before the list is loaded.
+
+Every entry carries a sequence number, and the highest one committed is
+stored in the same transaction as the entries. Replaying a journal whose
+entries were already committed, e.g. after a crash between the commit and
+clearing the file, therefore adds nothing twice.
+
+PendingSaves holds the entries of a running app and commits them through
+its DatabaseWorker. It has no tkinter dependency, so it can be tested on
+its own.
+"""
+import json
+import os
+from datetime import datetime
+
+from mood_repository import TIMESTAMP_FORMAT, make_timestamp, tombstone_token
+
+PENDING_FILE = 'mood_tracker_pending.jsonl'
+# sync_meta key of the highest sequence number committed to the database
+COMMITTED_KEY = 'pending_committed_seq'
+
+
+def pending_path(config_file):
+    """Return the path of the journal next to the configuration file"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), PENDING_FILE)
+
+
+class BatchSkipped(Exception):
+    """Raised by a batch queued behind one that failed, which is retried with it"""
+
+
+class PendingJournal:
+    """Append-only file of entries waiting for the next commit"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def append(self, record):
+        """Write a {'seq', 'text', 'timestamp'} record to the end of the journal
+
+        The line is handed to the operating system before returning, which
+        survives a crash of the app like a commit in WAL mode with
+        synchronous=NORMAL does; neither waits for the disk.
+        """
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._file.flush()
+
+    def rewrite(self, records):
+        """Replace the journal with records, e.g. once some of its entries are committed
+
+        The new file is written next to the journal and renamed over it, so
+        a crash leaves either the old or the new journal.
+        """
+        if not records:
+            self.clear()
+            return
+        self.close()
+        partial = self.path + '.partial'
+        with open(partial, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(partial, self.path)
+
+    def clear(self):
+        """Empty the journal once every entry in it is committed"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_pending(path):
+    """Return the records in the journal at path, oldest first
+
+    A missing file holds no records. A line that cannot be read, i.e. the
+    last one when the app stopped while writing it, is skipped.
+    """
+    records = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records.append({'seq': int(record['seq']), 'text': str(record['text']),
+                                    'timestamp': str(record['timestamp'])})
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        return []
+    return records
+
+
+def commit_pending(repo, records):
+    """Insert records in one transaction, marking the highest sequence number committed
+
+    Returns (seq, entry) pairs in the order of records. Runs on the
+    database worker.
+    """
+    if not records:
+        return []
+    items = [(record['text'], datetime.strptime(record['timestamp'], TIMESTAMP_FORMAT))
+             for record in records]
+    marker = (COMMITTED_KEY, max(record['seq'] for record in records))
+    entries = repo.add_entry_batch(items, marker=marker)
+    return [(record['seq'], entry) for record, entry in zip(records, entries)]
+
+
+def replay_pending(repo, records):
+    """Commit the records of a journal left behind by a crash, skipping committed ones
+
+    Sequence numbers grow with every save, so records at or below the
+    stored marker were committed before the journal could be cleared.
+    """
+    committed = int(repo.sync_value(COMMITTED_KEY, 0))
+    return commit_pending(repo, [record for record in records if record['seq'] > committed])
+
+
+class PendingSaves:
+    """Saved entries on their way to the database, committed in batches
+
+    Runs on the thread that polls the worker, i.e. the Tk thread in the
+    app. Each entry is shown under the placeholder id -seq until its batch
+    commits; ids maps placeholder ids to the real ids, filled in on the
+    worker, so jobs queued after flush() can use resolve(). on_committed is
+    called with the (seq, entry) pairs of each committed batch, on_failed
+    with the error once the failed entries are waiting again.
+    """
+
+    def __init__(self, worker, journal):
+        self.worker = worker
+        self.journal = journal
+        # Records not submitted yet, oldest first
+        self.pending = []
+        self.seq = 0
+        # Highest sequence number committed so far, read on the worker by recover()
+        self.committed_seq = 0
+        self.ids = {}
+        # Batches submitted and not finished
+        self.flushes = 0
+        # Set when the app closes; callbacks that run afterwards do nothing
+        self.closing = False
+        self.on_committed = None
+        self.on_failed = None
+        # Shared with the queued batches; set by the first one that fails
+        self._chain = {'failed': False}
+        self._error = None
+        # Entries dropped by Clear All (up to this seq) or deleted before they committed
+        self._dropped_seq = 0
+        self._discarded = set()
+
+    def add(self, mood_text, when=None):
+        """Journal a new entry and return the entry to show until it is committed
+
+        Raises OSError, and keeps nothing, if the journal cannot be written.
+        """
+        seq = max(self.seq + 1, self.committed_seq + 1, tombstone_token())
+        timestamp, created_at = make_timestamp(when)
+        record = {'seq': seq, 'text': mood_text, 'timestamp': timestamp}
+        self.journal.append(record)
+        self.seq = seq
+        self.pending.append(record)
+        return (-seq, mood_text, timestamp, created_at)
+
+    def flush(self, closing=False):
+        """Submit the waiting entries as one batch, returning whether there were any
+
+        A batch queues behind those still outstanding, so jobs submitted
+        after it find every saved entry committed. Once a batch fails, the
+        ones queued behind it are skipped and retried with it: a batch never
+        commits ahead of an earlier one, so the replay marker never passes
+        an entry that is not committed.
+        """
+        if not self.pending:
+            return False
+        records, self.pending = self.pending, []
+        chain, ids, journal = self._chain, self.ids, self.journal
+
+        def flush(repo):
+            if chain['failed']:
+                raise BatchSkipped("an earlier batch failed")
+            try:
+                if any(record.get('recovered') for record in records):
+                    # A retry of a replay, which may have committed before the crash
+                    committed = replay_pending(repo, records)
+                else:
+                    committed = commit_pending(repo, records)
+            except Exception:
+                chain['failed'] = True
+                raise
+            for seq, entry in committed:
+                ids[-seq] = entry[0]
+            if closing:
+                # Every batch before this one committed too
+                journal.clear()
+            return committed
+
+        self.flushes += 1
+        self.worker.submit(flush, self._committed, lambda e: self._failed(records, e),
+                           cancellable=False, description="Saving mood")
+        return True
+
+    def resolve(self, entry_ids):
+        """Return the real ids of entries by their shown ids; runs on the worker
+
+        Placeholder ids of entries that are not committed stay negative and
+        match no row.
+        """
+        return {self.ids.get(entry_id, entry_id) for entry_id in entry_ids}
+
+    def discard(self, entry_ids):
+        """Forget the entries among entry_ids that were deleted before they could commit"""
+        seqs = {-entry_id for entry_id in entry_ids if entry_id < 0}
+        if not seqs:
+            return
+        self._discarded |= seqs
+        self.pending = [record for record in self.pending if record['seq'] not in seqs]
+        if not self.flushes:
+            self.journal.rewrite(self.pending)
+
+    def drop_all(self):
+        """Submit the waiting entries ahead of Clear All, dropping them should they fail
+
+        Committed entries are cleared with the rest and come back with Undo.
+        """
+        self.flush()
+        self._dropped_seq = self.seq
+
+    def recover(self, on_recovered):
+        """Commit what a crashed session left in the journal, then call on_recovered(committed)
+
+        Also reads the committed marker, so new entries get higher sequence
+        numbers even if the clock was set back since; replay would skip them
+        otherwise. Call it at startup, before anything is saved.
+        """
+        records = [dict(record, recovered=True) for record in read_pending(self.journal.path)]
+
+        def read_marker(repo):
+            self.committed_seq = int(repo.sync_value(COMMITTED_KEY, 0))
+
+        if not records:
+            self.worker.submit(read_marker, cancellable=False,
+                               description="Recovering unsaved entries")
+            return
+        self.seq = max(self.seq, max(record['seq'] for record in records))
+
+        def replay(repo):
+            read_marker(repo)
+            return replay_pending(repo, records)
+
+        def on_replayed(committed):
+            self._committed(committed)
+            if not self.closing:
+                on_recovered(committed)
+
+        self.flushes += 1
+        self.worker.submit(replay, on_replayed,
+                           lambda e: self._failed(records, e),
+                           cancellable=False, description="Recovering unsaved entries")
+
+    def _committed(self, committed):
+        self.flushes -= 1
+        if self.closing:
+            return
+        if not self.flushes:
+            # The journal now holds just the entries still waiting
+            self.journal.rewrite(self.pending)
+        if self.on_committed is not None:
+            self.on_committed(committed)
+
+    def _failed(self, records, e):
+        self.flushes -= 1
+        if self.closing:
+            return
+        if not isinstance(e, BatchSkipped) and self._error is None:
+            self._error = e
+        records = [record for record in records if record['seq'] > self._dropped_seq
+                   and record['seq'] not in self._discarded]
+        self.pending = sorted(records + self.pending, key=lambda record: record['seq'])
+        if self.flushes:
+            return
+        # Every batch of the failed chain is back; the next flush starts a new one
+        self._chain = {'failed': False}
+        error, self._error = self._error, None
+        self.journal.rewrite(self.pending)
+        if self.on_failed is not None:
+            self.on_failed(error)
@@ -0,0 +1,1424 @@
+"""Data access for mood entries, usable without tkinter.
+
+Entries are returned as ``(id, mood_text, timestamp, created_at)`` tuples,
+newest first unless stated otherwise. SQL is kept in module constants so
+every call hits sqlite3's per-connection prepared statement cache.
+"""
+import heapq
+import os
+import re
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+import mood_schema
+import mood_sentiment
+import mood_tags
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Rows fetched per round trip by the streaming iterators
+FETCH_SIZE = 1000
+
+# Entries scored per score_entries() call
+SCORE_BATCH_SIZE = 50000
+
+# Entries tagged per tag_entries() call
+TAG_BATCH_SIZE = 50000
+
+ENTRY_COLUMNS = "id, mood_text, timestamp, created_at"
+
+# Bounds of created_at for reads without a range
+MIN_TIME = -2 ** 63
+MAX_TIME = 2 ** 63 - 1
+
+# New entries get a random uuid and the version (changed_at, origin) of their creation.
+# Single saves are scored and tagged right away; bulk inserts are left to
+# score_entries() and tag_entries().
+INSERT_SQL = (
+    "INSERT INTO moods (mood_text, timestamp, created_at, uuid, changed_at, origin, "
+    "sentiment, sentiment_version, tags_version) "
+    f"VALUES (?, ?, ?, {mood_schema.NEW_ID_SQL}, ?, ?, ?, ?, ?)"
+)
+CREATE_STAGING_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS moods_staging "
+    "(mood_text TEXT NOT NULL, timestamp TEXT NOT NULL, created_at INTEGER)"
+)
+STAGE_SQL = "INSERT INTO temp.moods_staging (mood_text, timestamp, created_at) VALUES (?, ?, ?)"
+UNSTAGE_SQL = (
+    "INSERT INTO moods (mood_text, timestamp, created_at, uuid, changed_at, origin) "
+    f"SELECT mood_text, timestamp, created_at, {mood_schema.NEW_ID_SQL}, ?, ? "
+    "FROM temp.moods_staging ORDER BY rowid"
+)
+CLEAR_STAGING_SQL = "DELETE FROM temp.moods_staging"
+# Deletes only tombstone entries; purge_deleted() removes them later.
+# delete_all() tombstones with a negative token and maintains the rollups in bulk.
+DELETE_SQL = (
+    "UPDATE moods SET deleted_at = ?, changed_at = ?, origin = ? "
+    "WHERE id = ? AND deleted_at IS NULL"
+)
+DELETE_ALL_SQL = (
+    "UPDATE moods SET deleted_at = -?, changed_at = ?, origin = ? WHERE deleted_at IS NULL"
+)
+CLEAR_STATS_SQL = ("DELETE FROM mood_daily_stats", "DELETE FROM mood_weekly_stats",
+                   "DELETE FROM mood_daily_sentiment")
+RESTORE_SQL = (
+    "UPDATE moods SET deleted_at = NULL, changed_at = ?, origin = ? WHERE deleted_at IN (?, -?)"
+)
+RESTORE_STATS_SQL = tuple(f"""
+    INSERT INTO {table} ({key}, entry_count, total_chars)
+    SELECT {expression.format('moods')}, COUNT(*), SUM(length(mood_text))
+    FROM moods WHERE deleted_at = -? GROUP BY 1
+    ON CONFLICT ({key}) DO UPDATE SET
+        entry_count = entry_count + excluded.entry_count,
+        total_chars = total_chars + excluded.total_chars
+""" for table, key, expression in (('mood_daily_stats', 'day', mood_schema.DAY_SQL),
+                                   ('mood_weekly_stats', 'week_start', mood_schema.WEEK_SQL)))
+RESTORE_SENTIMENT_STATS_SQL = f"""
+    INSERT INTO mood_daily_sentiment (day, scored_count, sentiment_total)
+    SELECT {mood_schema.DAY_SQL.format('moods')}, COUNT(*), SUM(sentiment)
+    FROM moods WHERE deleted_at = -? AND sentiment IS NOT NULL GROUP BY 1
+    ON CONFLICT (day) DO UPDATE SET
+        scored_count = scored_count + excluded.scored_count,
+        sentiment_total = sentiment_total + excluded.sentiment_total
+"""
+# Tag counts: delete_all() leaves no entry that counts, Clear All is undone in bulk
+CLEAR_TAG_COUNTS_SQL = "UPDATE tags SET entry_count = 0 WHERE entry_count != 0"
+RESTORE_TAG_COUNTS_SQL = """
+    UPDATE tags SET entry_count = entry_count + (
+        SELECT COUNT(*) FROM mood_tags AS t JOIN moods AS m ON m.id = t.mood_id
+        WHERE t.tag_id = tags.id AND m.deleted_at = -?1)
+    WHERE id IN (SELECT t.tag_id FROM mood_tags AS t JOIN moods AS m ON m.id = t.mood_id
+                 WHERE m.deleted_at = -?1)
+"""
+# Tombstones whose token is at most the cutoff, negative (bulk) tokens included
+PURGE_SQL = (
+    "DELETE FROM moods WHERE id IN "
+    "(SELECT id FROM moods WHERE deleted_at BETWEEN -? AND ? LIMIT ?)"
+)
+DELETED_COUNT_SQL = "SELECT COUNT(*) FROM moods WHERE deleted_at IS NOT NULL"
+
+# Every read is limited to live entries, which lets it use idx_moods_live
+COUNT_SQL = "SELECT COUNT(*) FROM moods WHERE deleted_at IS NULL"
+COUNT_SINCE_SQL = "SELECT COUNT(*) FROM moods WHERE deleted_at IS NULL AND created_at >= ?"
+GET_SQL = f"SELECT {ENTRY_COLUMNS} FROM moods WHERE id = ? AND deleted_at IS NULL"
+NEWEST_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods WHERE deleted_at IS NULL "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+OLDER_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods WHERE deleted_at IS NULL AND (created_at, id) < (?, ?) "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+NEWER_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods WHERE deleted_at IS NULL AND (created_at, id) > (?, ?) "
+    "ORDER BY created_at ASC, id ASC LIMIT ?"
+)
+# The same pages restricted to a [since, until) range of created_at
+COUNT_RANGE_SQL = (
+    "SELECT COUNT(*) FROM moods WHERE deleted_at IS NULL AND created_at >= ? AND created_at < ?"
+)
+NEWEST_RANGE_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods "
+    "WHERE deleted_at IS NULL AND created_at >= ? AND created_at < ? "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+OLDER_RANGE_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods "
+    "WHERE deleted_at IS NULL AND (created_at, id) < (?, ?) AND created_at >= ? "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+NEWER_RANGE_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods "
+    "WHERE deleted_at IS NULL AND (created_at, id) > (?, ?) AND created_at < ? "
+    "ORDER BY created_at ASC, id ASC LIMIT ?"
+)
+ITER_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods WHERE deleted_at IS NULL "
+    "ORDER BY created_at DESC, id DESC"
+)
+ITER_OLDEST_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods WHERE deleted_at IS NULL "
+    "ORDER BY created_at ASC, id ASC"
+)
+SINCE_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods WHERE deleted_at IS NULL AND created_at >= ? "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+
+# Latest version of every entry changed after a change log sequence number.
+# Entries in neither moods nor an archive were removed and are exported as deleted;
+# the text of archived entries is read from their archive.
+CHANGES_SINCE_SQL = """
+    SELECT c.seq, c.uuid, c.changed_at, c.origin,
+           m.mood_text, m.timestamp, m.created_at,
+           (m.deleted_at IS NOT NULL OR m.id IS NULL) AND a.id IS NULL, a.year
+    FROM (SELECT MAX(seq) AS seq FROM mood_changes WHERE seq > ? GROUP BY uuid) AS latest
+    JOIN mood_changes AS c ON c.seq = latest.seq
+    LEFT JOIN moods AS m ON m.uuid = c.uuid
+    LEFT JOIN mood_archived AS a ON a.uuid = c.uuid
+    ORDER BY c.seq
+"""
+LAST_CHANGE_SQL = "SELECT COALESCE(MAX(seq), 0) FROM mood_changes"
+SYNC_VERSION_SQL = "SELECT id, changed_at, origin, deleted_at FROM moods WHERE uuid = ?"
+REMOVED_VERSION_SQL = "SELECT changed_at, origin FROM mood_removed WHERE uuid = ?"
+LOG_CHANGE_SQL = "INSERT INTO mood_changes (uuid, changed_at, origin) VALUES (?, ?, ?)"
+REMEMBER_REMOVED_SQL = (
+    "INSERT OR REPLACE INTO mood_removed (uuid, changed_at, origin) VALUES (?, ?, ?)"
+)
+# New entries from another device are staged and moved in bulk, like add_entries()
+CREATE_SYNC_STAGING_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS moods_sync_staging (mood_text TEXT NOT NULL, "
+    "timestamp TEXT NOT NULL, created_at INTEGER, uuid TEXT, changed_at INTEGER, origin TEXT)"
+)
+SYNC_STAGE_SQL = (
+    "INSERT INTO temp.moods_sync_staging "
+    "(mood_text, timestamp, created_at, uuid, changed_at, origin) VALUES (?, ?, ?, ?, ?, ?)"
+)
+SYNC_UNSTAGE_SQL = (
+    "INSERT INTO moods (mood_text, timestamp, created_at, uuid, changed_at, origin) "
+    "SELECT mood_text, timestamp, created_at, uuid, changed_at, origin "
+    "FROM temp.moods_sync_staging ORDER BY rowid"
+)
+FORGET_STAGED_SQL = (
+    "DELETE FROM mood_removed WHERE uuid IN (SELECT uuid FROM temp.moods_sync_staging)"
+)
+CLEAR_SYNC_STAGING_SQL = "DELETE FROM temp.moods_sync_staging"
+# Synced deletes carry no text, keep an existing tombstone and otherwise use
+# the change time as a new one
+SYNC_UPDATE_SQL = """
+    UPDATE moods SET mood_text = coalesce(?, mood_text), timestamp = coalesce(?, timestamp),
+        created_at = coalesce(?, created_at),
+        deleted_at = CASE WHEN ? THEN coalesce(deleted_at, ?) END,
+        changed_at = ?, origin = ?
+    WHERE id = ?
+"""
+# Turns a Clear All tombstone into a plain one, which the rollup triggers handle
+UNBULK_TOMBSTONE_SQL = "UPDATE moods SET deleted_at = -deleted_at WHERE id = ? AND deleted_at < 0"
+# Entries not scored with the current lexicon, found through idx_moods_sentiment_version
+UNSCORED_SQL = (
+    f"SELECT id, mood_text, {mood_schema.DAY_SQL.format('moods')}, sentiment, deleted_at IS NULL "
+    "FROM moods WHERE sentiment_version < ? LIMIT ?"
+)
+UNSCORED_COUNT_SQL = "SELECT COUNT(*) FROM moods WHERE sentiment_version < ?"
+SET_SENTIMENT_SQL = "UPDATE moods SET sentiment = ?, sentiment_version = ? WHERE id = ?"
+# Triggers skip score writes, score_entries() adds the changes of each day at once
+ADD_SENTIMENT_STATS_SQL = """
+    INSERT INTO mood_daily_sentiment (day, scored_count, sentiment_total) VALUES (?, ?, ?)
+    ON CONFLICT (day) DO UPDATE SET
+        scored_count = scored_count + excluded.scored_count,
+        sentiment_total = sentiment_total + excluded.sentiment_total
+"""
+
+# Tags: the inverted index of the hashtags in entries, see mood_schema.add_tags()
+ADD_TAG_SQL = "INSERT INTO tags (name) VALUES (?) ON CONFLICT (name) DO NOTHING"
+TAG_ID_SQL = "SELECT id, entry_count FROM tags WHERE name = ?"
+ENTRY_TAG_IDS_SQL = "SELECT tag_id FROM mood_tags WHERE mood_id = ?"
+ADD_ENTRY_TAG_SQL = (
+    "INSERT OR IGNORE INTO mood_tags (tag_id, created_at, mood_id) VALUES (?, ?, ?)"
+)
+REMOVE_ENTRY_TAG_SQL = "DELETE FROM mood_tags WHERE mood_id = ? AND tag_id = ?"
+COUNT_TAG_SQL = "UPDATE tags SET entry_count = entry_count + ? WHERE id = ?"
+TAG_ENTRY_COUNT_SQL = "SELECT entry_count FROM tags WHERE id = ?"
+TAG_COUNTS_SQL = (
+    "SELECT name, entry_count FROM tags WHERE entry_count > 0 "
+    "ORDER BY entry_count DESC, name LIMIT ?"
+)
+# Entries not tagged with the current parser, found through idx_moods_tags_version.
+# Rows are (id, created_at, mood_text, whether the entry counts in tags.entry_count).
+UNTAGGED_SQL = (
+    "SELECT id, coalesce(created_at, 0), mood_text, deleted_at IS NULL "
+    "FROM moods WHERE tags_version < ? LIMIT ?"
+)
+SET_TAGS_VERSION_SQL = "UPDATE moods SET tags_version = ? WHERE id = ?"
+# Entries of the tags filter within [since, until), on one side of a
+# (created_at, id) anchor. Entries with all the tags walk the mood_tags key of
+# the rarest one in page order and look the others up in the key; entries
+# with any of them merge the first page of every tag with UNION. Either way
+# a page stops reading once it is full. Tombstones are skipped; archived
+# entries come back with their year instead of their text.
+TAG_LIVE_SQL = (
+    "(EXISTS (SELECT 1 FROM moods AS m WHERE m.id = t.mood_id AND m.deleted_at IS NULL) "
+    "OR EXISTS (SELECT 1 FROM mood_archived AS a WHERE a.id = t.mood_id))"
+)
+TAG_MATCH_SQL = (
+    "SELECT created_at, mood_id FROM mood_tags AS t "
+    "WHERE tag_id = ? AND created_at >= ? AND created_at < ? AND (created_at, mood_id) {0} (?, ?) "
+    f"AND {TAG_LIVE_SQL}{{1}}"
+)
+HAS_TAG_SQL = (
+    " AND EXISTS (SELECT 1 FROM mood_tags AS o "
+    "WHERE o.tag_id = ? AND o.created_at = t.created_at AND o.mood_id = t.mood_id)"
+)
+TAG_PAGE_SQL = "SELECT * FROM ({0} ORDER BY created_at {1}, mood_id {1} LIMIT ?)"
+TAGGED_SQL = """
+    SELECT t.mood_id, m.mood_text, m.timestamp, t.created_at, a.year
+    FROM ({0}) AS t
+    LEFT JOIN moods AS m ON m.id = t.mood_id
+    LEFT JOIN mood_archived AS a ON a.id = t.mood_id
+    ORDER BY t.created_at {1}, t.mood_id {1} LIMIT ?
+"""
+TAGGED_COUNT_SQL = "SELECT COUNT(*) FROM ({0})"
+# sync_meta key of the TAGS_VERSION the archived entries were last tagged with
+ARCHIVE_TAGS_KEY = 'archive_tags_version'
+
+ARCHIVED_VERSION_SQL = "SELECT id, year, changed_at, origin FROM mood_archived WHERE uuid = ?"
+GET_SYNC_VALUE_SQL = "SELECT value FROM sync_meta WHERE key = ?"
+SET_SYNC_VALUE_SQL = "INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)"
+# Stores a number unless a higher one is stored already
+RAISE_SYNC_VALUE_SQL = """
+    INSERT INTO sync_meta (key, value) VALUES (?, ?)
+    ON CONFLICT (key) DO UPDATE
+    SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))
+"""
+
+# Markers placed around matched terms in search results
+HIGHLIGHT_START = "\u00ab"
+HIGHLIGHT_END = "\u00bb"
+
+SEARCH_SQL = f"""
+    SELECT m.id, highlight(moods_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}'),
+           m.timestamp, m.created_at
+    FROM moods_fts JOIN moods AS m ON m.id = moods_fts.rowid
+    WHERE moods_fts MATCH ? AND m.deleted_at IS NULL
+    ORDER BY bm25(moods_fts), m.created_at DESC
+    LIMIT ?
+"""
+SEARCH_LIKE_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM moods WHERE deleted_at IS NULL AND mood_text LIKE ? ESCAPE '\\' "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+
+STATS_TOTALS_SQL = (
+    "SELECT COALESCE(SUM(entry_count), 0), COALESCE(SUM(total_chars), 0), COUNT(*), "
+    "MIN(day), MAX(day) FROM mood_daily_stats"
+)
+STATS_DAYS_DESC_SQL = "SELECT day FROM mood_daily_stats WHERE day <= ? ORDER BY day DESC"
+DAY_RANGE_SQL = "SELECT MIN(day), MAX(day) FROM mood_daily_stats"
+DAILY_STATS_SQL = (
+    "SELECT day, entry_count, total_chars FROM mood_daily_stats "
+    "WHERE day BETWEEN ? AND ? ORDER BY day"
+)
+# Entry counts of the years, months or days within a period prefix
+PERIOD_COUNTS_SQL = (
+    "SELECT substr(day, 1, ?), SUM(entry_count) FROM mood_daily_stats "
+    "WHERE day >= ? AND day < ? GROUP BY 1 ORDER BY 1 DESC"
+)
+# Entries per day and, where any entry of the day is scored, the average sentiment
+DAILY_TREND_SQL = """
+    SELECT s.day, s.entry_count, m.sentiment_total / m.scored_count
+    FROM mood_daily_stats AS s LEFT JOIN mood_daily_sentiment AS m ON m.day = s.day
+    WHERE s.day BETWEEN ? AND ? ORDER BY s.day
+"""
+WEEKLY_STATS_SQL = (
+    "SELECT week_start, entry_count, total_chars FROM mood_weekly_stats "
+    "ORDER BY week_start DESC LIMIT ?"
+)
+
+# Archives: live entries older than a cutoff move to one file per year, which
+# is attached as archive_<year> only while a read or a move needs it.
+# {0} is the schema name of an attached archive, {1} its year.
+ARCHIVE_DIR_SUFFIX = '_archive'
+ARCHIVE_FILE_FORMAT = 'moods_{}.db'
+# SQLite allows 10 attached databases; the least recently used archive is detached first
+MAX_ATTACHED_ARCHIVES = 4
+# Entries moved per archive_entries() call
+ARCHIVE_BATCH_SIZE = 10000
+# Archived entries from which year_summaries() reads the partitions in worker processes
+PARALLEL_MIN_ENTRIES = 50000
+
+ARCHIVE_COLUMNS = (
+    "id, mood_text, timestamp, created_at, uuid, changed_at, origin, sentiment, sentiment_version"
+)
+ARCHIVE_YEARS_SQL = "SELECT year, entry_count FROM mood_archive_years ORDER BY year"
+ARCHIVED_YEAR_SQL = "SELECT year FROM mood_archived WHERE id = ?"
+# Rows of an archive only count while mood_archived lists them under its year
+ARCHIVE_VISIBLE_SQL = (
+    "EXISTS (SELECT 1 FROM main.mood_archived AS a WHERE a.id = m.id AND a.year = {1})"
+)
+# Entries being moved are staged in a temporary table, like add_entries()
+CREATE_ARCHIVE_BATCH_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS moods_archive_batch (
+        id INTEGER PRIMARY KEY, mood_text TEXT, timestamp TEXT, created_at INTEGER, uuid TEXT,
+        changed_at INTEGER, origin TEXT, sentiment REAL, sentiment_version INTEGER
+    )
+"""
+CLEAR_ARCHIVE_BATCH_SQL = "DELETE FROM temp.moods_archive_batch"
+OLDEST_LIVE_SQL = (
+    "SELECT created_at FROM moods WHERE deleted_at IS NULL AND created_at < ? "
+    "ORDER BY created_at, id LIMIT 1"
+)
+STAGE_ARCHIVE_SQL = (
+    f"INSERT INTO temp.moods_archive_batch SELECT {ARCHIVE_COLUMNS} FROM moods "
+    "WHERE deleted_at IS NULL AND created_at >= ? AND created_at < ? "
+    "ORDER BY created_at, id LIMIT ?"
+)
+# Rows left behind by an interrupted move are replaced rather than duplicated
+DROP_ARCHIVE_ROWS_SQL = (
+    "DELETE FROM {0}.moods WHERE id IN (SELECT id FROM temp.moods_archive_batch)"
+)
+WRITE_ARCHIVE_SQL = (
+    f"INSERT INTO {{0}}.moods ({ARCHIVE_COLUMNS}) "
+    f"SELECT {ARCHIVE_COLUMNS} FROM temp.moods_archive_batch ORDER BY id"
+)
+LIST_ARCHIVED_SQL = (
+    "INSERT INTO mood_archived (id, uuid, year, changed_at, origin) "
+    "SELECT id, uuid, ?, changed_at, origin FROM temp.moods_archive_batch"
+)
+# Entries about to be moved that were never tagged, tagged before they go
+UNTAGGED_BATCH_SQL = (
+    "SELECT id, coalesce(created_at, 0), mood_text, 1 FROM moods "
+    "WHERE id IN (SELECT id FROM temp.moods_archive_batch) AND tags_version < ?"
+)
+UNLIST_ARCHIVED_SQL = (
+    "DELETE FROM mood_archived WHERE id IN (SELECT id FROM temp.moods_archive_batch)"
+)
+COUNT_ARCHIVE_YEAR_SQL = """
+    INSERT INTO mood_archive_years (year, entry_count) VALUES (?, ?)
+    ON CONFLICT (year) DO UPDATE SET entry_count = entry_count + excluded.entry_count
+"""
+DROP_EMPTY_YEARS_SQL = "DELETE FROM mood_archive_years WHERE entry_count <= 0"
+# Entries moved out are tombstoned in bulk first, which the rollup and change log
+# triggers skip, so they stay counted and are not synced as deletes
+MOVE_OUT_SQL = (
+    "UPDATE moods SET deleted_at = -? WHERE id IN (SELECT id FROM temp.moods_archive_batch)",
+    "DELETE FROM moods WHERE id IN (SELECT id FROM temp.moods_archive_batch)",
+    "DELETE FROM mood_removed WHERE uuid IN (SELECT uuid FROM temp.moods_archive_batch)",
+)
+STAGE_UNARCHIVE_SQL = (
+    f"INSERT INTO temp.moods_archive_batch SELECT {ARCHIVE_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE id = ? AND {ARCHIVE_VISIBLE_SQL}"
+)
+STAGE_UNARCHIVE_YEAR_SQL = (
+    f"INSERT INTO temp.moods_archive_batch SELECT {ARCHIVE_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE {ARCHIVE_VISIBLE_SQL}"
+)
+# Entries moved back in are inserted with a negative tombstone, which the change log and
+# sentiment triggers skip, and made live again in the same transaction
+MOVE_IN_SQL = (
+    f"INSERT INTO moods ({ARCHIVE_COLUMNS}, deleted_at) "
+    f"SELECT {ARCHIVE_COLUMNS}, -? FROM temp.moods_archive_batch ORDER BY id",
+    "UPDATE moods SET deleted_at = NULL WHERE id IN (SELECT id FROM temp.moods_archive_batch)",
+)
+# The rollup insert trigger counts entries moved back in, which the rollups already count
+UNARCHIVE_STATS_SQL = tuple(f"""
+    INSERT INTO {table} ({key}, entry_count, total_chars)
+    SELECT {expression.format('b')}, -COUNT(*), -SUM(length(mood_text))
+    FROM temp.moods_archive_batch AS b GROUP BY 1
+    ON CONFLICT ({key}) DO UPDATE SET
+        entry_count = entry_count + excluded.entry_count,
+        total_chars = total_chars + excluded.total_chars
+""" for table, key, expression in (('mood_daily_stats', 'day', mood_schema.DAY_SQL),
+                                   ('mood_weekly_stats', 'week_start', mood_schema.WEEK_SQL)))
+
+# Reads of an attached archive, matching the reads of moods above
+ARCHIVE_GET_SQL = f"SELECT {ENTRY_COLUMNS} FROM {{0}}.moods AS m WHERE id = ? AND {ARCHIVE_VISIBLE_SQL}"
+ARCHIVE_UUID_SQL = (
+    f"SELECT mood_text, timestamp, created_at FROM {{0}}.moods AS m "
+    f"WHERE uuid = ? AND {ARCHIVE_VISIBLE_SQL}"
+)
+ARCHIVE_COUNT_SQL = (
+    "SELECT COUNT(*) FROM {0}.moods AS m "
+    f"WHERE created_at >= ? AND created_at < ? AND {ARCHIVE_VISIBLE_SQL}"
+)
+ARCHIVE_NEWEST_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE created_at >= ? AND created_at < ? AND {ARCHIVE_VISIBLE_SQL} "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+ARCHIVE_OLDER_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE (created_at, id) < (?, ?) AND created_at >= ? AND {ARCHIVE_VISIBLE_SQL} "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+ARCHIVE_NEWER_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE (created_at, id) > (?, ?) AND created_at < ? AND {ARCHIVE_VISIBLE_SQL} "
+    "ORDER BY created_at ASC, id ASC LIMIT ?"
+)
+ARCHIVE_SINCE_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE created_at >= ? AND {ARCHIVE_VISIBLE_SQL} ORDER BY created_at DESC, id DESC"
+)
+ARCHIVE_ITER_OLDEST_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE {ARCHIVE_VISIBLE_SQL} ORDER BY created_at ASC, id ASC"
+)
+ARCHIVE_TAG_ROWS_SQL = (
+    f"SELECT id, created_at, mood_text, 1 FROM {{0}}.moods AS m WHERE {ARCHIVE_VISIBLE_SQL}"
+)
+ARCHIVE_SEARCH_SQL = f"""
+    SELECT m.id, highlight(moods_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}'),
+           m.timestamp, m.created_at
+    FROM {{0}}.moods_fts JOIN {{0}}.moods AS m ON m.id = moods_fts.rowid
+    WHERE moods_fts MATCH ? AND {ARCHIVE_VISIBLE_SQL}
+    ORDER BY bm25(moods_fts), m.created_at DESC
+    LIMIT ?
+"""
+ARCHIVE_SEARCH_LIKE_SQL = (
+    f"SELECT {ENTRY_COLUMNS} FROM {{0}}.moods AS m "
+    f"WHERE mood_text LIKE ? ESCAPE '\\' AND {ARCHIVE_VISIBLE_SQL} "
+    "ORDER BY created_at DESC, id DESC LIMIT ?"
+)
+
+# Per-year totals and texts of the live entries of moods or of one archive
+SUMMARY_SQL = (
+    "SELECT CAST(substr(timestamp, 1, 4) AS INTEGER), mood_text, sentiment FROM moods "
+    "WHERE deleted_at IS NULL"
+)
+ARCHIVE_SUMMARY_SQL = (
+    "SELECT CAST(substr(timestamp, 1, 4) AS INTEGER), mood_text, sentiment FROM archive.moods AS m "
+    f"WHERE {ARCHIVE_VISIBLE_SQL.format(None, '?')}"
+)
+# Mood words listed per year by year_summaries()
+TOP_WORDS = 5
+
+
+# Length of the child periods of '' (years), 'YYYY' (months) and 'YYYY-MM' (days)
+CHILD_PERIOD_LENGTH = {0: 4, 4: 7, 7: 10}
+
+
+def period_range(period):
+    """Return the [since, until) epoch seconds of a 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD' period"""
+    parts = [int(part) for part in period.split('-')]
+    if len(parts) == 1:
+        start = datetime(parts[0], 1, 1)
+        end = datetime(parts[0] + 1, 1, 1)
+    elif len(parts) == 2:
+        year, month = parts
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    else:
+        start = datetime(*parts)
+        end = start + timedelta(days=1)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def search_terms(text):
+    """Split free-form search input into plain word tokens"""
+    return re.findall(r"\w+", text)
+
+
+def fts_query(text):
+    """Build an FTS5 MATCH expression that prefix-matches every word of text"""
+    return " ".join(f'"{term}"*' for term in search_terms(text))
+
+
+def tag_filter(tag_ids, match_all, since, until, comparison, anchor, limit=-1):
+    """Return the SELECT of the tags filter over tag_ids, rarest first, and its parameters
+
+    comparison is '<' for the entries before anchor, a (created_at, id)
+    pair, newest first, and '>' for those after it, oldest first. limit
+    bounds the entries read per tag when match_all is false.
+    """
+    if match_all:
+        sql = TAG_MATCH_SQL.format(comparison, HAS_TAG_SQL * (len(tag_ids) - 1))
+        return sql, [tag_ids[0], since, until, *anchor, *tag_ids[1:]]
+    order = 'DESC' if comparison == '<' else 'ASC'
+    page = TAG_PAGE_SQL.format(TAG_MATCH_SQL.format(comparison, ''), order)
+    params = [value for tag_id in tag_ids for value in (tag_id, since, until, *anchor, limit)]
+    return " UNION ".join([page] * len(tag_ids)), params
+
+
+def stream_rows(cursor, fetch_size=FETCH_SIZE):
+    """Yield the rows of an executed cursor in fetchmany batches"""
+    try:
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def tombstone_token():
+    """Return a new tombstone token: the current time in microseconds"""
+    return time.time_ns() // 1000
+
+
+def make_timestamp(when=None):
+    """Return the (display text, epoch seconds) pair for a local datetime"""
+    when = when or datetime.now()
+    return when.strftime(TIMESTAMP_FORMAT), int(when.timestamp())
+
+
+def default_archive_dir(db_path=mood_schema.DB_PATH):
+    """Return the directory of the archive files that sits next to a database file"""
+    root, _ = os.path.splitext(os.path.abspath(db_path))
+    return root + ARCHIVE_DIR_SUFFIX
+
+
+def entry_key(entry):
+    """Sort key of an entry, (created_at, id), as used by every page"""
+    return entry[3], entry[0]
+
+
+def summarize_partition(db_path, archive_path=None, year=None):
+    """Return per-year totals of the live entries of a database file or of one of its archives
+
+    Returns {year: [entries, total_chars, scored_count, sentiment_total, mood word Counter]}.
+    Opens its own read-only connection, so the partitions of year_summaries()
+    can be read in worker processes.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        if archive_path is None:
+            cursor = conn.execute(SUMMARY_SQL)
+        else:
+            conn.execute("ATTACH DATABASE ? AS archive", (f"file:{archive_path}?mode=ro",))
+            cursor = conn.execute(ARCHIVE_SUMMARY_SQL, (year,))
+        return summarize_rows(stream_rows(cursor))
+    finally:
+        conn.close()
+
+
+def summarize_rows(rows):
+    """Add up (year, mood_text, sentiment) rows for summarize_partition()"""
+    years = {}
+    texts = {}
+    for year, mood_text, sentiment in rows:
+        totals = years.get(year)
+        if totals is None:
+            totals = years[year] = [0, 0, 0, 0.0, Counter()]
+            texts[year] = []
+        totals[0] += 1
+        totals[1] += len(mood_text)
+        if sentiment is not None:
+            totals[2] += 1
+            totals[3] += sentiment
+        texts[year].append(mood_text)
+    # Tokenizing the texts of a year in one pass is much faster than one at a time
+    for year, year_texts in texts.items():
+        words = mood_sentiment.tokenize(" ".join(year_texts))
+        years[year][4].update(word.decode() for word in words if word in mood_sentiment.VALENCES)
+    return years
+
+
+class MoodRepository:
+    """Mood entry storage on top of a migrated SQLite database
+
+    path may be a file path or ':memory:'. Use temporary() for a throwaway
+    database file that is removed again on close().
+    """
+
+    def __init__(self, path=mood_schema.DB_PATH, cached_statements=256, archive_dir=None):
+        self.path = path
+        self._temporary = False
+        self.conn = sqlite3.connect(path, cached_statements=cached_statements)
+        mood_schema.configure_connection(self.conn)
+        mood_schema.migrate(self.conn)
+        self.has_fts = mood_schema.has_table(self.conn, 'moods_fts')
+        self.device_id = mood_schema.device_id(self.conn)
+        self.conn.execute(CREATE_STAGING_SQL)
+        self.conn.execute(CREATE_ARCHIVE_BATCH_SQL)
+        # In-memory databases have nowhere to put archives
+        if archive_dir is None and path != ':memory:':
+            archive_dir = default_archive_dir(path)
+        self.archive_dir = archive_dir
+        # Schema name -> path of the attached archives, least recently used first
+        self._attached = OrderedDict()
+
+    @classmethod
+    def in_memory(cls):
+        """Open a private in-memory database"""
+        return cls(':memory:')
+
+    @classmethod
+    def temporary(cls):
+        """Open a database in a new temporary file"""
+        import tempfile
+        fd, path = tempfile.mkstemp(prefix='mood_tracker_', suffix='.db')
+        os.close(fd)
+        repo = cls(path)
+        repo._temporary = True
+        return repo
+
+    def close(self):
+        """Close the connection, removing the file of a temporary database"""
+        self.conn.close()
+        if self._temporary:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+            if os.path.isdir(self.archive_dir):
+                import shutil
+                shutil.rmtree(self.archive_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Writes
+
+    def add_entry(self, mood_text, when=None):
+        """Insert a single entry and return it"""
+        timestamp, created_at = make_timestamp(when)
+        sentiment = mood_sentiment.score_text(mood_text)
+        with self.conn:
+            cursor = self.conn.execute(INSERT_SQL, (mood_text, timestamp, created_at,
+                                                    tombstone_token(), self.device_id,
+                                                    sentiment, mood_sentiment.LEXICON_VERSION,
+                                                    mood_tags.TAGS_VERSION))
+            self._tag_rows([(cursor.lastrowid, created_at, mood_text, True)])
+        return (cursor.lastrowid, mood_text, timestamp, created_at)
+
+    def add_entry_batch(self, items, marker=None):
+        """Insert (mood_text, when) pairs in one transaction and return the new entries
+
+        Used to group-commit entries that arrive close together, e.g. from
+        the API server, where each caller needs its new entry back. A
+        (key, number) marker is stored with the sync state in the same
+        transaction unless a higher number is stored already, so callers
+        can tell later which batches committed.
+        """
+        items = list(items)
+        changed_at = tombstone_token()
+        scores = mood_sentiment.score_texts([mood_text for mood_text, _ in items])
+        entries = []
+        with self.conn:
+            for (mood_text, when), sentiment in zip(items, scores):
+                timestamp, created_at = make_timestamp(when)
+                cursor = self.conn.execute(INSERT_SQL, (mood_text, timestamp, created_at,
+                                                        changed_at, self.device_id, sentiment,
+                                                        mood_sentiment.LEXICON_VERSION,
+                                                        mood_tags.TAGS_VERSION))
+                entries.append((cursor.lastrowid, mood_text, timestamp, created_at))
+            self._tag_rows([(entry_id, created_at, mood_text, True)
+                            for entry_id, mood_text, _, created_at in entries])
+            if marker is not None:
+                self.conn.execute(RAISE_SYNC_VALUE_SQL, marker)
+        return entries
+
+    def add_entries(self, rows):
+        """Insert (mood_text, timestamp, created_at) rows in one transaction
+
+        Rows are staged in a temporary table and moved with a single
+        INSERT ... SELECT. Triggers on moods then run inside one statement
+        instead of one per row, which lets the full-text index flush once.
+        """
+        with self.conn:
+            self.conn.executemany(STAGE_SQL, rows)
+            cursor = self.conn.execute(UNSTAGE_SQL, (tombstone_token(), self.device_id))
+            self.conn.execute(CLEAR_STAGING_SQL)
+        return cursor.rowcount
+
+    def delete_entries(self, entry_ids, token=None):
+        """Delete entries by id in one transaction, returning how many were removed
+
+        Entries are tombstoned with token (by default a new tombstone_token())
+        and can be brought back with restore_entries(token) until purged.
+        """
+        entry_ids = list(entry_ids)
+        # Archived entries are moved back first, so they are tombstoned like any other
+        self._unarchive_ids(entry_ids)
+        changed_at = tombstone_token()
+        token = token or changed_at
+        with self.conn:
+            cursor = self.conn.executemany(
+                DELETE_SQL, ((token, changed_at, self.device_id, entry_id) for entry_id in entry_ids)
+            )
+        return cursor.rowcount
+
+    def delete_all(self, token=None):
+        """Delete every entry, returning how many were removed; see delete_entries()"""
+        for year, *_ in self._archive_years():
+            self._unarchive(year)
+        changed_at = tombstone_token()
+        with self.conn:
+            cursor = self.conn.execute(DELETE_ALL_SQL,
+                                       (token or changed_at, changed_at, self.device_id))
+            # No live entries are left, so the rollups are emptied at once
+            for sql in CLEAR_STATS_SQL:
+                self.conn.execute(sql)
+            self.conn.execute(CLEAR_TAG_COUNTS_SQL)
+        return cursor.rowcount
+
+    def restore_entries(self, token):
+        """Undo the deletes made with token, returning how many entries came back"""
+        with self.conn:
+            # Tombstones of delete_all() are put back into the rollups in bulk
+            for sql in (*RESTORE_STATS_SQL, RESTORE_SENTIMENT_STATS_SQL, RESTORE_TAG_COUNTS_SQL):
+                self.conn.execute(sql, (token,))
+            cursor = self.conn.execute(RESTORE_SQL,
+                                       (tombstone_token(), self.device_id, token, token))
+        return cursor.rowcount
+
+    def deleted_count(self):
+        """Return the number of tombstoned entries waiting to be purged"""
+        return self.conn.execute(DELETED_COUNT_SQL).fetchone()[0]
+
+    def purge_deleted(self, older_than, batch_size=1000):
+        """Permanently remove up to batch_size entries tombstoned at or before older_than
+
+        older_than is a tombstone token. Returns how many entries were
+        removed; call again until it returns less than batch_size.
+        """
+        with self.conn:
+            cursor = self.conn.execute(PURGE_SQL, (older_than, older_than, batch_size))
+        return cursor.rowcount
+
+    def incremental_vacuum(self, pages=1000):
+        """Release up to pages free pages to the file system, returning how many remain free"""
+        # execute() would step the pragma once, which frees a single page
+        self.conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        return self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    # Archives
+
+    def archive_path(self, year):
+        """Return the path of the archive file of a year"""
+        return os.path.join(self.archive_dir, ARCHIVE_FILE_FORMAT.format(year))
+
+    def archive_years(self):
+        """Return (year, entry_count) of every year with archived entries, oldest first"""
+        return self.conn.execute(ARCHIVE_YEARS_SQL).fetchall()
+
+    def _archive_years(self, since=MIN_TIME, until=MAX_TIME, newest_first=False):
+        """Return (year, entry_count, since, until) of the archived years overlapping [since, until)"""
+        years = []
+        for year, entry_count in self.archive_years():
+            year_since, year_until = period_range(str(year))
+            if year_since < until and year_until > since:
+                years.append((year, entry_count, year_since, year_until))
+        if newest_first:
+            years.reverse()
+        return years
+
+    def _attach(self, year, create=False):
+        """Attach the archive of a year if it is not attached yet, returning its schema name
+
+        Must not be called inside a transaction. create makes a new archive
+        file; otherwise a missing file is an error.
+        """
+        schema = f"archive_{int(year)}"
+        if schema in self._attached:
+            self._attached.move_to_end(schema)
+            return schema
+        path = self.archive_path(year)
+        if create:
+            os.makedirs(self.archive_dir, exist_ok=True)
+        elif not os.path.exists(path):
+            raise sqlite3.DatabaseError(f"The archive of {year} is missing: {path}")
+        for old in list(self._attached):
+            if len(self._attached) < MAX_ATTACHED_ARCHIVES:
+                break
+            try:
+                self._detach(old)
+            except sqlite3.OperationalError:
+                # Still read by an open cursor, detached by a later call
+                continue
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self._attached[schema] = path
+        mood_schema.create_archive_schema(self.conn, schema)
+        return schema
+
+    def _detach(self, schema):
+        self.conn.execute(f"DETACH DATABASE {schema}")
+        del self._attached[schema]
+
+    def archive_entries(self, older_than, batch_size=ARCHIVE_BATCH_SIZE):
+        """Move up to batch_size live entries created before older_than to the archives of their years
+
+        older_than is in epoch seconds. Entries of one year are moved per
+        call. The rows are written to the archive first, then listed in
+        mood_archived and removed from moods in one transaction, so an
+        interrupted move leaves them in moods. Returns how many entries were
+        moved; call again until it returns 0.
+        """
+        if self.archive_dir is None:
+            return 0
+        row = self.conn.execute(OLDEST_LIVE_SQL, (older_than,)).fetchone()
+        if row is None:
+            return 0
+        year = datetime.fromtimestamp(row[0]).year
+        since, until = period_range(str(year))
+        schema = self._attach(year, create=True)
+        with self.conn:
+            self.conn.execute(CLEAR_ARCHIVE_BATCH_SQL)
+            moved = self.conn.execute(STAGE_ARCHIVE_SQL,
+                                      (since, min(until, older_than), batch_size)).rowcount
+            self.conn.execute(DROP_ARCHIVE_ROWS_SQL.format(schema))
+            self.conn.execute(WRITE_ARCHIVE_SQL.format(schema))
+        with self.conn:
+            self._tag_rows(self.conn.execute(UNTAGGED_BATCH_SQL,
+                                             (mood_tags.TAGS_VERSION,)).fetchall())
+            self.conn.execute(LIST_ARCHIVED_SQL, (year,))
+            self.conn.execute(COUNT_ARCHIVE_YEAR_SQL, (year, moved))
+            token = tombstone_token()
+            for sql in MOVE_OUT_SQL:
+                self.conn.execute(sql, (token,) if '?' in sql else ())
+            self.conn.execute(CLEAR_ARCHIVE_BATCH_SQL)
+        return moved
+
+    def _unarchive(self, year, entry_ids=None):
+        """Move the archived entries of a year back into moods, all or only those in entry_ids
+
+        They come back live with their versions, and the rollups, which
+        never stopped counting them, are left as they were. An archive left
+        empty is removed. Returns how many entries were moved.
+        """
+        schema = self._attach(year)
+        with self.conn:
+            self.conn.execute(CLEAR_ARCHIVE_BATCH_SQL)
+            if entry_ids is None:
+                moved = self.conn.execute(STAGE_UNARCHIVE_YEAR_SQL.format(schema, year)).rowcount
+            else:
+                moved = self.conn.executemany(STAGE_UNARCHIVE_SQL.format(schema, year),
+                                              ((entry_id,) for entry_id in entry_ids)).rowcount
+            token = tombstone_token()
+            for sql in MOVE_IN_SQL:
+                self.conn.execute(sql, (token,) if '?' in sql else ())
+            for sql in UNARCHIVE_STATS_SQL:
+                self.conn.execute(sql)
+            self.conn.execute(UNLIST_ARCHIVED_SQL)
+            self.conn.execute(COUNT_ARCHIVE_YEAR_SQL, (year, -moved))
+            self.conn.execute(DROP_EMPTY_YEARS_SQL)
+        # The rows no longer count; removing them only frees the space
+        with self.conn:
+            self.conn.execute(DROP_ARCHIVE_ROWS_SQL.format(schema))
+            self.conn.execute(CLEAR_ARCHIVE_BATCH_SQL)
+        if all(row[0] != year for row in self.archive_years()):
+            path = self._attached[schema]
+            self._detach(schema)
+            os.remove(path)
+        return moved
+
+    def _unarchive_ids(self, entry_ids):
+        """Move the archived entries among entry_ids back into moods"""
+        years = {}
+        for entry_id in entry_ids:
+            row = self.conn.execute(ARCHIVED_YEAR_SQL, (entry_id,)).fetchone()
+            if row is not None:
+                years.setdefault(row[0], []).append(entry_id)
+        for year, year_ids in years.items():
+            self._unarchive(year, year_ids)
+
+    def _merge_archived(self, rows, limit, since, until, fetch, newest_first=True):
+        """Merge the same page read from the archives overlapping [since, until) into rows
+
+        rows is a page read from moods, sorted like the page. fetch(schema,
+        year) reads the page from an attached archive. Years are read in
+        page order until the page is full of entries that all come before
+        the next year.
+        """
+        for year, _, year_since, year_until in self._archive_years(since, until, newest_first):
+            if len(rows) >= limit:
+                edge = rows[limit - 1][3]
+                if edge >= year_until if newest_first else edge < year_since:
+                    break
+            rows = sorted(rows + fetch(self._attach(year), year),
+                          key=entry_key, reverse=newest_first)[:limit]
+        return rows
+
+    def _iter_archived(self, sql, params, since=MIN_TIME, newest_first=True,
+                       fetch_size=FETCH_SIZE):
+        """Yield the rows of sql from each archive from since on, one year at a time"""
+        for year, *_ in self._archive_years(since, MAX_TIME, newest_first):
+            schema = self._attach(year)
+            yield from stream_rows(self.conn.execute(sql.format(schema, year), params), fetch_size)
+
+    def year_summaries(self, max_workers=None):
+        """Return (year, entries, average length, average sentiment or None, top mood words) rows
+
+        Unlike the statistics, these need the text of every entry. Each
+        archive and moods itself is a partition that can be read on its own,
+        so when there are enough archived entries the partitions are read in
+        parallel in a process pool.
+        """
+        years = self.archive_years()
+        if self.archive_dir is None:
+            parts = [summarize_rows(stream_rows(self.conn.execute(SUMMARY_SQL)))]
+        else:
+            tasks = [(self.path, None, None)] + [(self.path, self.archive_path(year), year)
+                                                 for year, _ in years]
+            if sum(count for _, count in years) >= PARALLEL_MIN_ENTRIES:
+                # Imported here, it would slow down the start of the command line tool
+                from concurrent.futures import ProcessPoolExecutor
+                workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    parts = list(pool.map(summarize_partition, *zip(*tasks)))
+            else:
+                parts = [summarize_partition(*task) for task in tasks]
+
+        # Entries synced in after their year was archived are split over two partitions
+        totals = {}
+        for part in parts:
+            for year, (entries, chars, scored, sentiment, words) in part.items():
+                total = totals.setdefault(year, [0, 0, 0, 0.0, Counter()])
+                total[0] += entries
+                total[1] += chars
+                total[2] += scored
+                total[3] += sentiment
+                total[4].update(words)
+        return [(year, entries, chars / entries, sentiment / scored if scored else None,
+                 [word for word, _ in words.most_common(TOP_WORDS)])
+                for year, (entries, chars, scored, sentiment, words) in sorted(totals.items())]
+
+    # Sentiment
+
+    def unscored_count(self):
+        """Return the number of entries not yet scored with the current lexicon"""
+        version = mood_sentiment.LEXICON_VERSION
+        return self.conn.execute(UNSCORED_COUNT_SQL, (version,)).fetchone()[0]
+
+    def score_entries(self, batch_size=SCORE_BATCH_SIZE):
+        """Score up to batch_size entries not yet scored with the current lexicon
+
+        Entries added in bulk or from another device, and every entry after
+        LEXICON_VERSION changes, are scored here in vectorized batches.
+        Returns how many were scored; call again until it returns less
+        than batch_size.
+        """
+        version = mood_sentiment.LEXICON_VERSION
+        with self.conn:
+            # Read and write in one transaction, so the rollups match the rows scored
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(UNSCORED_SQL, (version, batch_size)).fetchall()
+            scores = mood_sentiment.score_texts([row[1] for row in rows])
+            self.conn.executemany(SET_SENTIMENT_SQL, ((score, version, row[0])
+                                                      for row, score in zip(rows, scores)))
+            days = {}
+            for (_, _, day, old_score, live), score in zip(rows, scores):
+                if live:
+                    count, total = days.get(day, (0, 0.0))
+                    if old_score is None:
+                        days[day] = (count + 1, total + score)
+                    else:
+                        days[day] = (count, total + score - old_score)
+            self.conn.executemany(ADD_SENTIMENT_STATS_SQL,
+                                  ((day, count, total) for day, (count, total) in days.items()))
+        return len(rows)
+
+    # Tags
+
+    def tag_entries(self, batch_size=TAG_BATCH_SIZE):
+        """Index the hashtags of up to batch_size entries not yet tagged with the current parser
+
+        Entries added in bulk or from another device, every entry once
+        after the upgrade that added tags and again after TAGS_VERSION
+        changes are tagged here. Archived entries are tagged a year at a
+        time once the others are done. Returns how many were tagged; call
+        again until it returns less than batch_size.
+        """
+        version = mood_tags.TAGS_VERSION
+        with self.conn:
+            # Read and write in one transaction, so the counts match the rows tagged
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(UNTAGGED_SQL, (version, batch_size)).fetchall()
+            self._tag_rows(rows)
+            self.conn.executemany(SET_TAGS_VERSION_SQL, ((version, row[0]) for row in rows))
+        if len(rows) < batch_size and int(self.sync_value(ARCHIVE_TAGS_KEY, 0)) < version:
+            return len(rows) + self._tag_archives(version)
+        return len(rows)
+
+    def _tag_archives(self, version):
+        """Index the hashtags of every archived entry, returning how many there were"""
+        tagged = 0
+        for year, *_ in self._archive_years():
+            schema = self._attach(year)
+            with self.conn:
+                rows = self.conn.execute(ARCHIVE_TAG_ROWS_SQL.format(schema, year)).fetchall()
+                self._tag_rows(rows)
+            tagged += len(rows)
+        self.set_sync_value(ARCHIVE_TAGS_KEY, version)
+        return tagged
+
+    def _tag_rows(self, rows):
+        """Make the mood_tags rows of (id, created_at, mood_text, counted) rows match their text
+
+        counted tells whether the entry counts in tags.entry_count, i.e. is
+        live or archived. Tags that are already indexed are left alone, so
+        tagging an entry again only writes what changed. Runs inside the
+        caller's transaction.
+        """
+        names = [mood_tags.extract_tags(row[2]) for row in rows]
+        tag_ids = {}
+        for name in set().union(*names):
+            self.conn.execute(ADD_TAG_SQL, (name,))
+            tag_ids[name] = self.conn.execute(TAG_ID_SQL, (name,)).fetchone()[0]
+        added = []
+        removed = []
+        counts = Counter()
+        for (entry_id, created_at, _, counted), entry_names in zip(rows, names):
+            new = {tag_ids[name] for name in entry_names}
+            old = {tag_id for (tag_id,) in self.conn.execute(ENTRY_TAG_IDS_SQL, (entry_id,))}
+            for tag_id in new - old:
+                added.append((tag_id, created_at, entry_id))
+                counts[tag_id] += counted
+            for tag_id in old - new:
+                removed.append((entry_id, tag_id))
+                counts[tag_id] -= counted
+        self.conn.executemany(ADD_ENTRY_TAG_SQL, added)
+        self.conn.executemany(REMOVE_ENTRY_TAG_SQL, removed)
+        self.conn.executemany(COUNT_TAG_SQL, ((change, tag_id)
+                                              for tag_id, change in counts.items() if change))
+
+    def tag_counts(self, limit=-1):
+        """Return (name, entry_count) of the tags in use, most used first
+
+        The counts are kept up to date as entries are tagged, deleted,
+        restored and archived, so this reads no entries.
+        """
+        return self.conn.execute(TAG_COUNTS_SQL, (limit,)).fetchall()
+
+    def _tag_ids(self, tags, match_all):
+        """Return the ids of the tag names, rarest first, or [] if no entry can match"""
+        found = set()
+        for name in tags:
+            name = mood_tags.normalize(name.lstrip('#'))
+            row = self.conn.execute(TAG_ID_SQL, (name,)).fetchone()
+            if row is not None:
+                found.add((row[1], row[0]))
+            elif match_all:
+                return []
+        return [tag_id for _, tag_id in sorted(found)]
+
+    def _count_tagged(self, tags, match_all, since, until):
+        """Return the number of entries in [since, until) with all or any of tags"""
+        tag_ids = self._tag_ids(tags, match_all)
+        if not tag_ids:
+            return 0
+        if len(tag_ids) == 1 and (since, until) == (MIN_TIME, MAX_TIME):
+            return self.conn.execute(TAG_ENTRY_COUNT_SQL, tag_ids).fetchone()[0]
+        sql, params = tag_filter(tag_ids, match_all, since, until, '<', (MAX_TIME, MAX_TIME))
+        return self.conn.execute(TAGGED_COUNT_SQL.format(sql), params).fetchone()[0]
+
+    def _tagged_entries(self, tags, match_all, since, until, anchor, limit, newest_first=True):
+        """Return the page of entries in [since, until) with all or any of tags next to anchor
+
+        The page holds the entries before the (created_at, id) anchor,
+        newest first, or with newest_first=False those after it, oldest first.
+        """
+        tag_ids = self._tag_ids(tags, match_all)
+        if not tag_ids:
+            return []
+        sql, params = tag_filter(tag_ids, match_all, since, until,
+                                 '<' if newest_first else '>', anchor, limit)
+        sql = TAGGED_SQL.format(sql, 'DESC' if newest_first else 'ASC')
+        entries = []
+        for *entry, year in self.conn.execute(sql, (*params, limit)).fetchall():
+            if year is not None:
+                schema = self._attach(year)
+                entry = self.conn.execute(ARCHIVE_GET_SQL.format(schema, year),
+                                          (entry[0],)).fetchone()
+            entries.append(tuple(entry))
+        return entries
+
+    # Sync
+
+    def last_change(self):
+        """Return the sequence number of the newest change log entry"""
+        return self.conn.execute(LAST_CHANGE_SQL).fetchone()[0]
+
+    def iter_changes(self, since=0, fetch_size=FETCH_SIZE):
+        """Yield the latest version of every entry changed after change log entry since
+
+        Rows are (seq, uuid, changed_at, origin, mood_text, timestamp,
+        created_at, deleted), oldest change first. Removed entries have
+        deleted set and no text. The text of archived entries is read from
+        their archive.
+        """
+        rows = stream_rows(self.conn.execute(CHANGES_SINCE_SQL, (since,)), fetch_size)
+        for *row, year in rows:
+            if year is not None:
+                schema = self._attach(year)
+                row[4:7] = self.conn.execute(ARCHIVE_UUID_SQL.format(schema, year),
+                                             (row[1],)).fetchone()
+            yield tuple(row)
+
+    def apply_changes(self, changes, stage_size=10000):
+        """Merge entry versions from another device in one transaction
+
+        changes yields (uuid, changed_at, origin, mood_text, timestamp,
+        created_at, deleted) tuples. A version is applied only if it is newer
+        than the local one, comparing (changed_at, origin), so every device
+        ends up with the same entries whatever order deltas arrive in. New
+        entries are inserted stage_size at a time. Returns (applied, skipped).
+        """
+        applied = skipped = 0
+        staged = set()
+        # Newer versions of archived entries, applied once the entries are moved back
+        deferred = []
+        deferred_ids = {}
+        self.conn.execute(CREATE_SYNC_STAGING_SQL)
+        with self.conn:
+            for change in changes:
+                uuid, changed_at, origin, mood_text, timestamp, created_at, deleted = change
+                if uuid in deferred_ids:
+                    deferred.append(change)
+                    continue
+                if uuid in staged or len(staged) >= stage_size:
+                    self._insert_staged()
+                    staged.clear()
+                local = self.conn.execute(SYNC_VERSION_SQL, (uuid,)).fetchone()
+                if local is not None:
+                    local_version = (local[1], local[2])
+                else:
+                    archived = self.conn.execute(ARCHIVED_VERSION_SQL, (uuid,)).fetchone()
+                    if archived is not None:
+                        if (changed_at, origin) <= (archived[2], archived[3]):
+                            skipped += 1
+                        else:
+                            # An archive cannot be attached inside the transaction
+                            deferred.append(change)
+                            deferred_ids[uuid] = archived[0]
+                        continue
+                    local_version = self.conn.execute(REMOVED_VERSION_SQL, (uuid,)).fetchone()
+                if local_version is not None and (changed_at, origin) <= tuple(local_version):
+                    skipped += 1
+                    continue
+                if local is not None:
+                    if not deleted and local[3] is not None and local[3] < 0:
+                        self.conn.execute(UNBULK_TOMBSTONE_SQL, (local[0],))
+                    self.conn.execute(SYNC_UPDATE_SQL, (mood_text, timestamp, created_at, deleted,
+                                                        changed_at, changed_at, origin, local[0]))
+                elif deleted:
+                    # Nothing to remove here, only remember the version
+                    self.conn.execute(REMEMBER_REMOVED_SQL, (uuid, changed_at, origin))
+                    self.conn.execute(LOG_CHANGE_SQL, (uuid, changed_at, origin))
+                else:
+                    self.conn.execute(SYNC_STAGE_SQL, (mood_text, timestamp, created_at,
+                                                       uuid, changed_at, origin))
+                    staged.add(uuid)
+                applied += 1
+            self._insert_staged()
+        if deferred:
+            self._unarchive_ids(deferred_ids.values())
+            more_applied, more_skipped = self.apply_changes(deferred, stage_size)
+            applied += more_applied
+            skipped += more_skipped
+        return applied, skipped
+
+    def _insert_staged(self):
+        """Move staged entries from another device into moods"""
+        self.conn.execute(FORGET_STAGED_SQL)
+        self.conn.execute(SYNC_UNSTAGE_SQL)
+        self.conn.execute(CLEAR_SYNC_STAGING_SQL)
+
+    def sync_value(self, key, default=None):
+        """Return a value stored with the sync state, e.g. the last exported change"""
+        row = self.conn.execute(GET_SYNC_VALUE_SQL, (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_sync_value(self, key, value):
+        """Store a value with the sync state"""
+        with self.conn:
+            self.conn.execute(SET_SYNC_VALUE_SQL, (key, value))
+
+    # Reads
+
+    def count(self, since=None, within=None, tags=None, match_all=True):
+        """Return the number of entries, optionally only those at or after since (epoch seconds)
+
+        within restricts the count to a (since, until) range, as returned by period_range().
+        tags restricts it to entries with all of the tag names, with or
+        without '#', or with any of them if match_all is false.
+        """
+        if tags:
+            since, until = within or (MIN_TIME if since is None else since, MAX_TIME)
+            return self._count_tagged(tags, match_all, since, until)
+        if within is not None:
+            since, until = within
+            total = self.conn.execute(COUNT_RANGE_SQL, within).fetchone()[0]
+        elif since is None:
+            since, until = MIN_TIME, MAX_TIME
+            total = self.conn.execute(COUNT_SQL).fetchone()[0]
+        else:
+            until = MAX_TIME
+            total = self.conn.execute(COUNT_SINCE_SQL, (since,)).fetchone()[0]
+        # Archives of years within the range count without being attached
+        for year, entry_count, year_since, year_until in self._archive_years(since, until):
+            if since <= year_since and year_until <= until:
+                total += entry_count
+            else:
+                schema = self._attach(year)
+                total += self.conn.execute(ARCHIVE_COUNT_SQL.format(schema, year),
+                                           (since, until)).fetchone()[0]
+        return total
+
+    def get_entry(self, entry_id):
+        """Return a single entry, or None if it does not exist"""
+        entry = self.conn.execute(GET_SQL, (entry_id,)).fetchone()
+        if entry is None:
+            row = self.conn.execute(ARCHIVED_YEAR_SQL, (entry_id,)).fetchone()
+            if row is not None:
+                schema = self._attach(row[0])
+                entry = self.conn.execute(ARCHIVE_GET_SQL.format(schema, row[0]),
+                                          (entry_id,)).fetchone()
+        return entry
+
+    def newest_entries(self, limit, within=None, tags=None, match_all=True):
+        """Return the most recent page of entries, optionally within a (since, until) range
+
+        tags and match_all filter the page by tag, like count().
+        """
+        if tags:
+            since, until = within or (MIN_TIME, MAX_TIME)
+            return self._tagged_entries(tags, match_all, since, until, (MAX_TIME, MAX_TIME), limit)
+        if within is not None:
+            since, until = within
+            rows = self.conn.execute(NEWEST_RANGE_SQL, (*within, limit)).fetchall()
+        else:
+            since, until = MIN_TIME, MAX_TIME
+            rows = self.conn.execute(NEWEST_SQL, (limit,)).fetchall()
+        return self._merge_archived(
+            rows, limit, since, until,
+            lambda schema, year: self.conn.execute(ARCHIVE_NEWEST_SQL.format(schema, year),
+                                                   (since, until, limit)).fetchall())
+
+    def entries_before(self, entry, limit, within=None, tags=None, match_all=True):
+        """Return the page of entries that follows entry in newest-first order"""
+        if tags:
+            since = within[0] if within is not None else MIN_TIME
+            return self._tagged_entries(tags, match_all, since, MAX_TIME,
+                                        (entry[3], entry[0]), limit)
+        if within is not None:
+            since = within[0]
+            rows = self.conn.execute(OLDER_RANGE_SQL,
+                                     (entry[3], entry[0], since, limit)).fetchall()
+        else:
+            since = MIN_TIME
+            rows = self.conn.execute(OLDER_SQL, (entry[3], entry[0], limit)).fetchall()
+        return self._merge_archived(
+            rows, limit, since, entry[3] + 1,
+            lambda schema, year: self.conn.execute(ARCHIVE_OLDER_SQL.format(schema, year),
+                                                   (entry[3], entry[0], since, limit)).fetchall())
+
+    def entries_after(self, entry, limit, within=None, tags=None, match_all=True):
+        """Return the page of entries that precedes entry, newest first"""
+        if tags:
+            until = within[1] if within is not None else MAX_TIME
+            rows = self._tagged_entries(tags, match_all, MIN_TIME, until,
+                                        (entry[3], entry[0]), limit, newest_first=False)
+            rows.reverse()
+            return rows
+        if within is not None:
+            until = within[1]
+            rows = self.conn.execute(NEWER_RANGE_SQL,
+                                     (entry[3], entry[0], until, limit)).fetchall()
+        else:
+            until = MAX_TIME
+            rows = self.conn.execute(NEWER_SQL, (entry[3], entry[0], limit)).fetchall()
+        rows = self._merge_archived(
+            rows, limit, entry[3], until,
+            lambda schema, year: self.conn.execute(ARCHIVE_NEWER_SQL.format(schema, year),
+                                                   (entry[3], entry[0], until, limit)).fetchall(),
+            newest_first=False)
+        rows.reverse()
+        return rows
+
+    def iter_entries_since(self, since, limit=-1, fetch_size=FETCH_SIZE):
+        """Yield entries at or after since (epoch seconds), newest first"""
+        entries = heapq.merge(
+            stream_rows(self.conn.execute(SINCE_SQL, (since, limit)), fetch_size),
+            self._iter_archived(ARCHIVE_SINCE_SQL, (since,), since, fetch_size=fetch_size),
+            key=entry_key, reverse=True)
+        return entries if limit < 0 else islice(entries, limit)
+
+    def search(self, text, limit=200):
+        """Return entries matching every word of text, best matches first
+
+        Matched terms are wrapped in HIGHLIGHT_START/HIGHLIGHT_END in the
+        returned mood_text. Matches in moods come first, then those of each
+        archive, newest year first.
+        """
+        terms = search_terms(text)
+        if not terms:
+            return []
+        if self.has_fts:
+            rows = self.conn.execute(SEARCH_SQL, (fts_query(text), limit)).fetchall()
+            for year, *_ in self._archive_years(newest_first=True):
+                if len(rows) >= limit:
+                    break
+                schema = self._attach(year)
+                rows += self.conn.execute(ARCHIVE_SEARCH_SQL.format(schema, year),
+                                          (fts_query(text), limit - len(rows))).fetchall()
+            return rows
+
+        # Without FTS5, fall back to a scan for the longest term
+        term = max(terms, key=len)
+        pattern = "%" + re.sub(r"([%_\\])", r"\\\1", term) + "%"
+        rows = self.conn.execute(SEARCH_LIKE_SQL, (pattern, limit)).fetchall()
+        for year, *_ in self._archive_years(newest_first=True):
+            if len(rows) >= limit:
+                break
+            schema = self._attach(year)
+            rows += self.conn.execute(ARCHIVE_SEARCH_LIKE_SQL.format(schema, year),
+                                      (pattern, limit - len(rows))).fetchall()
+        return [row for row in rows
+                if all(t.lower() in row[1].lower() for t in terms)]
+
+    # Statistics, read only from the rollup tables
+
+    def stats_summary(self, today=None):
+        """Return overall logging statistics as a dict"""
+        today = today or date.today()
+        total_entries, total_chars, days_logged, first_day, last_day = \
+            self.conn.execute(STATS_TOTALS_SQL).fetchone()
+
+        # Consecutive logged days ending today (or yesterday, if nothing yet today)
+        streak = 0
+        expected = today
+        for (day,) in stream_rows(self.conn.execute(STATS_DAYS_DESC_SQL, (today.isoformat(),)), 64):
+            logged = date.fromisoformat(day)
+            if streak == 0 and logged == today - timedelta(days=1):
+                expected = logged
+            if logged != expected:
+                break
+            streak += 1
+            expected -= timedelta(days=1)
+
+        return {
+            'total_entries': total_entries,
+            'days_logged': days_logged,
+            'first_day': first_day,
+            'last_day': last_day,
+            'entries_per_day': total_entries / days_logged if days_logged else 0.0,
+            'average_length': total_chars / total_entries if total_entries else 0.0,
+            'current_streak': streak,
+        }
+
+    def daily_stats(self, start_day, end_day):
+        """Return (day, entry_count, total_chars) rows between two ISO dates"""
+        return self.conn.execute(DAILY_STATS_SQL, (start_day, end_day)).fetchall()
+
+    def day_range(self):
+        """Return the (first, last) days with entries as ISO dates, or (None, None)"""
+        return self.conn.execute(DAY_RANGE_SQL).fetchone()
+
+    def daily_trend(self, start_day, end_day):
+        """Return (day, entry_count, average sentiment or None) rows between two ISO dates
+
+        Days without entries are left out.
+        """
+        return self.conn.execute(DAILY_TREND_SQL, (start_day, end_day)).fetchall()
+
+    def period_counts(self, period=''):
+        """Return (period, entry_count) rows, newest first, for the children of a period
+
+        The children of '' are years, of 'YYYY' months ('YYYY-MM') and of
+        'YYYY-MM' days ('YYYY-MM-DD').
+        """
+        length = CHILD_PERIOD_LENGTH[len(period)]
+        # '~' sorts after every digit, so this is a range scan over the day keys
+        return self.conn.execute(PERIOD_COUNTS_SQL, (length, period, period + '~')).fetchall()
+
+    def weekly_stats(self, limit=12):
+        """Return the latest (week_start, entry_count, total_chars) rows, newest first"""
+        return self.conn.execute(WEEKLY_STATS_SQL, (limit,)).fetchall()
+
+    def iter_entries(self, fetch_size=FETCH_SIZE, oldest_first=False):
+        """Yield every entry, newest first, without loading them all at once"""
+        if oldest_first:
+            hot = stream_rows(self.conn.execute(ITER_OLDEST_SQL), fetch_size)
+            archived = self._iter_archived(ARCHIVE_ITER_OLDEST_SQL, (), newest_first=False,
+                                           fetch_size=fetch_size)
+        else:
+            hot = stream_rows(self.conn.execute(ITER_SQL), fetch_size)
+            archived = self._iter_archived(ARCHIVE_SINCE_SQL, (MIN_TIME,), fetch_size=fetch_size)
+        return heapq.merge(hot, archived, key=entry_key, reverse=not oldest_first)
@@ -0,0 +1,718 @@
+"""Schema migrations for the mood tracker database.
+
+The schema version is stored in ``PRAGMA user_version``. Each function in
+MIGRATIONS upgrades the database by one version and runs inside its own
+transaction, so an interrupted upgrade leaves the previous version intact.
+"""
+import sqlite3
+import uuid
+
+DB_PATH = 'mood_tracker.db'
+
+# Page cache size in KiB (negative values are KiB for PRAGMA cache_size)
+CACHE_SIZE_KIB = 16384
+
+
+def create_moods_table(conn):
+    """Version 1: the original moods table"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS moods (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mood_text TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+
+
+def add_created_at_column(conn):
+    """Version 2: indexed epoch-seconds timestamp next to the display text"""
+    conn.execute("ALTER TABLE moods ADD COLUMN created_at INTEGER")
+    # Display timestamps are local time, 'utc' converts them to epoch seconds
+    conn.execute(
+        "UPDATE moods SET created_at = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_moods_created_at ON moods (created_at, id)")
+    # Fill the column for writers that only know about the text timestamp
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_fill_created_at
+        AFTER INSERT ON moods
+        WHEN NEW.created_at IS NULL
+        BEGIN
+            UPDATE moods
+            SET created_at = CAST(strftime('%s', NEW.timestamp, 'utc') AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    ''')
+
+
+def fts5_available(conn):
+    """Return whether this SQLite build includes the FTS5 extension"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def has_table(conn, name):
+    """Return whether a table or virtual table exists in the main database"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def add_full_text_index(conn):
+    """Version 3: FTS5 index over mood_text, kept in sync by triggers"""
+    if not fts5_available(conn):
+        # Search falls back to LIKE scans on SQLite builds without FTS5
+        return
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS moods_fts
+        USING fts5(mood_text, content='moods', content_rowid='id')
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_fts_insert AFTER INSERT ON moods
+        BEGIN
+            INSERT INTO moods_fts (rowid, mood_text) VALUES (NEW.id, NEW.mood_text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_fts_delete AFTER DELETE ON moods
+        BEGIN
+            INSERT INTO moods_fts (moods_fts, rowid, mood_text)
+            VALUES ('delete', OLD.id, OLD.mood_text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_fts_update AFTER UPDATE OF mood_text ON moods
+        BEGIN
+            INSERT INTO moods_fts (moods_fts, rowid, mood_text)
+            VALUES ('delete', OLD.id, OLD.mood_text);
+            INSERT INTO moods_fts (rowid, mood_text) VALUES (NEW.id, NEW.mood_text);
+        END
+    ''')
+    # One-time build of the index for existing entries
+    conn.execute("INSERT INTO moods_fts (moods_fts) VALUES ('rebuild')")
+
+
+# Local calendar day and Monday of the week of a display timestamp
+DAY_SQL = "substr({0}.timestamp, 1, 10)"
+WEEK_SQL = "date(substr({0}.timestamp, 1, 10), 'weekday 0', '-6 days')"
+
+
+def add_stats_rollups(conn):
+    """Version 4: per-day and per-week rollups maintained by triggers"""
+    for table, key in (('mood_daily_stats', 'day'), ('mood_weekly_stats', 'week_start')):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} TEXT PRIMARY KEY,
+                entry_count INTEGER NOT NULL,
+                total_chars INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_stats_insert AFTER INSERT ON moods
+        BEGIN
+            INSERT INTO mood_daily_stats (day, entry_count, total_chars)
+            VALUES ({DAY_SQL.format('NEW')}, 1, length(NEW.mood_text))
+            ON CONFLICT (day) DO UPDATE SET
+                entry_count = entry_count + 1,
+                total_chars = total_chars + excluded.total_chars;
+            INSERT INTO mood_weekly_stats (week_start, entry_count, total_chars)
+            VALUES ({WEEK_SQL.format('NEW')}, 1, length(NEW.mood_text))
+            ON CONFLICT (week_start) DO UPDATE SET
+                entry_count = entry_count + 1,
+                total_chars = total_chars + excluded.total_chars;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_stats_delete AFTER DELETE ON moods
+        BEGIN
+            UPDATE mood_daily_stats SET
+                entry_count = entry_count - 1,
+                total_chars = total_chars - length(OLD.mood_text)
+            WHERE day = {DAY_SQL.format('OLD')};
+            DELETE FROM mood_daily_stats
+            WHERE day = {DAY_SQL.format('OLD')} AND entry_count <= 0;
+            UPDATE mood_weekly_stats SET
+                entry_count = entry_count - 1,
+                total_chars = total_chars - length(OLD.mood_text)
+            WHERE week_start = {WEEK_SQL.format('OLD')};
+            DELETE FROM mood_weekly_stats
+            WHERE week_start = {WEEK_SQL.format('OLD')} AND entry_count <= 0;
+        END
+    ''')
+    # One-time backfill from existing entries
+    conn.execute(f'''
+        INSERT OR REPLACE INTO mood_daily_stats (day, entry_count, total_chars)
+        SELECT {DAY_SQL.format('moods')}, COUNT(*), SUM(length(mood_text))
+        FROM moods GROUP BY 1
+    ''')
+    conn.execute(f'''
+        INSERT OR REPLACE INTO mood_weekly_stats (week_start, entry_count, total_chars)
+        SELECT {WEEK_SQL.format('moods')}, COUNT(*), SUM(length(mood_text))
+        FROM moods GROUP BY 1
+    ''')
+
+
+# Rollup changes for an entry (NEW or OLD) entering or leaving the live set
+STATS_ADD_SQL = '''
+    INSERT INTO mood_daily_stats (day, entry_count, total_chars)
+    VALUES ({day}, 1, length({0}.mood_text))
+    ON CONFLICT (day) DO UPDATE SET
+        entry_count = entry_count + 1,
+        total_chars = total_chars + excluded.total_chars;
+    INSERT INTO mood_weekly_stats (week_start, entry_count, total_chars)
+    VALUES ({week}, 1, length({0}.mood_text))
+    ON CONFLICT (week_start) DO UPDATE SET
+        entry_count = entry_count + 1,
+        total_chars = total_chars + excluded.total_chars;
+'''
+STATS_REMOVE_SQL = '''
+    UPDATE mood_daily_stats SET
+        entry_count = entry_count - 1,
+        total_chars = total_chars - length({0}.mood_text)
+    WHERE day = {day};
+    DELETE FROM mood_daily_stats WHERE day = {day} AND entry_count <= 0;
+    UPDATE mood_weekly_stats SET
+        entry_count = entry_count - 1,
+        total_chars = total_chars - length({0}.mood_text)
+    WHERE week_start = {week};
+    DELETE FROM mood_weekly_stats WHERE week_start = {week} AND entry_count <= 0;
+'''
+
+
+def stats_sql(template, row):
+    """Fill a rollup statement template for the NEW or OLD row"""
+    return template.format(row, day=DAY_SQL.format(row), week=WEEK_SQL.format(row))
+
+
+def add_soft_delete(conn):
+    """Version 5: tombstones (deleted_at) so deletes can be undone and purged later
+
+    deleted_at is NULL for live entries and holds the tombstone token of the
+    delete otherwise. Reads go through a partial index over live entries,
+    so tombstones waiting to be purged do not slow them down. Rollups only
+    count live entries. Deleting everything uses a negative token, which the
+    per-row rollup triggers skip; the repository resets the rollups in bulk.
+    """
+    conn.execute("ALTER TABLE moods ADD COLUMN deleted_at INTEGER")
+    conn.execute("DROP INDEX IF EXISTS idx_moods_created_at")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_moods_live ON moods (created_at, id) "
+        "WHERE deleted_at IS NULL"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_moods_deleted ON moods (deleted_at) "
+        "WHERE deleted_at IS NOT NULL"
+    )
+    # Purging a tombstone must not count its entry out of the rollups twice
+    conn.execute("DROP TRIGGER IF EXISTS moods_stats_delete")
+    conn.execute(f'''
+        CREATE TRIGGER moods_stats_delete AFTER DELETE ON moods
+        WHEN OLD.deleted_at IS NULL
+        BEGIN
+            {stats_sql(STATS_REMOVE_SQL, 'OLD')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_stats_tombstone AFTER UPDATE OF deleted_at ON moods
+        WHEN OLD.deleted_at IS NULL AND NEW.deleted_at > 0
+        BEGIN
+            {stats_sql(STATS_REMOVE_SQL, 'OLD')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_stats_restore AFTER UPDATE OF deleted_at ON moods
+        WHEN OLD.deleted_at > 0 AND NEW.deleted_at IS NULL
+        BEGIN
+            {stats_sql(STATS_ADD_SQL, 'NEW')}
+        END
+    ''')
+
+
+# SQL expression for a new entry or device id: 12 hex digits of the time in
+# milliseconds and 20 random ones, so new ids are appended to the uuid index
+NEW_ID_SQL = (
+    "printf('%012x', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)) "
+    "|| lower(hex(randomblob(10)))"
+)
+
+# Namespace of the ids given to entries that existed before sync was added
+LEGACY_ENTRY_NAMESPACE = uuid.UUID('ffa8f22c-868b-4bcc-bbb9-ee50fe73f311')
+
+# Current time in microseconds, the unit of tombstone tokens and change times
+NOW_MICROSECONDS_SQL = "CAST(round((julianday('now') - 2440587.5) * 86400000) AS INTEGER) * 1000"
+
+DEVICE_ID_SQL = "(SELECT value FROM sync_meta WHERE key = 'device_id')"
+
+
+def legacy_entry_id(entry_id, created_at, mood_text):
+    """Return the id of an existing entry, the same in every copy of a database file"""
+    return uuid.uuid5(LEGACY_ENTRY_NAMESPACE, f"{entry_id}|{created_at}|{mood_text}").hex
+
+
+def add_sync_log(conn):
+    """Version 6: stable entry ids and an append-only change log for delta sync
+
+    Every entry gets a uuid and the version of its last change: changed_at
+    (microseconds) and the origin device. Triggers append a row to
+    mood_changes whenever that version changes, so the entries changed
+    since a sync point can be found without scanning moods.
+    mood_removed keeps the last version of entries that are no longer in
+    moods, so older versions of them are not brought back by a sync.
+
+    Existing entries get ids derived from their content and an empty
+    origin, so copies of the same database file agree on them.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f"INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('device_id', {NEW_ID_SQL})")
+
+    conn.execute("ALTER TABLE moods ADD COLUMN uuid TEXT")
+    conn.execute("ALTER TABLE moods ADD COLUMN changed_at INTEGER")
+    conn.execute("ALTER TABLE moods ADD COLUMN origin TEXT")
+    conn.create_function('legacy_entry_id', 3, legacy_entry_id, deterministic=True)
+    conn.execute('''
+        UPDATE moods SET
+            uuid = legacy_entry_id(id, created_at, mood_text),
+            changed_at = coalesce(abs(deleted_at), created_at * 1000000),
+            origin = ''
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_moods_uuid ON moods (uuid)")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            uuid TEXT NOT NULL,
+            changed_at INTEGER NOT NULL,
+            origin TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_removed (
+            uuid TEXT PRIMARY KEY,
+            changed_at INTEGER NOT NULL,
+            origin TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT INTO mood_changes (uuid, changed_at, origin)
+        SELECT uuid, changed_at, origin FROM moods ORDER BY id
+    ''')
+
+    # Writers that do not know about sync still get an id and a version
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_sync_fill AFTER INSERT ON moods
+        WHEN NEW.uuid IS NULL OR NEW.changed_at IS NULL
+        BEGIN
+            UPDATE moods SET
+                uuid = coalesce(uuid, {NEW_ID_SQL}),
+                changed_at = coalesce(changed_at, {NOW_MICROSECONDS_SQL}),
+                origin = coalesce(origin, {DEVICE_ID_SQL})
+            WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_changes_insert AFTER INSERT ON moods
+        WHEN NEW.uuid IS NOT NULL AND NEW.changed_at IS NOT NULL
+        BEGIN
+            INSERT INTO mood_changes (uuid, changed_at, origin)
+            VALUES (NEW.uuid, NEW.changed_at, NEW.origin);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_changes_update AFTER UPDATE OF changed_at, origin ON moods
+        WHEN NEW.uuid IS NOT NULL AND NEW.changed_at IS NOT NULL
+        BEGIN
+            INSERT INTO mood_changes (uuid, changed_at, origin)
+            VALUES (NEW.uuid, NEW.changed_at, NEW.origin);
+        END
+    ''')
+    # Purging a tombstone is not a change, removing a live entry directly is
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_changes_delete AFTER DELETE ON moods
+        WHEN OLD.uuid IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO mood_removed (uuid, changed_at, origin)
+            SELECT OLD.uuid, {NOW_MICROSECONDS_SQL}, {DEVICE_ID_SQL} WHERE OLD.deleted_at IS NULL
+            UNION ALL
+            SELECT OLD.uuid, OLD.changed_at, OLD.origin WHERE OLD.deleted_at IS NOT NULL;
+            INSERT INTO mood_changes (uuid, changed_at, origin)
+            SELECT uuid, changed_at, origin FROM mood_removed
+            WHERE uuid = OLD.uuid AND OLD.deleted_at IS NULL;
+        END
+    ''')
+    # Synced edits can change the text or day of a live entry
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_stats_update AFTER UPDATE OF mood_text, timestamp ON moods
+        WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NULL
+        BEGIN
+            {stats_sql(STATS_REMOVE_SQL, 'OLD')}
+            {stats_sql(STATS_ADD_SQL, 'NEW')}
+        END
+    ''')
+
+
+def add_sentiment(conn):
+    """Version 7: sentiment score of each entry and the lexicon version it was scored with
+
+    sentiment_version is 0 for entries that have not been scored yet, which
+    is what writers that do not know about sentiment leave behind. Its
+    index finds the entries scored with an older lexicon without a scan.
+    """
+    conn.execute("ALTER TABLE moods ADD COLUMN sentiment REAL")
+    conn.execute("ALTER TABLE moods ADD COLUMN sentiment_version INTEGER NOT NULL DEFAULT 0")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_moods_sentiment_version ON moods (sentiment_version)"
+    )
+    # Synced edits change the text, so the entry has to be scored again
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_sentiment_reset AFTER UPDATE OF mood_text ON moods
+        WHEN NEW.mood_text IS NOT OLD.mood_text
+        BEGIN
+            UPDATE moods SET sentiment = NULL, sentiment_version = 0 WHERE id = NEW.id;
+        END
+    ''')
+
+
+# Per-day sentiment changes for an entry (NEW or OLD) that counts, or stops
+# counting, with sign 1 or -1. Upserts and sums commute and emptied days are
+# removed afterwards, so the result does not depend on the order triggers fire in.
+SENTIMENT_STATS_SQL = '''
+    INSERT INTO mood_daily_sentiment (day, scored_count, sentiment_total)
+    SELECT {day}, {sign}, {sign} * {0}.sentiment WHERE {condition}
+    ON CONFLICT (day) DO UPDATE SET
+        scored_count = scored_count + excluded.scored_count,
+        sentiment_total = sentiment_total + excluded.sentiment_total;
+    DELETE FROM mood_daily_sentiment WHERE day = {day} AND scored_count = 0;
+'''
+
+
+def sentiment_stats_sql(row, sign, condition):
+    """Fill SENTIMENT_STATS_SQL for the NEW or OLD row"""
+    return SENTIMENT_STATS_SQL.format(row, day=DAY_SQL.format(row), sign=sign,
+                                      condition=condition)
+
+
+def add_sentiment_rollups(conn):
+    """Version 8: per-day count and total of sentiment scores, for the trend chart
+
+    Kept apart from mood_daily_stats because entries are scored after they
+    are inserted. Scored live entries count; like the other rollups, the
+    triggers skip the negative tombstones of delete_all(), whose rollups
+    the repository maintains in bulk.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_daily_sentiment (
+            day TEXT PRIMARY KEY,
+            scored_count INTEGER NOT NULL,
+            sentiment_total REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_sentiment_stats_insert AFTER INSERT ON moods
+        WHEN NEW.sentiment IS NOT NULL AND NEW.deleted_at IS NULL
+        BEGIN
+            {sentiment_stats_sql('NEW', 1, 'true')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_sentiment_stats_delete AFTER DELETE ON moods
+        WHEN OLD.sentiment IS NOT NULL AND OLD.deleted_at IS NULL
+        BEGIN
+            {sentiment_stats_sql('OLD', -1, 'true')}
+        END
+    ''')
+    # Resetting a score, moving an entry to another day, deleting and restoring it.
+    # Scoring raises sentiment_version; score_entries() updates the rollups of
+    # the entries it scores in bulk.
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS moods_sentiment_stats_update
+        AFTER UPDATE OF sentiment, timestamp, deleted_at ON moods
+        WHEN coalesce(OLD.deleted_at, 0) >= 0 AND coalesce(NEW.deleted_at, 0) >= 0
+            AND (OLD.sentiment IS NOT NULL OR NEW.sentiment IS NOT NULL)
+            AND NEW.sentiment_version <= OLD.sentiment_version
+        BEGIN
+            {sentiment_stats_sql('OLD', -1, 'OLD.sentiment IS NOT NULL AND OLD.deleted_at IS NULL')}
+            {sentiment_stats_sql('NEW', 1, 'NEW.sentiment IS NOT NULL AND NEW.deleted_at IS NULL')}
+        END
+    ''')
+    # One-time backfill from existing entries
+    conn.execute(f'''
+        INSERT OR REPLACE INTO mood_daily_sentiment (day, scored_count, sentiment_total)
+        SELECT {DAY_SQL.format('moods')}, COUNT(*), SUM(sentiment)
+        FROM moods WHERE sentiment IS NOT NULL AND deleted_at IS NULL GROUP BY 1
+    ''')
+
+
+def add_archive_index(conn):
+    """Version 9: the index of entries moved to the per-year archive files
+
+    mood_archived lists every archived entry with the year of its archive
+    and its sync version, so sync can compare versions and reads can find
+    the archive of an entry without opening any of them. A row of an
+    archive file only counts while it is listed here, which makes moving
+    entries in or out of an archive a single transaction on this database.
+    mood_archive_years counts the archived entries of each year. The
+    rollups keep counting archived entries.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_archived (
+            id INTEGER PRIMARY KEY,
+            uuid TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            changed_at INTEGER NOT NULL,
+            origin TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mood_archived_uuid ON mood_archived (uuid)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_archive_years (
+            year INTEGER PRIMARY KEY,
+            entry_count INTEGER NOT NULL
+        )
+    ''')
+
+
+def add_tags(conn):
+    """Version 10: inverted index of the hashtags in entries
+
+    tags holds every tag name once with the number of entries carrying it
+    that count: live and archived ones. mood_tags has a row per tag of an
+    entry, keyed (tag_id, created_at, mood_id) so the entries of a tag come
+    out of the key in page order; its (mood_id, tag_id) index finds the
+    tags of an entry. Rows stay while an entry is tombstoned or archived,
+    reads skip tombstones. Tags are parsed in Python: tags_version is 0 for
+    entries whose tags are not indexed yet, like sentiment_version. Like
+    the rollups, the count triggers skip the negative tombstones of
+    delete_all() and of moving entries to an archive.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            entry_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_tags (
+            tag_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            mood_id INTEGER NOT NULL,
+            PRIMARY KEY (tag_id, created_at, mood_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mood_tags_mood ON mood_tags (mood_id, tag_id)")
+    conn.execute("ALTER TABLE moods ADD COLUMN tags_version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_moods_tags_version ON moods (tags_version)")
+    for name, condition, change in (
+            ('moods_tags_tombstone', 'OLD.deleted_at IS NULL AND NEW.deleted_at > 0', '- 1'),
+            ('moods_tags_restore', 'OLD.deleted_at > 0 AND NEW.deleted_at IS NULL', '+ 1')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name} AFTER UPDATE OF deleted_at ON moods
+            WHEN {condition}
+            BEGIN
+                UPDATE tags SET entry_count = entry_count {change}
+                WHERE id IN (SELECT tag_id FROM mood_tags WHERE mood_id = OLD.id);
+            END
+        ''')
+    # Entries moved to an archive are listed in mood_archived first and keep their tags
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_tags_delete AFTER DELETE ON moods
+        BEGIN
+            UPDATE tags SET entry_count = entry_count - 1
+            WHERE OLD.deleted_at IS NULL
+                AND id IN (SELECT tag_id FROM mood_tags WHERE mood_id = OLD.id);
+            DELETE FROM mood_tags
+            WHERE mood_id = OLD.id AND NOT EXISTS (SELECT 1 FROM mood_archived WHERE id = OLD.id);
+        END
+    ''')
+    # Synced edits: new text has to be tagged again, a new time moves the index rows
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_tags_reset AFTER UPDATE OF mood_text ON moods
+        WHEN NEW.mood_text IS NOT OLD.mood_text
+        BEGIN
+            UPDATE moods SET tags_version = 0 WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS moods_tags_move AFTER UPDATE OF created_at ON moods
+        WHEN NEW.created_at IS NOT OLD.created_at
+        BEGIN
+            UPDATE mood_tags SET created_at = coalesce(NEW.created_at, 0) WHERE mood_id = NEW.id;
+        END
+    ''')
+
+
+def quiet_archive_moves(conn):
+    """Version 11: entries inserted with a negative tombstone are not logged as changes
+
+    Moving entries back from an archive inserts them with a negative token
+    and clears it in the same transaction, like moving them out; the
+    change log keeps the versions they had before they were archived.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS moods_changes_insert")
+    conn.execute('''
+        CREATE TRIGGER moods_changes_insert AFTER INSERT ON moods
+        WHEN NEW.uuid IS NOT NULL AND NEW.changed_at IS NOT NULL
+            AND coalesce(NEW.deleted_at, 0) >= 0
+        BEGIN
+            INSERT INTO mood_changes (uuid, changed_at, origin)
+            VALUES (NEW.uuid, NEW.changed_at, NEW.origin);
+        END
+    ''')
+
+
+MIGRATIONS = [
+    create_moods_table,
+    add_created_at_column,
+    add_full_text_index,
+    add_stats_rollups,
+    add_soft_delete,
+    add_sync_log,
+    add_sentiment,
+    add_sentiment_rollups,
+    add_archive_index,
+    add_tags,
+    quiet_archive_moves,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Version that introduced tombstones, after which the file uses incremental auto-vacuum
+SOFT_DELETE_VERSION = 5
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def configure_connection(conn):
+    """Apply the connection pragmas used for every mood tracker database"""
+    # Only takes effect on new databases; migrate() converts existing ones
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def enable_incremental_vacuum(conn):
+    """Switch the file to incremental auto-vacuum so purged pages can be released
+
+    Changing auto_vacuum on an existing database needs a VACUUM, which
+    rewrites the file and cannot run inside a transaction. Returns whether
+    the file was converted.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def device_id(conn):
+    """Return the id that marks changes made on this copy of the database"""
+    return conn.execute("SELECT value FROM sync_meta WHERE key = 'device_id'").fetchone()[0]
+
+
+def schema_version(conn):
+    """Return the schema version stored in the database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Upgrade the database to SCHEMA_VERSION, returning the starting version"""
+    start_version = schema_version(conn)
+    if start_version > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Database schema version {start_version} is newer than this "
+            f"application supports ({SCHEMA_VERSION})"
+        )
+
+    for version in range(start_version + 1, SCHEMA_VERSION + 1):
+        conn.execute("BEGIN")
+        try:
+            MIGRATIONS[version - 1](conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    if start_version < SOFT_DELETE_VERSION <= SCHEMA_VERSION:
+        enable_incremental_vacuum(conn)
+    return start_version
+
+
+# Schema version of the per-year archive files, kept in their own user_version
+ARCHIVE_SCHEMA_VERSION = 1
+
+
+def create_archive_schema(conn, schema):
+    """Create the tables of the archive file attached as schema, if it is new
+
+    An archive holds entries as they were in moods when they were moved,
+    without tombstones, with the same ids and its own full-text index.
+    """
+    version = conn.execute(f"PRAGMA {schema}.user_version").fetchone()[0]
+    if version > ARCHIVE_SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Archive schema version {version} is newer than this application supports "
+            f"({ARCHIVE_SCHEMA_VERSION})"
+        )
+    if version == ARCHIVE_SCHEMA_VERSION:
+        return
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.moods (
+                id INTEGER PRIMARY KEY,
+                mood_text TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                uuid TEXT NOT NULL,
+                changed_at INTEGER NOT NULL,
+                origin TEXT NOT NULL,
+                sentiment REAL,
+                sentiment_version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}.idx_moods_created_at ON moods (created_at, id)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_moods_uuid ON moods (uuid)")
+        if fts5_available(conn):
+            conn.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.moods_fts
+                USING fts5(mood_text, content='moods', content_rowid='id')
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {schema}.moods_fts_insert AFTER INSERT ON moods
+                BEGIN
+                    INSERT INTO moods_fts (rowid, mood_text) VALUES (NEW.id, NEW.mood_text);
+                END
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {schema}.moods_fts_delete AFTER DELETE ON moods
+                BEGIN
+                    INSERT INTO moods_fts (moods_fts, rowid, mood_text)
+                    VALUES ('delete', OLD.id, OLD.mood_text);
+                END
+            ''')
+        conn.execute(f"PRAGMA {schema}.user_version = {ARCHIVE_SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def connect(path=DB_PATH):
+    """Open, configure and migrate a mood tracker database"""
+    conn = sqlite3.connect(path)
+    configure_connection(conn)
+    migrate(conn)
+    return conn
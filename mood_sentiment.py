@@ -0,0 +1,177 @@
+"""Offline lexicon-based sentiment scores for mood entries.
+
+Every word found in LEXICON adds its valence (-3 to 3) to the entry's
+total. A booster word right before it ("very happy") strengthens it, and a
+negation among the NEGATION_WINDOW words before it ("not happy at all")
+flips and dampens it. The total is squashed into a score between -1 and 1.
+
+score_texts() scores a batch at once. With NumPy installed the whole batch
+is tokenized in one pass and the rules run as array operations; without it
+the same rules run in plain Python, which is slower but gives the same
+scores. Scores are stored next to each entry with LEXICON_VERSION, so they
+are only computed again after the lexicon or the rules change.
+"""
+from itertools import repeat
+
+# Bump whenever LEXICON or the scoring rules change, so stored scores are recomputed
+LEXICON_VERSION = 1
+
+LEXICON = {
+    # Positive
+    'accomplished': 2.0, 'alive': 1.5, 'amazing': 3.0, 'awesome': 3.0, 'better': 1.5,
+    'blessed': 2.5, 'bright': 1.5, 'calm': 2.0, 'cheerful': 2.5, 'comfortable': 1.5,
+    'confident': 2.0, 'content': 2.0, 'delighted': 3.0, 'eager': 1.5, 'energetic': 2.0,
+    'enjoy': 2.0, 'enjoyed': 2.0, 'excited': 2.5, 'fantastic': 3.0, 'fine': 0.8,
+    'focused': 1.5, 'free': 1.2, 'fun': 2.0, 'glad': 2.0, 'good': 1.9, 'grateful': 2.5,
+    'great': 3.0, 'happy': 2.7, 'healthy': 1.5, 'helpful': 1.5, 'hopeful': 2.0,
+    'improve': 1.2, 'improved': 1.5, 'inspired': 2.5, 'joy': 3.0, 'joyful': 3.0,
+    'kind': 1.5, 'laugh': 2.0, 'laughed': 2.0, 'like': 1.0, 'love': 3.0, 'loved': 3.0,
+    'lovely': 2.8, 'lucky': 2.0, 'motivated': 2.0, 'nice': 1.8, 'ok': 0.5, 'okay': 0.5,
+    'optimistic': 2.0, 'peaceful': 2.2, 'pleased': 2.2, 'productive': 1.8, 'proud': 2.2,
+    'refreshed': 2.0, 'relaxed': 2.2, 'relieved': 1.8, 'rested': 1.5, 'safe': 1.5,
+    'satisfied': 2.0, 'smile': 2.0, 'strong': 1.5, 'success': 2.5, 'successful': 2.5,
+    'thankful': 2.5, 'thrilled': 3.0, 'wonderful': 3.0,
+    # Negative
+    'afraid': -2.0, 'alone': -1.5, 'angry': -2.7, 'annoyed': -2.0, 'anxious': -2.3,
+    'ashamed': -2.3, 'awful': -3.0, 'bad': -2.5, 'bored': -1.5, 'broken': -2.0,
+    'cried': -2.0, 'cry': -2.0, 'depressed': -3.0, 'disappointed': -2.2,
+    'drained': -2.0, 'dread': -2.5, 'empty': -2.0, 'exhausted': -2.2, 'fear': -2.2,
+    'frustrated': -2.3, 'guilty': -2.0, 'hate': -3.0, 'headache': -1.8, 'hopeless': -3.0,
+    'horrible': -3.0, 'hurt': -2.2, 'irritated': -2.0, 'lonely': -2.3, 'lost': -1.5,
+    'mad': -2.2, 'miserable': -3.0, 'nervous': -1.8, 'overwhelmed': -2.3, 'pain': -2.3,
+    'panic': -2.8, 'restless': -1.5, 'sad': -2.5, 'scared': -2.2, 'sick': -2.0,
+    'sore': -1.2, 'stressed': -2.3, 'stuck': -1.5, 'terrible': -3.0, 'tense': -1.5,
+    'tired': -1.5, 'ugly': -2.0, 'unhappy': -2.5, 'upset': -2.3, 'useless': -2.5,
+    'weak': -1.5, 'worried': -2.2, 'worry': -2.0, 'worse': -2.2, 'worst': -3.0,
+}
+
+# Words that flip the valence of the words right after them. Apostrophes
+# split words, so "t" stands for the n't of "don't", "isn't" and so on.
+NEGATIONS = frozenset({
+    'not', 'no', 'never', 'nothing', 'nobody', 'none', 'neither', 'nor', 'without',
+    'cannot', 't',
+})
+# Words that strengthen the word right after them
+BOOSTERS = frozenset({
+    'very', 'really', 'so', 'extremely', 'incredibly', 'super', 'totally', 'truly',
+    'absolutely', 'completely', 'deeply', 'quite', 'too',
+})
+
+# Words after a negation that are negated, and how a negation scales a valence
+NEGATION_WINDOW = 3
+NEGATION_FACTOR = -0.74
+BOOSTER_FACTOR = 1.3
+# Larger values need more sentiment words to approach -1 or 1
+NORMALIZE_ALPHA = 15.0
+
+# Texts are tokenized as UTF-8 bytes: ASCII letters are lower-cased, every
+# other ASCII character separates words and non-ASCII bytes are kept, so
+# bytes.translate() and bytes.split() do all the work in C. NUL is kept for
+# the separator of a batch.
+WORD_BYTES = frozenset(range(ord('a'), ord('z') + 1)) | frozenset(range(128, 256)) | {0}
+TOKEN_TABLE = bytes(
+    byte if byte in WORD_BYTES else byte + 32 if ord('A') <= byte <= ord('Z') else ord(' ')
+    for byte in range(256)
+)
+# Joins the texts of a batch, as a word of its own
+SEPARATOR = '\x00'
+
+VALENCES = {word.encode(): value for word, value in LEXICON.items()}
+NEGATION_WORDS = frozenset(word.encode() for word in NEGATIONS)
+BOOSTER_WORDS = frozenset(word.encode() for word in BOOSTERS)
+
+
+# The numpy module once load_numpy() has run, None if it is not installed
+np = False
+
+
+def load_numpy():
+    """Return the numpy module, or None if it is not installed
+
+    Imported on first use rather than with this module, since loading it
+    would slow down the start of the command line tool.
+    """
+    global np
+    if np is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
+
+def normalize(total):
+    """Squash a valence total into a score between -1 and 1"""
+    return total / (total * total + NORMALIZE_ALPHA) ** 0.5
+
+
+def tokenize(text):
+    """Return the words of text as lower-case UTF-8 bytes"""
+    text = text.replace('\u2019', "'")
+    return text.encode('utf-8', 'replace').translate(TOKEN_TABLE).split()
+
+
+def score_text(text):
+    """Return the sentiment score of one text, between -1 (negative) and 1 (positive)"""
+    tokens = tokenize(text)
+    total = 0.0
+    for i, token in enumerate(tokens):
+        value = VALENCES.get(token)
+        if value is None:
+            continue
+        if i and tokens[i - 1] in BOOSTER_WORDS:
+            value *= BOOSTER_FACTOR
+        if not NEGATION_WORDS.isdisjoint(tokens[max(0, i - NEGATION_WINDOW):i]):
+            value *= NEGATION_FACTOR
+        total += value
+    return normalize(total)
+
+
+# Word codes for the vectorized scorer: 0 for unknown words, then the
+# separator, negations, boosters and the lexicon words
+WORD_CODES = {SEPARATOR.encode(): 1}
+for _word in (*sorted(NEGATION_WORDS), *sorted(BOOSTER_WORDS), *VALENCES):
+    WORD_CODES[_word] = len(WORD_CODES) + 1
+del _word
+SEPARATOR_CODE = 1
+LAST_NEGATION_CODE = SEPARATOR_CODE + len(NEGATIONS)
+LAST_BOOSTER_CODE = LAST_NEGATION_CODE + len(BOOSTERS)
+
+
+def _score_batch_numpy(texts):
+    """score_texts() with NumPy: one tokenizer pass over the batch, then array operations"""
+    joined = f" {SEPARATOR} ".join(texts)
+    if joined.count(SEPARATOR) != len(texts) - 1:
+        # A text contains the separator itself
+        return [score_text(text) for text in texts]
+    tokens = tokenize(joined)
+    codes = np.fromiter(map(WORD_CODES.get, tokens, repeat(0)), dtype=np.int32, count=len(tokens))
+
+    valence_table = np.zeros(len(WORD_CODES) + 1)
+    valence_table[LAST_BOOSTER_CODE + 1:] = list(VALENCES.values())
+    values = valence_table[codes]
+    doc = np.cumsum(codes == SEPARATOR_CODE)
+    is_negation = (codes > SEPARATOR_CODE) & (codes <= LAST_NEGATION_CODE)
+    is_booster = (codes > LAST_NEGATION_CODE) & (codes <= LAST_BOOSTER_CODE)
+
+    # Booster right before a word, negation within the window, in the same text
+    boosted = np.zeros(len(codes), dtype=bool)
+    boosted[1:] = is_booster[:-1] & (doc[1:] == doc[:-1])
+    negated = np.zeros(len(codes), dtype=bool)
+    for distance in range(1, NEGATION_WINDOW + 1):
+        negated[distance:] |= is_negation[:-distance] & (doc[distance:] == doc[:-distance])
+
+    values = np.where(boosted, values * BOOSTER_FACTOR, values)
+    values = np.where(negated, values * NEGATION_FACTOR, values)
+    totals = np.bincount(doc, weights=values, minlength=len(texts))
+    return (totals / np.sqrt(totals * totals + NORMALIZE_ALPHA)).tolist()
+
+
+def score_texts(texts):
+    """Return the sentiment scores of a list of texts, vectorized when NumPy is available"""
+    if not texts:
+        return []
+    if load_numpy() is None:
+        return [score_text(text) for text in texts]
+    return _score_batch_numpy(texts)
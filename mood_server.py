@@ -0,0 +1,302 @@
+"""Local JSON API for logging and reading moods without the Tk window.
+
+A small HTTP/1.1 server built on asyncio streams, so it needs nothing
+beyond the standard library:
+
+    GET  /health                       server status and write statistics
+    GET  /moods?limit=50&since=EPOCH   entries, newest first
+    POST /moods                        {"mood_text": "..."} or a text/plain body
+    GET  /search?q=walk&limit=50       full-text search
+    GET  /stats                        the statistics summary
+
+All SQLite work runs on one executor thread that owns the connection.
+Saved entries are queued and group-committed: the writer takes every entry
+that is waiting (up to batch_size, after waiting at most batch_window for
+more) and inserts them in one transaction, so a burst of requests shares a
+commit instead of paying for one each. A request is answered once its
+entry is committed.
+
+Start it with ``python mood_cli.py serve``. It listens on localhost unless
+--host is given; set --token to require ``Authorization: Bearer <token>``.
+"""
+import asyncio
+import hmac
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import mood_schema
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Entries committed per transaction at most, and how long the writer waits for more
+BATCH_SIZE = 500
+BATCH_WINDOW_SECONDS = 0.002
+
+# Largest request body accepted, and how long a client may take to send the request
+# line and headers, or the body, of a request before the connection is closed
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT_SECONDS = 30
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+ENTRY_FIELDS = ('id', 'mood_text', 'timestamp', 'created_at')
+
+
+class HTTPError(Exception):
+    """Raised by a request handler to answer with an error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def entry_json(entry):
+    """Return an entry tuple as a JSON object"""
+    return dict(zip(ENTRY_FIELDS, entry))
+
+
+def int_param(query, name, default=None, maximum=None, minimum=None):
+    """Return an integer query parameter, clamped to maximum and at least minimum"""
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be at least {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+
+def read_mood_text(headers, body):
+    """Return the mood text of a POST body, which is JSON or plain text"""
+    if headers.get('content-type', '').startswith('text/plain'):
+        text = body.decode('utf-8', errors='replace')
+    else:
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON or text/plain")
+        text = payload.get('mood_text') if isinstance(payload, dict) else None
+        if not isinstance(text, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body needs a 'mood_text' string")
+    text = text.strip()
+    if not text:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Please enter your mood before saving.")
+    return text
+
+
+class MoodServer:
+    """Serves the JSON API for one database"""
+
+    def __init__(self, db_path=mood_schema.DB_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 token=None, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW_SECONDS):
+        self.db_path = db_path
+        self.host = host
+        self.port = port
+        self.token = token
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.repo = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mood-server-db')
+        self._server = None
+        self._writes = None
+        self._writer = None
+        # Write statistics shown by /health and the load test
+        self.entries_written = 0
+        self.commits = 0
+        self.largest_batch = 0
+
+    async def run_db(self, func, *args):
+        """Run func(*args) on the thread that owns the database connection"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def start(self):
+        """Open the database and start listening; port 0 picks a free port"""
+        from mood_repository import MoodRepository
+
+        self.repo = await self.run_db(MoodRepository, self.db_path)
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_batches())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        """Stop accepting requests, commit queued entries and close the database"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._writer is not None:
+            await self._writes.put(None)
+            await self._writer
+        if self.repo is not None:
+            await self.run_db(self.repo.close)
+        self._executor.shutdown()
+
+    async def serve_forever(self):
+        """Serve until cancelled, e.g. by Ctrl+C"""
+        await self.start()
+        print(f"Serving {self.db_path} on http://{self.host}:{self.port}")
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    # Group commit
+
+    async def add_entry(self, mood_text):
+        """Queue an entry for the next commit and return it once it is saved"""
+        saved = asyncio.get_running_loop().create_future()
+        await self._writes.put((mood_text, datetime.now(), saved))
+        return await saved
+
+    async def _next_batch(self):
+        """Wait for queued entries and return up to batch_size of them, or None to stop"""
+        first = await self._writes.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            if self._writes.empty():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._writes.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._writes.get_nowait()
+            if item is None:
+                # Stop after this batch
+                self._writes.put_nowait(None)
+                break
+            batch.append(item)
+        return batch
+
+    async def _write_batches(self):
+        while True:
+            batch = await self._next_batch()
+            if batch is None:
+                return
+            try:
+                entries = await self.run_db(self.repo.add_entry_batch,
+                                            [(text, when) for text, when, _ in batch])
+            except Exception as e:
+                for _, _, saved in batch:
+                    if not saved.done():
+                        saved.set_exception(e)
+                continue
+            self.commits += 1
+            self.entries_written += len(entries)
+            self.largest_batch = max(self.largest_batch, len(entries))
+            for (_, _, saved), entry in zip(batch, entries):
+                if not saved.done():
+                    saved.set_result(entry)
+
+    # HTTP
+
+    async def _read_head(self, reader):
+        """Return (method, target, version, headers) of the next request, or None at the end"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        method, target, version = request_line.decode('latin-1').split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                # One deadline for the whole head, so headers sent a byte at a time time out
+                head = await asyncio.wait_for(self._read_head(reader), IDLE_TIMEOUT_SECONDS)
+                if head is None:
+                    break
+                method, target, version, headers = head
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {'error': "Request body is too large"}, keep_alive=False)
+                    break
+                body = (await asyncio.wait_for(reader.readexactly(length), IDLE_TIMEOUT_SECONDS)
+                        if length else b'')
+
+                try:
+                    status, payload = await self.dispatch(method, target, headers, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+                keep_alive = (version == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        """Handle one request and return (status, JSON payload)"""
+        if self.token is not None and not hmac.compare_digest(
+                headers.get('authorization', '').encode('latin-1'),
+                f"Bearer {self.token}".encode('utf-8')):
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Missing or wrong token")
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        route = (method, url.path.rstrip('/') or '/')
+
+        if route == ('GET', '/health'):
+            return HTTPStatus.OK, {
+                'status': 'ok',
+                'queued_writes': self._writes.qsize(),
+                'entries_written': self.entries_written,
+                'commits': self.commits,
+                'largest_batch': self.largest_batch,
+            }
+        if route == ('POST', '/moods'):
+            entry = await self.add_entry(read_mood_text(headers, body))
+            return HTTPStatus.CREATED, entry_json(entry)
+        if route == ('GET', '/moods'):
+            limit = int_param(query, 'limit', DEFAULT_LIMIT, MAX_LIMIT, minimum=1)
+            since = int_param(query, 'since', -2 ** 63)
+            entries = await self.run_db(
+                lambda: list(self.repo.iter_entries_since(since, limit)))
+            return HTTPStatus.OK, [entry_json(entry) for entry in entries]
+        if route == ('GET', '/search'):
+            text = (query.get('q') or [''])[0]
+            limit = int_param(query, 'limit', DEFAULT_LIMIT, MAX_LIMIT, minimum=1)
+            entries = await self.run_db(self.repo.search, text, limit)
+            return HTTPStatus.OK, [entry_json(entry) for entry in entries]
+        if route == ('GET', '/stats'):
+            return HTTPStatus.OK, await self.run_db(self.repo.stats_summary)
+
+        if url.path.rstrip('/') in ('/health', '/moods', '/search', '/stats'):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported here")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No such endpoint: {url.path}")
@@ -0,0 +1,62 @@
+"""Snapshot of the newest page of entries for an instant first paint.
+
+The GUI writes the newest page of entries to a small JSON file when it
+closes, together with the database's change counter: the sequence number of
+its newest change log entry, which every insert, delete, restore and synced
+change raises. On the next start the window paints that page before the
+database is even open. The database worker then reads the counter again,
+and the page is only loaded from the database if it differs.
+
+Imports nothing but the standard library, so reading a snapshot costs no
+more than parsing the file.
+"""
+import json
+import os
+
+SNAPSHOT_FILE = 'mood_tracker_snapshot.json'
+# Bump whenever the file layout changes; snapshots of other versions are ignored
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_path(config_file):
+    """Return the path of the snapshot next to the configuration file"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), SNAPSHOT_FILE)
+
+
+def save_snapshot(repo, path, db_path, limit):
+    """Write the newest limit entries of repo with its change counter to path
+
+    Runs on the database worker, after every queued write. The file is
+    replaced atomically, so a crash never leaves half a snapshot.
+    """
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'database': os.path.abspath(db_path),
+        'change': repo.last_change(),
+        'total_entries': repo.count(),
+        'entries': repo.newest_entries(limit),
+    }
+    partial = path + '.partial'
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(partial, path)
+    return snapshot
+
+
+def load_snapshot(path, db_path):
+    """Return the snapshot at path if it was taken of db_path, else None
+
+    The entries come back as tuples, like those of MoodRepository. A
+    missing, unreadable or outdated file is not an error: the list is then
+    loaded from the database as usual.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if (snapshot['version'] != SNAPSHOT_VERSION
+                or snapshot['database'] != os.path.abspath(db_path)):
+            return None
+        snapshot['entries'] = [tuple(entry) for entry in snapshot['entries']]
+        return snapshot
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
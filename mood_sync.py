@@ -0,0 +1,126 @@
+"""Delta sync of mood entries between copies of a journal.
+
+Triggers log every change to an entry in the mood_changes table (see
+mood_schema.add_sync_log). A delta file holds the latest version of each
+entry changed since a change log position: a header line followed by one
+JSON object per entry, gzip-compressed if the file name ends in .gz. Its
+size depends on the number of changes, not on the size of the journal.
+
+Applying a delta keeps, for every entry, the version with the highest
+(changed_at, origin), so devices that exchange deltas in any order end up
+with the same entries.
+"""
+import gzip
+import json
+
+DELTA_FORMAT = 'mood-tracker-delta'
+DELTA_VERSION = 1
+
+# Change log position up to which changes have been exported, and the same per named
+# destination for journals kept on more than two computers
+EXPORTED_KEY = 'exported_seq'
+EXPORTED_TO_KEY = 'exported_seq:{}'
+# Change log position of another device up to which its deltas were applied
+APPLIED_KEY = 'applied_seq:{}'
+
+
+def open_delta(path, mode):
+    """Open a delta file for text reading or writing, compressed if it ends in .gz"""
+    if path.endswith('.gz'):
+        # The default level 9 is much slower and barely smaller for text like this
+        return gzip.open(path, mode + 't', compresslevel=6, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def to_record(change):
+    """Convert a change from MoodRepository.iter_changes() into a delta record"""
+    seq, uuid, changed_at, origin, mood_text, timestamp, created_at, deleted = change
+    record = {'seq': seq, 'uuid': uuid, 'changed_at': changed_at, 'origin': origin,
+              'deleted': bool(deleted)}
+    if mood_text is not None:
+        record.update(mood_text=mood_text, timestamp=timestamp, created_at=created_at)
+    return record
+
+
+def to_change(record):
+    """Convert a delta record into a change for MoodRepository.apply_changes()"""
+    deleted = bool(record.get('deleted'))
+    if not record.get('uuid') or 'changed_at' not in record or 'origin' not in record:
+        raise ValueError(f"Change needs uuid, changed_at and origin: {record!r}")
+    if not deleted and not (record.get('mood_text') and record.get('timestamp')):
+        raise ValueError(f"Change needs mood_text and timestamp unless it is a delete: {record!r}")
+    return (record['uuid'], int(record['changed_at']), record['origin'],
+            record.get('mood_text'), record.get('timestamp'), record.get('created_at'), deleted)
+
+
+def export_changes(repo, path, since=None, to=None):
+    """Write the entries changed since a change log position to a delta file
+
+    since defaults to the end of the previous export, which then moves to
+    the newest change written. With to, the name of the computer the delta
+    is for, that position is kept per destination; a single position only
+    works between two computers, since a third would be sent a delta that
+    starts after changes it never received. Returns (changes written, new
+    position).
+    """
+    key = EXPORTED_KEY if to is None else EXPORTED_TO_KEY.format(to)
+    remember = since is None
+    if remember:
+        since = int(repo.sync_value(key, 0))
+    until = since
+    count = 0
+    with open_delta(path, 'w') as f:
+        header = {'format': DELTA_FORMAT, 'version': DELTA_VERSION,
+                  'origin': repo.device_id, 'since': since}
+        f.write(json.dumps(header) + '\n')
+        for change in repo.iter_changes(since):
+            f.write(json.dumps(to_record(change), ensure_ascii=False) + '\n')
+            until = change[0]
+            count += 1
+    if remember:
+        repo.set_sync_value(key, str(until))
+    return count, until
+
+
+def read_header(f):
+    """Read and check the header line of a delta file"""
+    try:
+        header = json.loads(f.readline())
+    except json.JSONDecodeError:
+        header = None
+    if not isinstance(header, dict) or header.get('format') != DELTA_FORMAT:
+        raise ValueError("Not a mood tracker delta file")
+    if header.get('version') != DELTA_VERSION:
+        raise ValueError(f"Unsupported delta version {header.get('version')}")
+    return header
+
+
+def apply_delta(repo, path):
+    """Merge a delta file into the repository, returning (applied, skipped)
+
+    Raises ValueError if the delta starts after changes from its device
+    that have not been applied here yet, since those would be missed.
+    """
+    with open_delta(path, 'r') as f:
+        header = read_header(f)
+        key = APPLIED_KEY.format(header['origin'])
+        since = int(header['since'])
+        applied_until = int(repo.sync_value(key, 0))
+        if since > applied_until:
+            raise ValueError(
+                f"The delta starts after change {since} of its device, but only changes up "
+                f"to {applied_until} were applied here; export it again with --all"
+            )
+        until = applied_until
+
+        def changes():
+            nonlocal until
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    until = max(until, int(record['seq']))
+                    yield to_change(record)
+
+        applied, skipped = repo.apply_changes(changes())
+    repo.set_sync_value(key, str(until))
+    return applied, skipped
@@ -0,0 +1,41 @@
+"""Hashtags in mood entries, e.g. "#work tired".
+
+A hashtag is '#' followed by letters, digits, '_' or '-', not preceded by
+another word character, so "C#" and "a#b" are not tags and neither are
+plain numbers like "#1". Names are case-folded, so "#Work" and "#work"
+are the same tag. The repository keeps the tags of every entry in an
+inverted index; this module only parses them.
+"""
+import re
+
+# Bump whenever parsing changes; entries tagged with an older version are tagged again
+TAGS_VERSION = 1
+
+# Longer words after '#' are not taken as tags
+MAX_TAG_LENGTH = 64
+
+TAG_PATTERN = re.compile(r"(?<![\w#])#(\w[\w-]*)")
+# Tag names in filter input, with or without '#'
+FILTER_PATTERN = re.compile(r"\w[\w-]*")
+
+
+def normalize(name):
+    """Return the stored form of a tag name, or None if it is not a tag"""
+    name = name.rstrip('-').casefold()
+    if not name or len(name) > MAX_TAG_LENGTH or name.isdigit():
+        return None
+    return name
+
+
+def extract_tags(text):
+    """Return the sorted, distinct tag names of an entry text"""
+    names = {normalize(match) for match in TAG_PATTERN.findall(text)}
+    names.discard(None)
+    return sorted(names)
+
+
+def parse_filter(text):
+    """Return the sorted, distinct tag names of filter input, e.g. '#work, tired'"""
+    names = {normalize(match) for match in FILTER_PATTERN.findall(text)}
+    names.discard(None)
+    return sorted(names)
@@ -0,0 +1,148 @@
+"""Theme colors and the registry that applies them to widgets.
+
+Widgets are registered once, when they are created, under their Tk widget
+class. Switching themes then restyles the flat list of registered widgets
+with option sets resolved once per class, so its cost does not depend on
+how deeply a widget is nested, and panels created later are themed as
+soon as they are registered.
+"""
+import tkinter as tk
+
+LIGHT_THEME = {
+    'bg': '#ffffff',
+    'fg': '#000000',
+    'listbox_bg': '#ffffff',
+    'listbox_fg': '#000000',
+    'entry_bg': '#ffffff',
+    'entry_fg': '#000000',
+    'button_bg': '#f0f0f0',
+    'highlight_bg': '#e0e0e0',
+    'highlight_fg': '#000000',
+    'chart_grid': '#c0c0c0',
+    'chart_entries': '#4a7ab5',
+    'chart_mood': '#d08a2c'
+}
+
+DARK_THEME = {
+    'bg': '#2d2d2d',
+    'fg': '#ffffff',
+    'listbox_bg': '#3d3d3d',
+    'listbox_fg': '#ffffff',
+    'entry_bg': '#3d3d3d',
+    'entry_fg': '#ffffff',
+    'button_bg': '#444444',
+    'highlight_bg': '#555555',
+    'highlight_fg': '#ffffff',
+    'chart_grid': '#666666',
+    'chart_entries': '#7fb0e8',
+    'chart_mood': '#f0b050'
+}
+
+THEMES = {'light': LIGHT_THEME, 'dark': DARK_THEME}
+
+# Widget option -> theme color, per Tk widget class
+CLASS_STYLES = {
+    'Tk': {'bg': 'bg'},
+    'Toplevel': {'bg': 'bg'},
+    'Frame': {'bg': 'bg'},
+    'Label': {'bg': 'bg', 'fg': 'fg'},
+    'Checkbutton': {'bg': 'bg', 'fg': 'fg'},
+    'Button': {'bg': 'button_bg', 'fg': 'fg', 'activebackground': 'highlight_bg',
+               'activeforeground': 'highlight_fg'},
+    'Listbox': {'bg': 'listbox_bg', 'fg': 'listbox_fg', 'selectbackground': 'highlight_bg',
+                'selectforeground': 'highlight_fg'},
+    'Text': {'bg': 'entry_bg', 'fg': 'entry_fg', 'insertbackground': 'fg'},
+    'Entry': {'bg': 'entry_bg', 'fg': 'entry_fg', 'insertbackground': 'fg'},
+    'Scrollbar': {'bg': 'button_bg', 'troughcolor': 'bg'},
+}
+
+# ttk style option -> theme color, per ttk style name
+TTK_STYLES = {
+    'Treeview': {'background': 'listbox_bg', 'fieldbackground': 'listbox_bg',
+                 'foreground': 'listbox_fg'},
+}
+
+# ttk style option -> [(state, theme color)], per ttk style name
+TTK_STATE_STYLES = {
+    'Treeview': {'background': [('selected', 'highlight_bg')],
+                 'foreground': [('selected', 'highlight_fg')]},
+}
+
+
+def resolve_styles(theme, styles=CLASS_STYLES):
+    """Return the widget options of every widget class for a theme"""
+    return {widget_class: {option: theme[color] for option, color in options.items()}
+            for widget_class, options in styles.items()}
+
+
+class ThemeRegistry:
+    """Keeps track of themed widgets and restyles them in one pass"""
+
+    def __init__(self, theme, styles=CLASS_STYLES, ttk_style=None):
+        self.styles = styles
+        self.theme = theme
+        self._options = resolve_styles(theme, styles)
+        # Registered widgets grouped by widget class
+        self._widgets = {widget_class: [] for widget_class in styles}
+        # ttk widgets are themed through their style instead of one by one
+        self.ttk_style = ttk_style
+        self.apply_ttk_styles()
+
+    def apply_ttk_styles(self):
+        """Configure the ttk styles for the current theme"""
+        if self.ttk_style is None:
+            return
+        for style, options in resolve_styles(self.theme, TTK_STYLES).items():
+            self.ttk_style.configure(style, **options)
+        for style, options in TTK_STATE_STYLES.items():
+            self.ttk_style.map(style, **{option: [(state, self.theme[color]) for state, color in states]
+                                         for option, states in options.items()})
+
+    def register(self, widget, widget_class=None):
+        """Theme a widget now and whenever the theme changes, returning it
+
+        widget_class overrides the Tk class used to look up its style.
+        Widgets of classes without a style are ignored.
+        """
+        widget_class = widget_class or widget.winfo_class()
+        if widget_class in self._widgets:
+            widget.configure(**self._options[widget_class])
+            self._widgets[widget_class].append(widget)
+            # A toplevel also sees the Destroy events of its children
+            widget.bind("<Destroy>", lambda event: event.widget is widget and
+                        self.unregister(widget, widget_class), add="+")
+        return widget
+
+    def unregister(self, widget, widget_class=None):
+        """Stop theming a widget"""
+        widgets = self._widgets.get(widget_class or widget.winfo_class(), [])
+        if widget in widgets:
+            widgets.remove(widget)
+
+    def register_tree(self, widget):
+        """Register a widget and all of its descendants, e.g. a newly built panel"""
+        pending = [widget]
+        while pending:
+            widget = pending.pop()
+            self.register(widget)
+            pending.extend(widget.winfo_children())
+        return widget
+
+    def __len__(self):
+        return sum(len(widgets) for widgets in self._widgets.values())
+
+    def apply(self, theme):
+        """Restyle every registered widget in one pass"""
+        self.theme = theme
+        self._options = resolve_styles(theme, self.styles)
+        self.apply_ttk_styles()
+        for widget_class, widgets in self._widgets.items():
+            options = self._options[widget_class]
+            alive = []
+            for widget in widgets:
+                try:
+                    widget.configure(**options)
+                except tk.TclError:
+                    continue
+                alive.append(widget)
+            widgets[:] = alive
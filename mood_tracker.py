@@ -1,64 +1,173 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import sqlite3
-from datetime import datetime
+from tkinter import ttk, messagebox, filedialog
+import tkinter.font as tkfont
 import json
 import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import date
+import mood_backup
+import mood_chart
+import mood_io
+import mood_metrics
+import mood_pending
+import mood_theme
+import mood_schema
+import mood_snapshot
+import mood_tags
+from db_worker import DatabaseWorker, JobCancelled
+from list_window import ListWindow
+from mood_repository import MoodRepository, period_range, tombstone_token
+from wrap_layout import WrapLayout
 
 class MoodTrackerApp:
-    def __init__(self, root):
+    # Extra entries fetched beyond what fits in the visible list area
+    PAGE_BUFFER = 20
+    # Upper bound on entries kept in the listbox before the far end is dropped
+    MAX_LOADED_ENTRIES = 300
+    # Scroll fraction at which the next page is fetched
+    SCROLL_PREFETCH_THRESHOLD = 0.1
+    # Delay used to coalesce a drag-resize into a single relayout
+    RELAYOUT_DELAY_MS = 150
+    # How often finished database jobs are collected on the Tk thread
+    DB_POLL_INTERVAL_MS = 30
+    # Database work shorter than this does not flash the busy state
+    BUSY_DELAY_SECONDS = 0.25
+    # Pause in typing after which the search runs
+    SEARCH_DELAY_MS = 250
+    # Maximum number of search results shown
+    SEARCH_LIMIT = 200
+    # Number of weeks listed in the statistics panel
+    STATS_WEEKS = 12
+    # How long a delete can be undone before its tombstones may be purged
+    UNDO_WINDOW_MS = 10000
+    # Tombstones purged and free pages released per background job
+    PURGE_BATCH_SIZE = 1000
+    VACUUM_PAGES = 1000
+    # Delay before the first backup check and the time between checks
+    BACKUP_START_DELAY_MS = 60000
+    BACKUP_CHECK_INTERVAL_MS = 60 * 60 * 1000
+    # Entries scored per background job, so a save never waits long behind one
+    SCORE_BATCH_SIZE = 5000
+    # Entries moved to the yearly archives per background job
+    ARCHIVE_BATCH_SIZE = 2000
+    # Entries tagged per background job, and tags listed in the tags menu
+    TAG_BATCH_SIZE = 5000
+    TAG_MENU_LIMIT = 20
+    # Saves are committed together this long after the first one, or once this many wait
+    SAVE_FLUSH_DELAY_MS = 300
+    SAVE_BATCH_SIZE = 50
+    # Delay before saves that failed to commit are tried again
+    SAVE_RETRY_MS = 5000
+
+    def __init__(self, root, db_path=mood_schema.DB_PATH):
+        # Startup milestones in milliseconds since this point, see record_startup()
+        self._started = time.perf_counter()
+        self.startup_timings = {}
+        # 'current' or 'stale' once a painted snapshot was checked, 'none' without one
+        self._startup_snapshot = 'none'
         self.root = root
         self.root.title("Mood Tracker")
         self.root.geometry("500x400")
         self.root.resizable(True, True)
         
-        # Theme settings
-        self.light_theme = {
-            'bg': '#ffffff',
-            'fg': '#000000',
-            'listbox_bg': '#ffffff',
-            'listbox_fg': '#000000',
-            'entry_bg': '#ffffff',
-            'entry_fg': '#000000',
-            'button_bg': '#f0f0f0',
-            'highlight_bg': '#e0e0e0',
-            'highlight_fg': '#000000'
-        }
-        
-        self.dark_theme = {
-            'bg': '#2d2d2d',
-            'fg': '#ffffff',
-            'listbox_bg': '#3d3d3d',
-            'listbox_fg': '#ffffff',
-            'entry_bg': '#3d3d3d',
-            'entry_fg': '#ffffff',
-            'button_bg': '#444444',
-            'highlight_bg': '#555555',
-            'highlight_fg': '#ffffff'
-        }
+        # Window of entries currently rendered in the listbox (newest first)
+        self.list_window = ListWindow(self.MAX_LOADED_ENTRIES)
+        self.total_entries = 0
+        self._page_request = None
+        self._relayout_request = None
+        self._layout_width = None
+        # Bumped whenever the loaded window is replaced, to drop stale pages
+        self._view_generation = 0
+        self._busy = False
+        self.search_query = ""
+        self._search_request = None
+        self.metrics = None
+        # Period selected in the date navigator ('' for all entries) and its created_at range
+        self.period = ""
+        self.period_range = None
+        # Periods whose child nodes have been loaded into the navigator
+        self.navigator_loaded = set()
+        # Tag names the list is filtered by, and whether entries need all of them or any
+        self.tag_filter = ()
+        self.match_all_tags = True
+        self._tag_request = None
+        # Tombstone token of the delete that Undo brings back
+        self._undo_token = None
+        self._undo_request = None
+        self._compact_request = None
+        self._backup_request = None
+        # Set on close to stop a backup that is still copying
+        self._backup_stop = threading.Event()
+        # Whether background sentiment scoring and tagging are running
+        self._scoring = False
+        self._tagging = False
+        # Whether the last commit of saved entries failed, and the timer of the next one
+        self._flush_failed = False
+        self._flush_request = None
+        # Entries committed at startup that the last session had not committed
+        self._recovered = 0
         
         # Load user preferences
         self.config_file = 'mood_tracker_config.json'
         self.load_config()
         
-        # Set up the database
-        self.setup_database()
+        # Newest page saved on the last close, painted before the database is open
+        self.snapshot_file = mood_snapshot.snapshot_path(self.config_file)
+        snapshot = mood_snapshot.load_snapshot(self.snapshot_file, db_path)
+        
+        # Set up the database and commit the saves a crash left in the journal
+        self.setup_database(db_path)
+        self.pending_saves = mood_pending.PendingSaves(
+            self.db_worker, mood_pending.PendingJournal(mood_pending.pending_path(self.config_file)))
+        self.pending_saves.on_committed = self.on_pending_committed
+        self.pending_saves.on_failed = self.on_pending_failed
+        self.recover_pending()
+        
+        # Widgets are themed as they are registered
+        self.theme_registry = mood_theme.ThemeRegistry(self.current_theme(),
+                                                       ttk_style=ttk.Style(self.root))
         
         # Create the UI elements
         self.create_widgets()
         
-        # Apply theme
-        self.apply_theme()
+        # Performance instrumentation is opt-in
+        if self.config['instrumentation']:
+            self.start_instrumentation()
         
-        # Load existing mood entries
-        self.load_mood_entries()
+        # Start collecting database results and load existing mood entries
+        self.poll_database()
+        if snapshot is not None:
+            self.paint_snapshot(snapshot)
+        else:
+            self.load_mood_entries()
+        self.root.after_idle(self.record_startup, 'first_paint')
+        if self.config['date_navigator']:
+            self.refresh_navigator()
+        
+        # Score and tag entries imported, synced or indexed with an older version
+        self.score_entries()
+        self.tag_entries()
+        
+        # Purge tombstones left over from earlier sessions once startup has settled
+        self._compact_request = self.root.after(self.UNDO_WINDOW_MS, self.compact_database)
+        
+        # Scheduled backups run on their own thread while the app stays usable
+        if self.config['backup_interval_hours']:
+            self._backup_request = self.root.after(self.BACKUP_START_DELAY_MS, self.backup_database)
     
     def load_config(self):
         """Load user configuration from file"""
         self.config = {
             'theme': 'light',  # Default theme
             'input_word_wrap': True,  # Default word wrap for input
-            'list_word_wrap': True    # Default word wrap for list
+            'list_word_wrap': True,   # Default word wrap for list
+            'date_navigator': True,   # Year/month/day navigator next to the list
+            'instrumentation': False,  # Timing overlay and metrics log
+            'backup_interval_hours': 24,  # Hours between automatic backups (0 disables them)
+            'backups_to_keep': mood_backup.KEEP_BACKUPS,  # Snapshots kept by rotation
+            'archive_after_days': 0  # Age at which entries move to the yearly archives (0 keeps them)
         }
         
         if os.path.exists(self.config_file):
@@ -77,21 +186,17 @@ class MoodTrackerApp:
         except Exception as e:
             print(f"Error saving config: {e}")
     
-    def setup_database(self):
-        """Create the SQLite database and table if they don't exist"""
-        try:
-            self.conn = sqlite3.connect('mood_tracker.db')
-            self.cursor = self.conn.cursor()
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS moods (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    mood_text TEXT NOT NULL,
-                    timestamp TEXT NOT NULL
-                )
-            ''')
-            self.conn.commit()
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to connect to database: {e}")
+    def setup_database(self, db_path=mood_schema.DB_PATH):
+        """Start the database worker, which opens and migrates the database"""
+        self.db_path = db_path
+        self.db_worker = DatabaseWorker(lambda: MoodRepository(db_path)).start()
+        self.db_worker.submit(
+            lambda repo: None,
+            on_error=lambda e: messagebox.showerror("Database Error", f"Failed to connect to database: {e}"),
+            cancellable=False
+        )
+        # Backups read through their own connection, so they get their own thread
+        self.backup_worker = DatabaseWorker(lambda: None).start()
     
     def create_widgets(self):
         """Create all the UI widgets"""
@@ -170,9 +275,81 @@ class MoodTrackerApp:
         )
         self.list_wrap_check.pack(side=tk.RIGHT)
         
+        # Date navigator toggle
+        self.navigator_var = tk.BooleanVar(value=self.config['date_navigator'])
+        self.navigator_check = tk.Checkbutton(
+            list_header_frame,
+            text="Dates",
+            variable=self.navigator_var,
+            command=self.toggle_date_navigator
+        )
+        self.navigator_check.pack(side=tk.RIGHT)
+        
+        # Search box above the history list
+        search_frame = tk.Frame(list_frame)
+        search_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        tk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(search_frame, textvariable=self.search_var)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.on_search_changed)
+        self.search_entry.bind("<Escape>", lambda event: self.clear_search())
+        
+        clear_search_button = tk.Button(search_frame, text="✕", command=self.clear_search, width=2)
+        clear_search_button.pack(side=tk.LEFT)
+        
+        # Tag filter below the search box, e.g. "#work #tired"
+        tag_frame = tk.Frame(list_frame)
+        tag_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        tk.Label(tag_frame, text="Tags:").pack(side=tk.LEFT)
+        
+        self.tag_var = tk.StringVar()
+        self.tag_entry = tk.Entry(tag_frame, textvariable=self.tag_var)
+        self.tag_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.tag_entry.bind("<KeyRelease>", self.on_tags_changed)
+        self.tag_entry.bind("<Return>", lambda event: self.apply_tag_filter())
+        self.tag_entry.bind("<Escape>", lambda event: self.clear_tags())
+        
+        # Checked: entries need every tag; unchecked: any of them
+        self.match_all_var = tk.BooleanVar(value=True)
+        match_all_check = tk.Checkbutton(tag_frame, text="All", variable=self.match_all_var,
+                                         command=self.apply_tag_filter)
+        match_all_check.pack(side=tk.LEFT)
+        
+        # Most used tags with their counts, filled in when opened
+        self.tag_menu = tk.Menu(tag_frame, tearoff=False)
+        self.tag_menu_button = tk.Button(tag_frame, text="▾", command=self.show_tag_menu, width=2)
+        self.tag_menu_button.pack(side=tk.LEFT)
+        
+        clear_tags_button = tk.Button(tag_frame, text="✕", command=self.clear_tags, width=2)
+        clear_tags_button.pack(side=tk.LEFT)
+        
+        # Year -> month -> day navigator, filled in lazily as nodes are expanded
+        self.navigator_frame = tk.Frame(list_frame)
+        if self.config['date_navigator']:
+            self.navigator_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 5), pady=(5, 0))
+        
+        self.navigator = ttk.Treeview(self.navigator_frame, columns=('count',), show='tree',
+                                      selectmode=tk.BROWSE, height=15)
+        self.navigator.column('#0', width=100, stretch=False)
+        self.navigator.column('count', width=50, anchor=tk.E, stretch=False)
+        navigator_scrollbar = tk.Scrollbar(self.navigator_frame, orient=tk.VERTICAL,
+                                           command=self.navigator.yview)
+        self.navigator.config(yscrollcommand=navigator_scrollbar.set)
+        navigator_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.navigator.pack(side=tk.LEFT, fill=tk.Y)
+        self.navigator.insert('', 0, iid='all', text="All entries")
+        self.navigator.selection_set('all')
+        self.navigator.bind("<<TreeviewOpen>>", self.on_navigator_open)
+        self.navigator.bind("<<TreeviewSelect>>", self.on_navigator_select)
+        
         # Create a frame for the listbox with scrollbars
         listbox_frame = tk.Frame(list_frame)
         listbox_frame.pack(fill=tk.BOTH, expand=True)
+        self.listbox_frame = listbox_frame
         
         # Horizontal scrollbar
         h_scrollbar = tk.Scrollbar(listbox_frame, orient=tk.HORIZONTAL)
@@ -187,9 +364,11 @@ class MoodTrackerApp:
             listbox_frame, 
             height=15, 
             width=70,
+            selectmode=tk.EXTENDED,
             xscrollcommand=h_scrollbar.set,
-            yscrollcommand=v_scrollbar.set
+            yscrollcommand=self.on_list_scroll
         )
+        self.v_scrollbar = v_scrollbar
         
         # Configure scrollbars
         h_scrollbar.config(command=self.mood_listbox.xview)
@@ -198,6 +377,13 @@ class MoodTrackerApp:
         # Pack the listbox
         self.mood_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
+        # Wrap layout measured with the listbox font
+        self.list_font = tkfont.Font(font=self.mood_listbox.cget('font'))
+        self.wrap_layout = WrapLayout(self.list_font)
+        
+        # Re-wrap entries when the listbox is resized
+        self.mood_listbox.bind("<Configure>", self.on_list_configure)
+        
         # Button frame for additional actions
         button_frame = tk.Frame(self.main_frame, padx=10, pady=10)
         button_frame.pack(fill=tk.X)
@@ -210,54 +396,68 @@ class MoodTrackerApp:
         clear_button = tk.Button(button_frame, text="Clear All", command=self.clear_all)
         clear_button.pack(side=tk.LEFT, padx=5)
         
+        # Import and export buttons
+        import_button = tk.Button(button_frame, text="Import...", command=self.import_entries)
+        import_button.pack(side=tk.LEFT, padx=5)
+        export_button = tk.Button(button_frame, text="Export...", command=self.export_entries)
+        export_button.pack(side=tk.LEFT, padx=5)
+        
+        # Statistics button
+        stats_button = tk.Button(button_frame, text="Statistics", command=self.show_statistics)
+        stats_button.pack(side=tk.LEFT, padx=5)
+        self.stats_window = None
+        
+        # Trend chart button
+        trends_button = tk.Button(button_frame, text="Trends", command=self.show_trends)
+        trends_button.pack(side=tk.LEFT, padx=5)
+        self.trends_window = None
+        self.trend_chart = None
+        
+        # Cancel button for long-running database operations
+        self.cancel_button = tk.Button(button_frame, text="Cancel", command=self.cancel_operation,
+                                       state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+        
+        # Undo button for the most recent delete
+        self.undo_button = tk.Button(button_frame, text="Undo", command=self.undo_delete,
+                                     state=tk.DISABLED)
+        self.undo_button.pack(side=tk.RIGHT, padx=5)
+        
         # Status bar
         self.status_var = tk.StringVar()
         self.status_var.set("Ready")
         self.status_bar = tk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # Timings of the last operation, shown while instrumentation is on
+        self.metrics_var = tk.StringVar()
+        self.metrics_label = tk.Label(self.root, textvariable=self.metrics_var, relief=tk.SUNKEN,
+                                      anchor=tk.W, font=('TkFixedFont', 8))
+        self.root.bind("<F12>", lambda event: self.toggle_instrumentation())
+        
+        # Theme the whole window, however deeply its widgets are nested
+        self.theme_registry.register_tree(self.root)
+    
+    def current_theme(self):
+        """Return the colors of the configured theme"""
+        return mood_theme.THEMES.get(self.config['theme'], mood_theme.DARK_THEME)
     
     def apply_theme(self):
         """Apply the current theme to all widgets"""
-        theme = self.light_theme if self.config['theme'] == 'light' else self.dark_theme
-        
+        with self.time_operation('apply_theme'):
+            self._apply_theme()
+    
+    def _apply_theme(self):
         # Update theme button text
         self.theme_button.config(
             text=self.theme_icon_dark if self.config['theme'] == 'light' else self.theme_icon_light
         )
         
-        # Apply theme to main window and frames
-        self.root.config(bg=theme['bg'])
-        self.main_frame.config(bg=theme['bg'])
-        
-        # Apply to all frames
-        for widget in self.main_frame.winfo_children():
-            if isinstance(widget, tk.Frame):
-                widget.config(bg=theme['bg'])
-                for child in widget.winfo_children():
-                    if isinstance(child, tk.Frame):
-                        child.config(bg=theme['bg'])
-                        for grandchild in child.winfo_children():
-                            self.apply_theme_to_widget(grandchild, theme)
-                    else:
-                        self.apply_theme_to_widget(child, theme)
-            else:
-                self.apply_theme_to_widget(widget, theme)
-        
-        # Apply to status bar
-        self.status_bar.config(bg=theme['bg'], fg=theme['fg'])
-    
-    def apply_theme_to_widget(self, widget, theme):
-        """Apply theme to a specific widget based on its type"""
-        if isinstance(widget, tk.Label) or isinstance(widget, tk.Checkbutton):
-            widget.config(bg=theme['bg'], fg=theme['fg'])
-        elif isinstance(widget, tk.Button):
-            widget.config(bg=theme['button_bg'], fg=theme['fg'], activebackground=theme['highlight_bg'], activeforeground=theme['highlight_fg'])
-        elif isinstance(widget, tk.Listbox):
-            widget.config(bg=theme['listbox_bg'], fg=theme['listbox_fg'], selectbackground=theme['highlight_bg'], selectforeground=theme['highlight_fg'])
-        elif isinstance(widget, tk.Text):
-            widget.config(bg=theme['entry_bg'], fg=theme['entry_fg'], insertbackground=theme['fg'])
-        elif isinstance(widget, tk.Scrollbar):
-            widget.config(bg=theme['button_bg'], troughcolor=theme['bg'])
+        # Restyle every registered widget in a single pass
+        self.theme_registry.apply(self.current_theme())
+        # The chart colors its canvas and items itself
+        if self.trends_open():
+            self.trend_chart.set_theme(self.current_theme())
     
     def toggle_theme(self):
         """Toggle between light and dark themes"""
@@ -275,180 +475,1062 @@ class MoodTrackerApp:
     def toggle_list_wrap(self):
         """Toggle word wrap for the listbox"""
         self.config['list_word_wrap'] = self.list_wrap_var.get()
-        # Reload entries to apply word wrap setting
-        self.load_mood_entries()
+        # Re-render the loaded entries to apply word wrap setting
+        self.relayout_entries()
         self.save_config()
     
     def save_mood(self):
-        """Save the current mood entry to the database"""
+        """Save the current mood entry, committing it together with others saved soon after"""
         # Get text from the Text widget (from start to end)
         mood_text = self.mood_entry.get("1.0", "end-1c").strip()
         if not mood_text:
             messagebox.showwarning("Empty Entry", "Please enter your mood before saving.")
             return
         
-        # Get current timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
+        # Journal the entry first, so it survives a crash before the next commit
         try:
-            # Insert into database
-            self.cursor.execute("INSERT INTO moods (mood_text, timestamp) VALUES (?, ?)", 
-                               (mood_text, timestamp))
-            self.conn.commit()
-            
-            # Clear the entry field
-            self.mood_entry.delete("1.0", tk.END)
-            
-            # Update the listbox
-            self.load_mood_entries()
-            
-            # Update status
-            self.status_var.set(f"Mood saved at {timestamp}")
-        except sqlite3.Error as e:
+            entry = self.pending_saves.add(mood_text)
+        except OSError as e:
             messagebox.showerror("Save Error", f"Failed to save mood: {e}")
+            return
+        
+        # Clear the entry field
+        self.mood_entry.delete("1.0", tk.END)
+        
+        # Update the listbox
+        if self.search_query:
+            # Search results are ranked, so run the search again
+            self.run_search()
+        elif self.list_window.has_newer or self.period or self.tag_filter:
+            # The top of the history is not loaded or filtered, so load it again
+            self.load_mood_entries()
+        else:
+            # Show the entry right away; it gets its real id once committed
+            self.total_entries += 1
+            self.prepend_entries([entry])
+            self.mood_listbox.yview(0)
+            if len(self.pending_saves.pending) >= self.SAVE_BATCH_SIZE:
+                self.flush_pending()
+            elif self._flush_request is None:
+                self._flush_request = self.root.after(self.SAVE_FLUSH_DELAY_MS, self.flush_pending)
+        
+        # Update status
+        self.status_var.set(f"Mood saved at {entry[2]}")
+    
+    def flush_pending(self, closing=False):
+        """Commit the saved entries that are waiting, in one transaction
+
+        Called on a timer after a save and before any job that reads the
+        list. The batch queues behind any still being committed, so jobs
+        submitted after this one find every saved entry committed.
+        """
+        if self._flush_request is not None:
+            self.root.after_cancel(self._flush_request)
+            self._flush_request = None
+        self.pending_saves.flush(closing)
+    
+    def on_pending_committed(self, committed):
+        """Give committed entries their real ids in the list"""
+        self.list_window.replace({-seq: entry for seq, entry in committed})
+        if self._flush_failed:
+            self._flush_failed = False
+            self.status_var.set(f"Saved {len(committed)} entries")
+        self.refresh_navigator()
+        self.refresh_trends()
+    
+    def on_pending_failed(self, e):
+        """Keep showing entries that failed to commit and try again later
+
+        They stay in the journal meanwhile, so they are not lost on exit.
+        """
+        self._flush_failed = True
+        self.status_var.set(f"{len(self.pending_saves.pending)} saved entries not written to "
+                            f"the database yet ({e}); retrying")
+        if self._flush_request is None:
+            self._flush_request = self.root.after(self.SAVE_RETRY_MS, self.flush_pending)
+    
+    def recover_pending(self):
+        """Commit the entries journaled but not committed before the last exit"""
+        def on_recovered(committed):
+            # Reported with the list, which is loaded after this commit
+            self._recovered = len(committed)
+        
+        self.pending_saves.recover(on_recovered)
     
     def load_mood_entries(self):
-        """Load all mood entries from the database into the listbox"""
-        try:
-            # Clear the listbox
-            self.mood_listbox.delete(0, tk.END)
-            
-            # Get all entries from the database, ordered by most recent first
-            self.cursor.execute("SELECT id, mood_text, timestamp FROM moods ORDER BY timestamp DESC")
-            entries = self.cursor.fetchall()
+        """Load the most recent page of mood entries into the listbox"""
+        self.flush_pending()
+        
+        # Clear the listbox
+        self.clear_list_view()
+        generation = self._view_generation
+        
+        # Fetch only what fits in the viewport plus a small buffer
+        limit = self.page_size()
+        within = self.period_range
+        tags, match_all = self.tag_filter, self.match_all_tags
+        timer = self.start_timer('load_mood_entries')
+        
+        def on_loaded(result):
+            if generation != self._view_generation:
+                return
+            self.total_entries, entries = result
+            self.list_window.has_older = len(entries) == limit
+            self.append_entries(entries)
+            self.stop_timer(timer, entries=len(entries))
+            self.record_startup('interactive')
             
-            # Add entries to the listbox
-            for entry in entries:
-                entry_id, mood_text, timestamp = entry
-                display_text = f"{timestamp} - {mood_text}"
-                
-                # Apply word wrap if enabled
-                if self.config['list_word_wrap']:
-                    # Calculate available width in characters
-                    available_width = self.mood_listbox.winfo_width() // 8  # Approximate character width
-                    if available_width < 20:  # Default if window not yet sized
-                        available_width = 70
-                    
-                    # Simple word wrap implementation
-                    wrapped_lines = []
-                    current_line = ""
-                    
-                    for word in display_text.split():
-                        if len(current_line) + len(word) + 1 <= available_width:
-                            current_line += (" " + word if current_line else word)
-                        else:
-                            wrapped_lines.append(current_line)
-                            current_line = word
-                    
-                    if current_line:
-                        wrapped_lines.append(current_line)
-                    
-                    # Insert each wrapped line
-                    for line in wrapped_lines:
-                        self.mood_listbox.insert(tk.END, line)
-                    
-                    # Add a separator between entries if there are multiple entries
-                    if len(entries) > 1:
-                        self.mood_listbox.insert(tk.END, "")
+            # Update status
+            status = f"Loaded {self.total_entries} mood entries"
+            if tags:
+                status += " tagged " + (" and " if match_all else " or ").join(
+                    f"#{tag}" for tag in tags)
+            if self.period:
+                status += f" from {self.period_label(self.period)}"
+            if self._recovered:
+                status += f", {self._recovered} recovered from the last session"
+                self._recovered = 0
+            self.status_var.set(status)
+        
+        self.db_worker.submit(
+            lambda repo: (repo.count(within=within, tags=tags, match_all=match_all),
+                          repo.newest_entries(limit, within, tags, match_all)),
+            on_loaded, self.database_error_handler("Load Error", "Failed to load mood entries"),
+            description="Loading mood entries"
+        )
+    
+    def paint_snapshot(self, snapshot):
+        """Show the entries of a snapshot at once, then check them against the database"""
+        generation = self._view_generation
+        entries = snapshot['entries']
+        self.total_entries = snapshot['total_entries']
+        self.list_window.has_older = len(entries) < self.total_entries
+        self.append_entries(entries)
+        self.status_var.set(f"Loaded {self.total_entries} mood entries")
+        
+        def on_checked(change):
+            if change == snapshot['change']:
+                self._startup_snapshot = 'current'
+                self.record_startup('interactive')
+            else:
+                self._startup_snapshot = 'stale'
+                # Entries changed since the snapshot, e.g. through the command line or a
+                # sync; a list that was already replaced, e.g. from the navigator, is current
+                if generation == self._view_generation:
+                    self.load_mood_entries()
                 else:
-                    # No word wrap, insert as is
-                    self.mood_listbox.insert(tk.END, display_text)
-                
+                    self.record_startup('interactive')
+        
+        self.db_worker.submit(
+            lambda repo: repo.last_change(), on_checked,
+            self.database_error_handler("Load Error", "Failed to load mood entries"),
+            description="Loading mood entries"
+        )
+    
+    def record_startup(self, milestone):
+        """Record the first time a startup milestone is reached
+
+        first_paint is when the window is first drawn, interactive when the
+        list shows the entries from the database. Both are reported together.
+        """
+        if milestone in self.startup_timings:
+            return
+        self.startup_timings[milestone] = round((time.perf_counter() - self._started) * 1000, 3)
+        if len(self.startup_timings) == 2:
+            self.report_startup()
+    
+    def report_startup(self):
+        """Log the time to first paint and to interactive and show it in the timing overlay"""
+        record = {
+            'type': 'startup',
+            'first_paint_ms': self.startup_timings['first_paint'],
+            'interactive_ms': self.startup_timings['interactive'],
+            'snapshot': self._startup_snapshot,
+        }
+        if self.metrics is not None:
+            self.metrics.log(record)
+            self.metrics_var.set(f"Startup: first paint {record['first_paint_ms']:.0f} ms, "
+                                 f"interactive {record['interactive_ms']:.0f} ms "
+                                 f"(snapshot: {record['snapshot']})")
+    
+    def toggle_date_navigator(self):
+        """Show or hide the date navigator"""
+        self.config['date_navigator'] = self.navigator_var.get()
+        if self.config['date_navigator']:
+            self.navigator_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 5), pady=(5, 0),
+                                      before=self.listbox_frame)
+            self.refresh_navigator()
+        else:
+            self.navigator_frame.pack_forget()
+            # Do not leave the history filtered by a hidden navigator
+            self.navigator.selection_set('all')
+        self.save_config()
+    
+    def period_label(self, period):
+        """Return the display name of a 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD' period"""
+        parts = [int(part) for part in period.split('-')]
+        if len(parts) == 2:
+            return date(parts[0], parts[1], 1).strftime("%B %Y")
+        return period
+    
+    def navigator_text(self, period):
+        """Return the navigator node text of a period"""
+        parts = [int(part) for part in period.split('-')]
+        if len(parts) == 1:
+            return period
+        if len(parts) == 2:
+            return date(parts[0], parts[1], 1).strftime("%B")
+        return date(*parts).strftime("%d %a")
+    
+    def refresh_navigator(self):
+        """Reload the counts of every navigator level loaded so far"""
+        if not self.config['date_navigator']:
+            return
+        # Parents first, so children of removed periods are skipped
+        periods = sorted(self.navigator_loaded | {''}, key=len)
+        
+        def on_loaded(results):
+            for period, rows in results:
+                self.fill_navigator(period, rows)
+        
+        self.db_worker.submit(
+            lambda repo: [(period, repo.period_counts(period)) for period in periods],
+            on_loaded,
+            self.database_error_handler("Load Error", "Failed to load the date navigator"),
+            description="Loading dates"
+        )
+    
+    def fill_navigator(self, period, rows):
+        """Make the child nodes of a period match its (child period, count) rows"""
+        tree = self.navigator
+        if period and not tree.exists(period):
+            # The period disappeared while its counts were loading
+            self.navigator_loaded.discard(period)
+            return
+        self.navigator_loaded.add(period)
+        
+        # Years follow the "All entries" node
+        offset = 0 if period else 1
+        wanted = {child for child, count in rows}
+        for child in tree.get_children(period)[offset:]:
+            if child not in wanted:
+                tree.delete(child)
+                self.navigator_loaded -= {p for p in self.navigator_loaded if p.startswith(child)}
+        for index, (child, count) in enumerate(rows, offset):
+            if tree.exists(child):
+                tree.item(child, values=(f"{count:,}",))
+                tree.move(child, period, index)
+            else:
+                tree.insert(period, index, iid=child, text=self.navigator_text(child),
+                            values=(f"{count:,}",))
+                if len(child) < 10:
+                    # Placeholder that makes the node expandable; replaced once opened
+                    tree.insert(child, tk.END, iid=f"{child}:loading", text="...")
+        if not period:
+            tree.item('all', values=(f"{sum(count for _, count in rows):,}",))
+    
+    def on_navigator_open(self, event=None):
+        """Load the child periods of a node the first time it is expanded"""
+        period = self.navigator.focus()
+        if period in self.navigator_loaded or not self.navigator.exists(f"{period}:loading"):
+            return
+        self.db_worker.submit(
+            lambda repo: repo.period_counts(period),
+            lambda rows: self.fill_navigator(period, rows),
+            self.database_error_handler("Load Error", "Failed to load the date navigator"),
+            description="Loading dates"
+        )
+    
+    def on_navigator_select(self, event=None):
+        """Show only the entries of the selected year, month or day"""
+        selection = self.navigator.selection()
+        node = selection[0] if selection else 'all'
+        if node.endswith(":loading"):
+            return
+        period = "" if node == 'all' else node
+        if period == self.period:
+            return
+        self.period = period
+        self.period_range = period_range(period) if period else None
+        
+        # A date filter replaces any search
+        self.cancel_search()
+        self.load_mood_entries()
+    
+    def on_tags_changed(self, event=None):
+        """Debounce typing in the tags box into a single reload"""
+        if self._tag_request is not None:
+            self.root.after_cancel(self._tag_request)
+        self._tag_request = self.root.after(self.SEARCH_DELAY_MS, self.apply_tag_filter)
+    
+    def apply_tag_filter(self):
+        """Show only the entries with all, or any, of the tags in the tags box"""
+        if self._tag_request is not None:
+            self.root.after_cancel(self._tag_request)
+            self._tag_request = None
+        tags = tuple(mood_tags.parse_filter(self.tag_var.get()))
+        # All and any only differ for two tags or more
+        match_all = self.match_all_var.get() or len(tags) < 2
+        if (tags, match_all) == (self.tag_filter, self.match_all_tags):
+            return
+        self.tag_filter = tags
+        self.match_all_tags = match_all
+        
+        # Like a date filter, a tag filter replaces any search
+        self.cancel_search()
+        self.load_mood_entries()
+    
+    def toggle_tag(self, name):
+        """Add a tag to the tags box, or remove it if it is there, and filter by it"""
+        tags = mood_tags.parse_filter(self.tag_var.get())
+        tags = [tag for tag in tags if tag != name] if name in tags else tags + [name]
+        self.tag_var.set(" ".join(f"#{tag}" for tag in tags))
+        self.apply_tag_filter()
+    
+    def clear_tags(self):
+        """Stop filtering by tag"""
+        self.tag_var.set("")
+        self.apply_tag_filter()
+    
+    def show_tag_menu(self):
+        """Open the most used tags with their counts below the tags button"""
+        def on_loaded(counts):
+            menu = self.tag_menu
+            menu.delete(0, tk.END)
+            if not counts:
+                menu.add_command(label="No tags yet", state=tk.DISABLED)
+            for name, count in counts:
+                mark = "✓ " if name in self.tag_filter else ""
+                menu.add_command(label=f"{mark}#{name} ({count})",
+                                 command=lambda name=name: self.toggle_tag(name))
+            button = self.tag_menu_button
+            menu.tk_popup(button.winfo_rootx(), button.winfo_rooty() + button.winfo_height())
+        
+        # The counts are kept in the tags table, so this reads no entries
+        self.db_worker.submit(
+            lambda repo: repo.tag_counts(self.TAG_MENU_LIMIT), on_loaded,
+            self.database_error_handler("Load Error", "Failed to load tags"),
+            description="Loading tags"
+        )
+    
+    def on_search_changed(self, event=None):
+        """Debounce typing in the search box into a single search"""
+        query = self.search_var.get().strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        if self._search_request is not None:
+            self.root.after_cancel(self._search_request)
+        self._search_request = self.root.after(self.SEARCH_DELAY_MS, self.run_search)
+    
+    def run_search(self):
+        """Show the entries matching the search box, best matches first"""
+        self._search_request = None
+        query = self.search_query
+        if not query:
+            self.load_mood_entries()
+            return
+        self.flush_pending()
+        
+        def on_found(entries):
+            if query != self.search_query:
+                return
+            self.clear_list_view()
+            self.append_entries(entries)
+            self.mood_listbox.yview(0)
+            
             # Update status
-            self.status_var.set(f"Loaded {len(entries)} mood entries")
-        except sqlite3.Error as e:
-            messagebox.showerror("Load Error", f"Failed to load mood entries: {e}")
+            more = "+" if len(entries) == self.SEARCH_LIMIT else ""
+            self.status_var.set(f"Found {len(entries)}{more} entries matching '{query}'")
+        
+        self.db_worker.submit(
+            lambda repo: repo.search(query, self.SEARCH_LIMIT), on_found,
+            self.database_error_handler("Search Error", "Failed to search mood entries"),
+            description="Searching"
+        )
+    
+    def cancel_search(self):
+        """Leave search mode without reloading, for filters that reload the list themselves"""
+        self.search_var.set("")
+        self.search_query = ""
+        if self._search_request is not None:
+            self.root.after_cancel(self._search_request)
+            self._search_request = None
+    
+    def clear_search(self):
+        """Leave search mode and show the full history again"""
+        self.search_var.set("")
+        if self.search_query:
+            self.search_query = ""
+            if self._search_request is not None:
+                self.root.after_cancel(self._search_request)
+                self._search_request = None
+            self.load_mood_entries()
+    
+    def database_error_handler(self, title, message, cleanup=None):
+        """Return an error callback for a database job"""
+        def on_error(e):
+            if cleanup is not None:
+                cleanup()
+            if isinstance(e, JobCancelled):
+                self.status_var.set(f"Cancelled: {e}" if str(e) else "Cancelled")
+            else:
+                messagebox.showerror(title, f"{message}: {e}")
+        return on_error
+    
+    def poll_database(self):
+        """Run callbacks of finished database jobs and update the busy state"""
+        self.db_worker.poll()
+        self.backup_worker.poll()
+        
+        busy_for = self.db_worker.busy_for()
+        busy = busy_for is not None and busy_for >= self.BUSY_DELAY_SECONDS
+        if busy:
+            description = self.db_worker.running_description() or "Working"
+            self.status_var.set(f"{description}...")
+        if busy != self._busy:
+            self._busy = busy
+            self.root.config(cursor="watch" if busy else "")
+            self.cancel_button.config(state=tk.NORMAL if busy else tk.DISABLED)
+        
+        self._db_poll_request = self.root.after(self.DB_POLL_INTERVAL_MS, self.poll_database)
+    
+    def cancel_operation(self):
+        """Cancel queued and running database operations that allow it"""
+        if self.db_worker.cancel_all():
+            self.status_var.set("Cancelling...")
+    
+    def page_size(self):
+        """Return how many entries to fetch per page for the current list size"""
+        line_height = self.list_font.metrics('linespace')
+        visible_lines = max(self.mood_listbox.winfo_height() // max(line_height, 1),
+                            int(self.mood_listbox.cget('height')))
+        return visible_lines + self.PAGE_BUFFER
+    
+    def format_entry_lines(self, entry):
+        """Return the listbox lines used to display a single entry"""
+        entry_id, mood_text, timestamp = entry[:3]
+        display_text = f"{timestamp} - {mood_text}"
+        
+        if not self.config['list_word_wrap']:
+            # No word wrap, insert as is
+            return [display_text]
+        
+        # Search results carry highlighted text, so the text is part of the key
+        wrapped_lines = list(self.wrap_layout.wrap((entry_id, mood_text), display_text,
+                                                   self.list_text_width()))
+        
+        # Add a separator after each wrapped entry
+        wrapped_lines.append("")
+        return wrapped_lines
+    
+    def list_text_width(self):
+        """Return the pixel width available for text in the listbox"""
+        inset = 2 * (int(self.mood_listbox.cget('borderwidth')) +
+                     int(self.mood_listbox.cget('highlightthickness')))
+        width = self.mood_listbox.winfo_width() - inset
+        if width < 20 * self.list_font.measure('0'):  # Default if window not yet sized
+            width = int(self.mood_listbox.cget('width')) * self.list_font.measure('0')
+        return width
+    
+    def append_entries(self, entries):
+        """Render older entries at the bottom of the listbox"""
+        top = self.mood_listbox.nearest(0)
+        lines, removed_lines = self.list_window.append(entries, self.format_entry_lines,
+                                                       self.config['list_word_wrap'])
+        if lines:
+            self.mood_listbox.insert(tk.END, *lines)
+        
+        # The newest entries are dropped once the window grows too large
+        if removed_lines:
+            self.mood_listbox.delete(0, removed_lines - 1)
+            self.mood_listbox.yview(max(top - removed_lines, 0))
+    
+    def prepend_entries(self, entries):
+        """Render newer entries at the top of the listbox, keeping the view steady"""
+        top = self.mood_listbox.nearest(0)
+        lines, removed_lines = self.list_window.prepend(entries, self.format_entry_lines,
+                                                        self.config['list_word_wrap'])
+        if lines:
+            self.mood_listbox.insert(0, *lines)
+        
+        # The oldest entries are dropped once the window grows too large
+        if removed_lines:
+            self.mood_listbox.delete(self.mood_listbox.size() - removed_lines, tk.END)
+        
+        self.mood_listbox.yview(top + len(lines))
+    
+    def clear_list_view(self):
+        """Remove every entry from the listbox and reset the loaded window"""
+        self.mood_listbox.delete(0, tk.END)
+        self.list_window.clear()
+        self._view_generation += 1
+        self._page_request = None
+    
+    def remove_entry(self, position):
+        """Remove the display lines of a single loaded entry"""
+        start, end = self.list_window.remove(position)
+        self.mood_listbox.delete(start, end - 1)
+        self.total_entries -= 1
+    
+    def relayout_entries(self, visible_only=False):
+        """Re-render the loaded entries without querying the database
+        
+        With visible_only, the loaded window is first narrowed to the entries
+        around the viewport; the rest is fetched again when scrolled to.
+        """
+        self._relayout_request = None
+        
+        # Remember which entry is at the top so the view does not jump
+        window = self.list_window
+        top_position = window.position_at(self.mood_listbox.nearest(0))
+        
+        entries = window.entries
+        has_older, has_newer = window.has_older, window.has_newer
+        if visible_only:
+            end = top_position + self.page_size()
+            has_newer = has_newer or top_position > 0
+            has_older = has_older or end < len(entries)
+            entries = entries[top_position:end]
+            top_position = 0
+        
+        self.clear_list_view()
+        window.has_older, window.has_newer = has_older, has_newer
+        self.append_entries(entries)
+        self.mood_listbox.yview(window.line_of(top_position))
+    
+    def on_list_configure(self, event):
+        """Coalesce listbox resize events into a single relayout"""
+        if event.width == self._layout_width:
+            return
+        self._layout_width = event.width
+        if not self.config['list_word_wrap']:
+            return
+        if self._relayout_request is not None:
+            self.root.after_cancel(self._relayout_request)
+        self._relayout_request = self.root.after(self.RELAYOUT_DELAY_MS, self.relayout_after_resize)
+    
+    def relayout_after_resize(self):
+        """Re-wrap the entries around the viewport for the new listbox width"""
+        with self.time_operation('relayout_on_resize', width=self._layout_width):
+            self.relayout_entries(visible_only=True)
+    
+    def on_list_scroll(self, first, last):
+        """Update the scrollbar and fetch more entries near either end"""
+        self.v_scrollbar.set(first, last)
+        window = self.list_window
+        if self._page_request is not None or not window.entries:
+            return
+        if float(last) >= 1.0 - self.SCROLL_PREFETCH_THRESHOLD and window.has_older:
+            self._page_request = self.load_older_entries()
+        elif float(first) <= self.SCROLL_PREFETCH_THRESHOLD and window.has_newer:
+            self._page_request = self.load_newer_entries()
+    
+    def load_older_entries(self):
+        """Fetch the page of entries following the last loaded one"""
+        within, tags, match_all = self.period_range, self.tag_filter, self.match_all_tags
+        return self.load_page(lambda repo, entry, limit: repo.entries_before(entry, limit, within,
+                                                                            tags, match_all),
+                              self.list_window.entries[-1], older=True)
+    
+    def load_newer_entries(self):
+        """Fetch the page of entries preceding the first loaded one"""
+        within, tags, match_all = self.period_range, self.tag_filter, self.match_all_tags
+        return self.load_page(lambda repo, entry, limit: repo.entries_after(entry, limit, within,
+                                                                           tags, match_all),
+                              self.list_window.entries[0], older=False)
+    
+    def load_page(self, fetch, anchor, older):
+        """Fetch a page next to anchor in the background and render it"""
+        generation = self._view_generation
+        limit = self.page_size()
+        
+        def on_loaded(entries):
+            if generation != self._view_generation:
+                return
+            self._page_request = None
+            if older:
+                self.list_window.has_older = len(entries) == limit
+                self.append_entries(entries)
+            else:
+                self.list_window.has_newer = len(entries) == limit
+                self.prepend_entries(entries)
+        
+        def cleanup():
+            if generation == self._view_generation:
+                self._page_request = None
+        
+        return self.db_worker.submit(
+            lambda repo: fetch(repo, anchor, limit), on_loaded,
+            self.database_error_handler("Load Error", "Failed to load mood entries", cleanup),
+            description="Loading mood entries"
+        )
     
     def delete_selected(self):
-        """Delete the selected mood entry"""
+        """Delete the selected mood entries"""
         try:
-            # Get selected index
-            selected_index = self.mood_listbox.curselection()
-            if not selected_index:
+            # Get selected indices
+            selected_indices = self.mood_listbox.curselection()
+            if not selected_indices:
+                messagebox.showinfo("No Selection", "Please select an entry to delete.")
+                return
+            
+            # Map the selected lines to the entries they belong to
+            entry_ids = self.list_window.ids_at(selected_indices)
+            if not entry_ids:
                 messagebox.showinfo("No Selection", "Please select an entry to delete.")
                 return
             
-            # Get the entry from the listbox
-            selected_entry = self.mood_listbox.get(selected_index)
+            # Tombstone all selected entries in a single transaction, after saved
+            # entries that are still shown with their placeholder ids are committed
+            token = tombstone_token()
+            self.flush_pending()
+            pending_saves = self.pending_saves
             
-            # If word wrap is enabled, we need to find the actual entry
-            if self.config['list_word_wrap']:
-                # Get all entries
-                self.cursor.execute("SELECT id, mood_text, timestamp FROM moods ORDER BY timestamp DESC")
-                entries = self.cursor.fetchall()
-                
-                # Find which entry this selection belongs to
-                current_index = 0
-                for entry in entries:
-                    entry_id, mood_text, timestamp = entry
-                    display_text = f"{timestamp} - {mood_text}"
-                    
-                    # Calculate how many lines this entry would take
-                    available_width = self.mood_listbox.winfo_width() // 8
-                    if available_width < 20:
-                        available_width = 70
-                    
-                    lines_count = 1
-                    current_line = ""
-                    for word in display_text.split():
-                        if len(current_line) + len(word) + 1 <= available_width:
-                            current_line += (" " + word if current_line else word)
-                        else:
-                            lines_count += 1
-                            current_line = word
-                    
-                    # Add separator line if not the last entry
-                    if len(entries) > 1 and entry != entries[-1]:
-                        lines_count += 1
-                    
-                    # Check if the selected index falls within this entry's lines
-                    if selected_index[0] >= current_index and selected_index[0] < current_index + lines_count:
-                        # This is the entry to delete
-                        self.cursor.execute("DELETE FROM moods WHERE id = ?", (entry_id,))
-                        self.conn.commit()
-                        self.load_mood_entries()
-                        self.status_var.set(f"Entry deleted: {timestamp}")
-                        return
-                    
-                    current_index += lines_count
-            else:
-                # Extract timestamp from the entry (assuming format: "YYYY-MM-DD HH:MM:SS - Mood text")
-                parts = selected_entry.split(" - ", 1)
-                if len(parts) >= 2:
-                    timestamp = parts[0]
-                    
-                    # Delete from database
-                    self.cursor.execute("DELETE FROM moods WHERE timestamp = ?", (timestamp,))
-                    self.conn.commit()
-                    
-                    # Reload entries
-                    self.load_mood_entries()
-                    
-                    # Update status
-                    self.status_var.set(f"Entry deleted: {selected_entry}")
+            def delete(repo):
+                ids = pending_saves.resolve(entry_ids)
+                repo.delete_entries(ids, token)
+                return ids
+            
+            def on_deleted(ids):
+                # Entries whose commit failed are still shown with their placeholder ids
+                pending_saves.discard(ids)
+                self.on_entries_deleted(ids)
+                self.offer_undo(token)
+            
+            self.db_worker.submit(
+                delete,
+                on_deleted,
+                self.database_error_handler("Delete Error", "Failed to delete entry"),
+                cancellable=False, description="Deleting entries"
+            )
         except Exception as e:
             messagebox.showerror("Delete Error", f"Failed to delete entry: {e}")
     
+    def on_entries_deleted(self, entry_ids):
+        """Remove deleted entries from the list once the database has committed"""
+        # Remove their lines from the bottom up so positions stay valid
+        positions = self.list_window.positions_of(entry_ids)
+        for position in reversed(positions):
+            timestamp = self.list_window.entries[position][2]
+            self.remove_entry(position)
+        self.refresh_navigator()
+        self.refresh_trends()
+        
+        # Update status
+        if len(entry_ids) == 1 and positions:
+            self.status_var.set(f"Entry deleted: {timestamp}")
+        else:
+            self.status_var.set(f"Deleted {len(entry_ids)} entries")
+    
     def clear_all(self):
         """Clear all mood entries after confirmation"""
         if messagebox.askyesno("Confirm Clear All", "Are you sure you want to delete ALL mood entries?"):
-            try:
-                # Delete all entries from the database
-                self.cursor.execute("DELETE FROM moods")
-                self.conn.commit()
-                
-                # Clear the listbox
-                self.mood_listbox.delete(0, tk.END)
+            # Clear the listbox right away; it is reloaded if the clear fails
+            if self._flush_request is not None:
+                self.root.after_cancel(self._flush_request)
+                self._flush_request = None
+            self.pending_saves.drop_all()
+            self.clear_list_view()
+            self.total_entries = 0
+            token = tombstone_token()
+            
+            def on_cleared(cleared):
+                self.refresh_navigator()
+                self.refresh_trends()
+                self.offer_undo(token)
                 
                 # Update status
-                self.status_var.set("All entries cleared")
-            except sqlite3.Error as e:
-                messagebox.showerror("Clear Error", f"Failed to clear entries: {e}")
+                self.status_var.set(f"Cleared all {cleared} entries")
+            
+            # Tombstone all entries in the database
+            self.db_worker.submit(
+                lambda repo: repo.delete_all(token), on_cleared,
+                self.database_error_handler("Clear Error", "Failed to clear entries",
+                                            cleanup=self.load_mood_entries),
+                cancellable=False, description="Clearing all entries"
+            )
+    
+    def offer_undo(self, token):
+        """Let the delete made with token be undone until the undo window closes"""
+        self._undo_token = token
+        self.undo_button.config(state=tk.NORMAL)
+        if self._undo_request is not None:
+            self.root.after_cancel(self._undo_request)
+        self._undo_request = self.root.after(self.UNDO_WINDOW_MS, self.expire_undo)
+    
+    def expire_undo(self):
+        """Close the undo window and purge the tombstones that are now final"""
+        self._undo_request = None
+        self._undo_token = None
+        self.undo_button.config(state=tk.DISABLED)
+        self.compact_database()
+    
+    def undo_delete(self):
+        """Bring back the entries of the most recent delete"""
+        token = self._undo_token
+        if token is None:
+            return
+        self.root.after_cancel(self._undo_request)
+        self._undo_request = None
+        self._undo_token = None
+        self.undo_button.config(state=tk.DISABLED)
+        
+        def on_restored(restored):
+            if self.search_query:
+                self.run_search()
+            else:
+                self.load_mood_entries()
+            self.refresh_navigator()
+            self.refresh_trends()
+            self.status_var.set(f"Restored {restored} entries")
+        
+        self.db_worker.submit(
+            lambda repo: repo.restore_entries(token), on_restored,
+            self.database_error_handler("Undo Error", "Failed to restore entries"),
+            cancellable=False, description="Restoring entries"
+        )
+    
+    def compact_database(self):
+        """Purge expired tombstones in small background batches, then archive old entries"""
+        self._compact_request = None
+        cutoff = tombstone_token() - self.UNDO_WINDOW_MS * 1000
+        
+        def on_purged(purged):
+            if purged == self.PURGE_BATCH_SIZE:
+                self.compact_database()
+            else:
+                self.archive_database()
+        
+        self.db_worker.submit(
+            lambda repo: repo.purge_deleted(cutoff, self.PURGE_BATCH_SIZE), on_purged,
+            self.maintenance_error_handler, description="Compacting database", background=True
+        )
+    
+    def archive_database(self):
+        """Move entries older than the configured age to the yearly archives, then release free pages"""
+        days = self.config['archive_after_days']
+        if not days:
+            self.vacuum_database()
+            return
+        cutoff = int(time.time()) - days * 86400
+        
+        def on_archived(archived):
+            if archived:
+                self.archive_database()
+            else:
+                self.vacuum_database()
+        
+        self.db_worker.submit(
+            lambda repo: repo.archive_entries(cutoff, self.ARCHIVE_BATCH_SIZE), on_archived,
+            self.maintenance_error_handler, description="Archiving old entries", background=True
+        )
+    
+    def vacuum_database(self, free_pages=None):
+        """Release free pages to the file system in small background steps"""
+        def on_vacuumed(remaining):
+            # Stop when nothing is left, or when the file cannot release pages
+            if remaining and (free_pages is None or remaining < free_pages):
+                self.vacuum_database(remaining)
+        
+        self.db_worker.submit(
+            lambda repo: repo.incremental_vacuum(self.VACUUM_PAGES), on_vacuumed,
+            self.maintenance_error_handler, description="Compacting database", background=True
+        )
+    
+    def maintenance_error_handler(self, e):
+        """Report a failed background job without interrupting the user"""
+        if not isinstance(e, JobCancelled):
+            self.status_var.set(f"Database compaction failed: {e}")
+    
+    def score_entries(self):
+        """Score the sentiment of unscored entries in small background batches"""
+        if self._scoring:
+            return
+        self._scoring = True
+        
+        def on_scored(scored):
+            self._scoring = False
+            if scored:
+                self.refresh_trends()
+            if scored == self.SCORE_BATCH_SIZE:
+                self.score_entries()
+        
+        def on_error(e):
+            self._scoring = False
+            if not isinstance(e, JobCancelled):
+                self.status_var.set(f"Sentiment scoring failed: {e}")
+        
+        self.db_worker.submit(
+            lambda repo: repo.score_entries(self.SCORE_BATCH_SIZE), on_scored, on_error,
+            description="Scoring entries", background=True
+        )
+    
+    def tag_entries(self, tagged=0):
+        """Index the hashtags of untagged entries in small background batches
+
+        tagged counts the entries tagged by the earlier batches of this run.
+        """
+        if self._tagging:
+            return
+        self._tagging = True
+        
+        def on_tagged(batch):
+            self._tagging = False
+            if batch == self.TAG_BATCH_SIZE:
+                self.tag_entries(tagged + batch)
+            elif (tagged or batch) and self.tag_filter and not self.search_query:
+                # Newly tagged entries may belong in the filtered list
+                self.load_mood_entries()
+        
+        def on_error(e):
+            self._tagging = False
+            if not isinstance(e, JobCancelled):
+                self.status_var.set(f"Tagging entries failed: {e}")
+        
+        self.db_worker.submit(
+            lambda repo: repo.tag_entries(self.TAG_BATCH_SIZE), on_tagged, on_error,
+            description="Tagging entries", background=True
+        )
+    
+    def backup_database(self):
+        """Snapshot the database if the last backup is due, then check again later"""
+        db_path = self.db_path
+        interval = self.config['backup_interval_hours'] * 3600
+        keep = self.config['backups_to_keep']
+        
+        def on_backed_up(path):
+            if path is not None:
+                self.status_var.set(f"Backup saved to {os.path.basename(path)}")
+        
+        def on_error(e):
+            if not isinstance(e, mood_backup.BackupCancelled):
+                self.status_var.set(f"Backup failed: {e}")
+        
+        self.backup_worker.submit(
+            lambda _: mood_backup.backup_if_due(db_path, interval, keep=keep,
+                                                should_stop=self._backup_stop.is_set),
+            on_backed_up, on_error, cancellable=False, description="Backing up"
+        )
+        self._backup_request = self.root.after(self.BACKUP_CHECK_INTERVAL_MS, self.backup_database)
+    
+    def import_entries(self):
+        """Import entries from a CSV or JSONL file"""
+        path = filedialog.askopenfilename(
+            title="Import Mood Entries",
+            filetypes=[("Mood journals", "*.csv *.jsonl"), ("CSV files", "*.csv"),
+                       ("JSON Lines files", "*.jsonl")]
+        )
+        if not path:
+            return
+        
+        def on_imported(imported):
+            self.load_mood_entries()
+            self.refresh_navigator()
+            self.refresh_trends()
+            self.status_var.set(f"Imported {imported} entries from {os.path.basename(path)}")
+            self.score_entries()
+            self.tag_entries()
+        
+        self.db_worker.submit(
+            lambda repo: mood_io.import_file(repo, path), on_imported,
+            self.database_error_handler("Import Error", "Failed to import entries",
+                                        cleanup=self.load_mood_entries),
+            description=f"Importing {os.path.basename(path)}"
+        )
+    
+    def export_entries(self):
+        """Export all entries to a CSV or JSONL file"""
+        path = filedialog.asksaveasfilename(
+            title="Export Mood Entries",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl")]
+        )
+        if not path:
+            return
+        
+        self.flush_pending()
+        self.db_worker.submit(
+            lambda repo: mood_io.export_file(repo, path),
+            lambda exported: self.status_var.set(f"Exported {exported} entries to {os.path.basename(path)}"),
+            self.database_error_handler("Export Error", "Failed to export entries"),
+            description=f"Exporting to {os.path.basename(path)}"
+        )
+    
+    def show_statistics(self):
+        """Open the statistics panel, which reads only from the rollup tables"""
+        self.flush_pending()
+        self.db_worker.submit(
+            lambda repo: (repo.stats_summary(), repo.weekly_stats(self.STATS_WEEKS)),
+            lambda result: self.render_statistics(*result),
+            self.database_error_handler("Statistics Error", "Failed to load statistics"),
+            description="Loading statistics"
+        )
+    
+    def render_statistics(self, summary, weeks):
+        """Fill the statistics panel, creating it if it is not open"""
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            self.stats_window = tk.Toplevel(self.root)
+            self.stats_window.title("Mood Statistics")
+            self.stats_window.geometry("360x420")
+            self.theme_registry.register(self.stats_window)
+        else:
+            for widget in self.stats_window.winfo_children():
+                widget.destroy()
+        window = self.stats_window
+        
+        summary_frame = tk.Frame(window, padx=10, pady=10)
+        summary_frame.pack(fill=tk.X)
+        rows = [
+            ("Total entries", f"{summary['total_entries']}"),
+            ("Days logged", f"{summary['days_logged']}"),
+            ("First entry", summary['first_day'] or "-"),
+            ("Latest entry", summary['last_day'] or "-"),
+            ("Entries per logged day", f"{summary['entries_per_day']:.1f}"),
+            ("Average entry length", f"{summary['average_length']:.0f} characters"),
+            ("Current streak", f"{summary['current_streak']} days"),
+        ]
+        for row, (label, value) in enumerate(rows):
+            tk.Label(summary_frame, text=f"{label}:").grid(row=row, column=0, sticky=tk.W)
+            tk.Label(summary_frame, text=value).grid(row=row, column=1, sticky=tk.W, padx=10)
+        
+        weeks_frame = tk.Frame(window, padx=10, pady=10)
+        weeks_frame.pack(fill=tk.BOTH, expand=True)
+        tk.Label(weeks_frame, text=f"Last {len(weeks)} weeks:").pack(anchor=tk.W)
+        weeks_list = tk.Listbox(weeks_frame, height=self.STATS_WEEKS)
+        weeks_list.pack(fill=tk.BOTH, expand=True)
+        busiest = max((week[1] for week in weeks), default=0)
+        for week_start, entry_count, total_chars in weeks:
+            bar = "█" * round(20 * entry_count / busiest) if busiest else ""
+            weeks_list.insert(tk.END, f"Week of {week_start}: {entry_count:>4}  {bar}")
+        
+        self.theme_registry.register_tree(summary_frame)
+        self.theme_registry.register_tree(weeks_frame)
+        window.lift()
+    
+    def show_trends(self):
+        """Open the trend chart, or bring it to the front if it is open"""
+        if self.trends_open():
+            self.trends_window.lift()
+            return
+        self.trends_window = tk.Toplevel(self.root)
+        self.trends_window.title("Mood Trends")
+        self.trends_window.geometry("600x360")
+        self.theme_registry.register(self.trends_window)
+        self.trend_chart = mood_chart.TrendChart(self.trends_window, self.load_trend,
+                                                 self.current_theme())
+        self.trend_chart.canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.refresh_trends()
+    
+    def trends_open(self):
+        """Return whether the trend chart window is open"""
+        return self.trends_window is not None and self.trends_window.winfo_exists()
+    
+    def refresh_trends(self):
+        """Reload the range of days shown by the trend chart, if it is open"""
+        if not self.trends_open():
+            return
+        chart = self.trend_chart
+        
+        def on_loaded(days):
+            # The window may have been closed or reopened meanwhile
+            if self.trends_open() and chart is self.trend_chart:
+                chart.set_range(*days)
+        
+        self.db_worker.submit(
+            lambda repo: repo.day_range(),
+            on_loaded,
+            self.database_error_handler("Trends Error", "Failed to load the trend chart"),
+            description="Loading trends"
+        )
+    
+    def load_trend(self, start_day, end_day, on_loaded):
+        """Read the trend chart rows of a date range in the background"""
+        self.db_worker.submit(
+            lambda repo: repo.daily_trend(start_day, end_day),
+            on_loaded,
+            self.database_error_handler("Trends Error", "Failed to load the trend chart"),
+            description="Loading trends"
+        )
+    
+    def start_instrumentation(self):
+        """Start recording query and operation timings"""
+        log_path = os.path.join(os.path.dirname(os.path.abspath(self.config_file)),
+                                mood_metrics.METRICS_LOG)
+        metrics = mood_metrics.Metrics(log_path)
+        self.metrics = metrics
+        self.db_worker.metrics = metrics
+        # The connection belongs to the worker thread, so trace it from there
+        self.db_worker.submit(lambda repo: metrics.attach(repo.conn), cancellable=False)
+        self.metrics_var.set("Timings: waiting for the next operation")
+        self.metrics_label.pack(side=tk.BOTTOM, fill=tk.X, before=self.status_bar)
+    
+    def stop_instrumentation(self):
+        """Stop recording timings and close the metrics log"""
+        metrics = self.metrics
+        self.metrics = None
+        self.db_worker.metrics = None
+        
+        def detach(repo):
+            metrics.detach(repo.conn)
+            metrics.close()
+        self.db_worker.submit(detach, cancellable=False)
+        self.metrics_label.pack_forget()
+    
+    def toggle_instrumentation(self):
+        """Turn the timing overlay and metrics log on or off"""
+        self.config['instrumentation'] = not self.config['instrumentation']
+        if self.config['instrumentation']:
+            self.start_instrumentation()
+        else:
+            self.stop_instrumentation()
+        self.save_config()
+        state = "on" if self.config['instrumentation'] else "off"
+        self.status_var.set(f"Performance instrumentation turned {state}")
+    
+    def time_operation(self, name, **extra):
+        """Return a context manager that times a block when instrumentation is on"""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.timer(name, on_recorded=self.show_timings, **extra)
+    
+    def start_timer(self, name):
+        """Start timing an operation that finishes in a database callback"""
+        return self.metrics.start(name) if self.metrics is not None else None
+    
+    def stop_timer(self, timer, **extra):
+        """Record an operation started with start_timer and show its timings"""
+        if timer is not None and timer.metrics is self.metrics:
+            self.show_timings(timer.stop(**extra))
+    
+    def show_timings(self, summary):
+        """Show an operation summary in the timing overlay"""
+        self.metrics_var.set(mood_metrics.format_operation(summary))
     
     def on_closing(self):
         """Handle application closing"""
-        if self.conn:
-            self.conn.close()
+        self.pending_saves.closing = True
+        # Let queued writes finish before the connection is closed
+        self.root.after_cancel(self._db_poll_request)
+        for request in (self._undo_request, self._compact_request, self._backup_request):
+            if request is not None:
+                self.root.after_cancel(request)
+        self._backup_stop.set()
+        self.backup_worker.stop()
+        # Commit the saved entries that are still waiting; if that fails, they stay
+        # journaled and are committed on the next start
+        self.flush_pending(closing=True)
+        # Runs after the queued writes, so the snapshot matches the database
+        path, db_path, limit = self.snapshot_file, self.db_path, self.page_size()
+        self.db_worker.submit(
+            lambda repo: mood_snapshot.save_snapshot(repo, path, db_path, limit),
+            on_error=lambda e: print(f"Error saving snapshot: {e}"),
+            cancellable=False, description="Saving snapshot"
+        )
+        self.db_worker.stop()
+        self.pending_saves.journal.close()
+        if self.metrics is not None:
+            self.metrics.close()
         self.root.destroy()
 
 def main():
@@ -456,14 +1538,6 @@ def main():
     app = MoodTrackerApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     
-    # Bind window resize event to update word wrap
-    def on_resize(event):
-        if hasattr(app, 'config') and app.config['list_word_wrap']:
-            # Use after to avoid multiple redraws during resize
-            root.after(100, app.load_mood_entries)
-    
-    root.bind("<Configure>", on_resize)
-    
     root.mainloop()
 
 if __name__ == "__main__":
@@ -1,34 +1,22 @@
 import sqlite3
 from datetime import datetime
 
+from mood_repository import MoodRepository
+
 def test_database_functionality():
     """Test the core database functionality of the mood tracker app"""
     print("Testing database functionality...")
     
-    # Connect to the database
+    # Connect to a throwaway database; the schema is created on open
     try:
-        conn = sqlite3.connect('mood_tracker.db')
+        repo = MoodRepository.temporary()
+        conn = repo.conn
         cursor = conn.cursor()
-        print("✓ Database connection successful")
+        print("✓ Database connection and table creation successful")
     except sqlite3.Error as e:
         print(f"✗ Database connection failed: {e}")
         return False
     
-    # Create table if it doesn't exist
-    try:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS moods (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                mood_text TEXT NOT NULL,
-                timestamp TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        print("✓ Table creation successful")
-    except sqlite3.Error as e:
-        print(f"✗ Table creation failed: {e}")
-        return False
-    
     # Insert a test mood entry
     try:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -75,7 +63,7 @@ def test_database_functionality():
         return False
     
     # Close the connection
-    conn.close()
+    repo.close()
     print("✓ Database connection closed")
     
     print("All database tests passed successfully!")
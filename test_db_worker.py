@@ -0,0 +1,96 @@
+import threading
+import time
+
+from db_worker import DatabaseWorker, JobCancelled
+from mood_repository import MoodRepository
+
+
+def wait_for(worker, condition, timeout=5.0):
+    """Poll the worker like the Tk main loop does until condition() holds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the database worker"
+        worker.poll()
+        time.sleep(0.01)
+
+
+def test_jobs_run_off_the_calling_thread():
+    """Test that jobs run on the worker thread and callbacks on the polling thread"""
+    print("Testing database worker callbacks...")
+    worker = DatabaseWorker(MoodRepository.in_memory).start()
+    results = []
+    job_threads = []
+
+    def add(repo):
+        job_threads.append(threading.current_thread())
+        return repo.add_entry("worker entry")
+
+    worker.submit(add, lambda entry: results.append((threading.current_thread(), entry)))
+    worker.submit(lambda repo: repo.count(), lambda count: results.append(count))
+    wait_for(worker, lambda: len(results) == 2)
+
+    assert job_threads[0] is not threading.current_thread()
+    assert results[0][0] is threading.current_thread()
+    assert results[0][1][1] == "worker entry"
+    assert results[1] == 1
+    assert worker.busy_for() is None
+    print("✓ Job ran on the worker thread, callback ran on the polling thread")
+    worker.stop()
+
+
+def test_cancel_running_query():
+    """Test that a long-running query can be interrupted"""
+    print("\nTesting cancellation of a running query...")
+    worker = DatabaseWorker(MoodRepository.in_memory).start()
+    errors = []
+    endless = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+               "SELECT COUNT(*) FROM c")
+    job = worker.submit(lambda repo: repo.conn.execute(endless).fetchone(),
+                        on_error=errors.append, description="Counting forever")
+    wait_for(worker, lambda: worker.running_description() == "Counting forever")
+
+    assert worker.cancel_all() == 1
+    wait_for(worker, lambda: errors)
+    assert isinstance(errors[0], JobCancelled)
+    assert job.cancelled
+    print("✓ Running query interrupted and reported as cancelled")
+
+    # Writes submitted as non-cancellable survive cancel_all
+    saved = []
+    worker.submit(lambda repo: repo.add_entry("kept"), saved.append, cancellable=False)
+    worker.cancel_all()
+    wait_for(worker, lambda: saved)
+    print("✓ Non-cancellable write still committed")
+
+    # A job that finishes after Cancel still reports its result
+    release = threading.Event()
+    finished = []
+    worker.submit(lambda repo: release.wait(5) and repo.count(), finished.append,
+                  description="Finishing")
+    wait_for(worker, lambda: worker.running_description() == "Finishing")
+    assert worker.cancel_all() == 1
+    release.set()
+    wait_for(worker, lambda: finished)
+    assert finished == [1] and worker.busy_for() is None
+    print("✓ Job that completed after Cancel delivered its result")
+    worker.stop()
+
+
+def test_background_jobs_do_not_make_the_worker_busy():
+    """Test that maintenance jobs run without showing the busy state"""
+    print("\nTesting background jobs...")
+    worker = DatabaseWorker(MoodRepository.in_memory).start()
+    release = threading.Event()
+    done = []
+    worker.submit(lambda repo: release.wait(5), done.append, background=True,
+                  description="Compacting")
+    wait_for(worker, lambda: worker.running_description() == "Compacting")
+    assert worker.busy_for() is None
+
+    worker.submit(lambda repo: repo.count(), done.append)
+    assert worker.busy_for() is not None
+    release.set()
+    wait_for(worker, lambda: len(done) == 2)
+    assert worker.busy_for() is None
+    print("✓ Only foreground jobs count towards the busy state")
+    worker.stop()
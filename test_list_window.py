@@ -0,0 +1,113 @@
+from list_window import ListWindow, line_ids
+
+
+def entry(entry_id, text="entry"):
+    return (entry_id, text, f"2024-03-01 09:00:{entry_id % 60:02d}", 1709283600 + entry_id)
+
+
+def lines_for(entry):
+    """Stand-in for format_entry_lines: entry n takes n % 3 + 1 text lines and a separator"""
+    return [f"{entry[0]}.{line}" for line in range(entry[0] % 3 + 1)] + [""]
+
+
+def apply(listbox, added, removed, at_top):
+    """Apply the result of append or prepend to a list standing in for the listbox"""
+    if at_top:
+        listbox[0:0] = added
+        del listbox[len(listbox) - removed:]
+    else:
+        listbox.extend(added)
+        del listbox[:removed]
+
+
+def check(window, listbox):
+    """Check that the line maps of the window match the lines in the listbox"""
+    assert len(window.line_ids) == len(listbox) == sum(window.line_counts)
+    assert len(window.line_counts) == len(window.entries)
+    for line, entry_id in enumerate(window.line_ids):
+        if entry_id is None:
+            assert listbox[line] == ""
+        else:
+            assert listbox[line].split(".")[0] == str(entry_id)
+
+
+def test_line_ids_skip_separators():
+    """Test that the separator line of a wrapped entry maps to no entry"""
+    print("Testing the line to entry map...")
+    assert line_ids(7, 3, separated=True) == [7, 7, None]
+    assert line_ids(7, 1, separated=False) == [7]
+    print("✓ Separator lines map to None")
+
+
+def test_paging_keeps_the_window_bounded():
+    """Test paging in both directions drops entries from the far end"""
+    print("\nTesting the loaded window while paging...")
+    window = ListWindow(max_entries=10)
+    listbox = []
+
+    # Newest first, so older pages have lower ids
+    for first in (100, 94, 88):
+        added, removed = window.append([entry(i) for i in range(first, first - 6, -1)],
+                                       lines_for, True)
+        apply(listbox, added, removed, at_top=False)
+        check(window, listbox)
+    assert [e[0] for e in window.entries] == list(range(92, 82, -1))
+    assert window.has_newer and not window.has_older
+    print("✓ Scrolling down drops the newest entries past the limit")
+
+    added, removed = window.prepend([entry(i) for i in range(96, 92, -1)], lines_for, True)
+    apply(listbox, added, removed, at_top=True)
+    check(window, listbox)
+    assert [e[0] for e in window.entries] == list(range(96, 86, -1))
+    assert removed == sum(len(lines_for(entry(i))) for i in range(86, 82, -1))
+    assert window.has_older
+    print("✓ Scrolling up drops the oldest entries past the limit")
+
+    window.clear()
+    assert (window.entries, window.line_ids, window.has_older, window.has_newer) == (
+        [], [], False, False)
+
+
+def test_removing_and_selecting_entries():
+    """Test mapping selected lines to entries and removing them"""
+    print("\nTesting delete in the loaded window...")
+    window = ListWindow(max_entries=300)
+    listbox = []
+    apply(listbox, *window.append([entry(i) for i in range(10, 0, -1)], lines_for, True),
+          at_top=False)
+
+    selected = [line for line, text in enumerate(listbox) if text.split(".")[0] in ("8", "5")]
+    separators = [line for line, text in enumerate(listbox) if text == ""]
+    assert window.ids_at(selected + separators[:2]) == {8, 5}
+    assert window.ids_at(separators) == set()
+
+    positions = window.positions_of({8, 5, 999})
+    assert positions == [2, 5]
+    for position in reversed(positions):
+        start, end = window.remove(position)
+        del listbox[start:end]
+        check(window, listbox)
+    assert [e[0] for e in window.entries] == [10, 9, 7, 6, 4, 3, 2, 1]
+    print("✓ Selected lines map to their entries and removed entries take their lines along")
+
+    line = window.line_of(3) + 1
+    assert window.position_at(line) == 3 and window.entries[3][0] == 6
+    assert window.position_at(len(listbox)) == 0
+    print("✓ The entry at the top of the view is found by line")
+
+
+def test_replace_gives_committed_entries_their_ids():
+    """Test that entries shown under placeholder ids get their real ids"""
+    print("\nTesting committed entries in the loaded window...")
+    window = ListWindow(max_entries=300)
+    window.append([entry(5), entry(4)], lines_for, False)
+    window.prepend([(-101, "Saved", "2024-03-02 10:00:00", 1709370000),
+                    (-100, "Also saved", "2024-03-02 09:59:00", 1709369940)],
+                   lambda e: [e[1]], False)
+    window.replace({-100: (42, "Also saved", "2024-03-02 09:59:00", 1709369940)})
+    assert [e[0] for e in window.entries] == [-101, 42, 5, 4]
+    assert window.line_ids[:2] == [-101, 42]
+    assert window.ids_at([1]) == {42}
+    window.replace({})
+    assert [e[0] for e in window.entries] == [-101, 42, 5, 4]
+    print("✓ Committed entries and their lines get the real id")
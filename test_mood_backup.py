@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+import mood_backup
+import mood_cli
+from mood_repository import MoodRepository
+
+
+def test_backups_are_checked_skipped_and_rotated():
+    """Test taking, skipping, cancelling and rotating snapshots"""
+    print("Testing online backups...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, "moods.db")
+        backup_dir = mood_backup.default_backup_dir(db)
+        with MoodRepository(db) as repo:
+            for i in range(500):
+                repo.add_entry(f"Entry {i} " * 20)
+
+            # Copied a few pages at a time while the app's connection stays open
+            first = mood_backup.create_backup(db, keep=2, pages=8, sleep=0)
+            assert mood_backup.list_backups(backup_dir) == [first]
+            assert not any(name.endswith('.partial') for name in os.listdir(backup_dir))
+            snapshot = sqlite3.connect(first)
+            assert snapshot.execute("SELECT COUNT(*) FROM moods").fetchone()[0] == 500
+            assert snapshot.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+            snapshot.close()
+            print("✓ Snapshot copied in steps and passed quick_check")
+
+            assert mood_backup.create_backup(db, keep=2) is None
+            assert mood_backup.backup_if_due(db, interval=3600) is None
+            assert 0 <= mood_backup.backup_age(db) < 3600
+            print("✓ Unchanged databases are not backed up again")
+
+            with pytest.raises(mood_backup.BackupCancelled):
+                mood_backup.create_backup(db, force=True, pages=1, should_stop=lambda: True)
+            assert mood_backup.list_backups(backup_dir) == [first]
+            print("✓ Cancelled backups leave no partial file behind")
+
+            for i in range(3):
+                repo.add_entry(f"Change {i}")
+                newest = mood_backup.backup_if_due(db, interval=0, keep=2)
+            assert mood_backup.list_backups(backup_dir)[0] == newest
+            assert len(mood_backup.list_backups(backup_dir)) == 2
+            assert not os.path.exists(first)
+            print("✓ Only the newest snapshots are kept")
+
+
+def test_restore_checks_the_snapshot_and_keeps_a_safety_copy():
+    """Test restoring a snapshot into a database that is still open"""
+    print("\nTesting restore...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, "moods.db")
+        backup_dir = mood_backup.default_backup_dir(db)
+        with MoodRepository(db) as repo:
+            repo.add_entry("Before the backup")
+            snapshot = mood_backup.create_backup(db)
+            repo.add_entry("After the backup")
+
+            safety = mood_backup.restore_backup(snapshot, db)
+            assert repo.count() == 1
+            assert len(mood_backup.list_backups(backup_dir)) == 2
+            print("✓ Open connections see the restored entries")
+
+            mood_backup.restore_backup(safety, db)
+            assert repo.count() == 2
+            print("✓ The safety snapshot undoes the restore")
+
+            # A bare file name, as when restoring from inside the backup folder
+            snapshots = mood_backup.list_backups(backup_dir)
+            previous_dir = os.getcwd()
+            os.chdir(backup_dir)
+            try:
+                mood_backup.restore_backup(os.path.basename(snapshot), db)
+            finally:
+                os.chdir(previous_dir)
+            assert repo.count() == 1
+            assert set(snapshots) < set(mood_backup.list_backups(backup_dir))
+            mood_backup.restore_backup(mood_backup.list_backups(backup_dir)[0], db)
+            assert repo.count() == 2
+            print("✓ Restoring by file name keeps every other snapshot")
+
+        corrupt = os.path.join(tmp_dir, "corrupt.db")
+        with open(corrupt, 'wb') as f:
+            f.write(b"not a database" * 100)
+        with pytest.raises(sqlite3.DatabaseError):
+            mood_backup.restore_backup(corrupt, db)
+        with MoodRepository(db) as repo:
+            assert repo.count() == 2
+        print("✓ Damaged snapshots are rejected before anything is written")
+
+
+def test_backup_commands(capsys):
+    """Test the backup, backups and restore commands"""
+    print("\nTesting backup commands...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, "cli.db")
+        backup_dir = os.path.join(tmp_dir, "snapshots")
+        assert mood_cli.main(["--db", db, "add", "backed up"]) == 0
+        assert mood_cli.main(["--db", db, "backup", "--dir", backup_dir]) == 0
+        assert mood_cli.main(["--db", db, "backup", "--dir", backup_dir]) == 0
+        assert capsys.readouterr().out.splitlines()[-1] == "No changes since the last backup"
+
+        assert mood_cli.main(["--db", db, "add", "not backed up"]) == 0
+        assert mood_cli.main(["--db", db, "restore", "latest", "--dir", backup_dir]) == 0
+        assert mood_cli.main(["--db", db, "count"]) == 0
+        assert capsys.readouterr().out.splitlines()[-1] == "1"
+
+        assert mood_cli.main(["--db", db, "backups", "--dir", backup_dir]) == 0
+        assert len(capsys.readouterr().out.splitlines()) == 2
+    print("✓ backup, backups and restore latest work")
@@ -0,0 +1,39 @@
+import math
+
+from mood_chart import lttb, min_max_buckets
+
+
+def test_lttb_keeps_the_shape():
+    """Test that LTTB keeps the ends and the peaks of a series"""
+    print("Testing LTTB downsampling...")
+    points = [(x, math.sin(x / 50)) for x in range(1000)]
+    points[500] = (500, 5.0)
+    sampled = lttb(points, 100)
+    assert len(sampled) == 100
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert [x for x, _ in sampled] == sorted(x for x, _ in sampled)
+    assert (500, 5.0) in sampled
+    print("✓ The ends and the peak are kept, in order")
+
+    assert lttb(points[:50], 100) == points[:50]
+    assert lttb(points, 2) == points
+    assert lttb([], 10) == []
+    print("✓ Short series are left alone")
+
+
+def test_min_max_buckets():
+    """Test that min/max buckets cover every value and keep the extremes"""
+    print("\nTesting min/max buckets...")
+    values = [0] * 365
+    values[100] = 9
+    buckets = min_max_buckets(values, 50)
+    assert len(buckets) == 50
+    assert buckets[0][0] == 0 and buckets[-1][1] == 364
+    assert all(a[1] + 1 == b[0] for a, b in zip(buckets, buckets[1:]))
+    assert max(high for _, _, _, high in buckets) == 9
+    assert min(low for _, _, low, _ in buckets) == 0
+    print("✓ Buckets cover every value and keep the busiest day")
+
+    assert min_max_buckets([3, 1, 2], 10) == [(0, 0, 3, 3), (1, 1, 1, 1), (2, 2, 2, 2)]
+    assert min_max_buckets([], 10) == []
+    print("✓ Fewer values than buckets give one bucket per value")
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import mood_cli
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mood_cli.py")
+
+
+def run_cli(*args):
+    """Run the CLI in a fresh interpreter and return (seconds, stdout)"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, CLI, *args], capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def test_add_list_and_count(capsys):
+    """Test the add, list and count commands"""
+    print("Testing CLI commands...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, "cli.db")
+        assert mood_cli.main(["--db", db, "add", "slept", "well"]) == 0
+        assert mood_cli.main(["--db", db, "add", "busy day"]) == 0
+        capsys.readouterr()
+
+        assert mood_cli.main(["--db", db, "list", "--since", "1h", "--limit", "1"]) == 0
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 1 and lines[0].endswith(" - busy day")
+
+        assert mood_cli.main(["--db", db, "count", "--since", "2000-01-01"]) == 0
+        assert capsys.readouterr().out.strip() == "2"
+        assert mood_cli.main(["--db", db, "count", "--since", "1w"]) == 0
+        assert capsys.readouterr().out.strip() == "2"
+    print("✓ add, list --since and count work")
+
+
+def test_cold_start_budget():
+    """Test that the CLI starts without tkinter and within its time budget"""
+    print("\nTesting CLI cold start...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, "cli.db")
+        run_cli("--db", db, "count")  # creates and migrates the database
+
+        timings = sorted(run_cli("--db", db, "count")[0] for _ in range(3))
+        median = timings[1]
+        print(f"✓ Cold start median {median * 1000:.0f} ms "
+              f"(budget {mood_cli.COLD_START_BUDGET_SECONDS * 1000:.0f} ms)")
+        assert median < mood_cli.COLD_START_BUDGET_SECONDS
+
+        probe = ("import sys, mood_cli; mood_cli.main(['--db', sys.argv[1], 'count']); "
+                 "print(sorted(m for m in ('tkinter', 'tempfile', 'csv', 'json') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", probe, db], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(CLI))
+        assert result.stdout.splitlines()[-1] == "[]"
+        print("✓ tkinter and unused modules are never imported")
+
+
+def test_counts_must_be_positive(capsys):
+    """Test that counts below 1 are rejected instead of silently doing nothing"""
+    print("\nTesting CLI count arguments...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, "cli.db")
+        for args in (["import", "moods.csv", "--chunk-size", "0"],
+                     ["backup", "--keep", "-1"],
+                     ["years", "--workers", "none"]):
+            try:
+                mood_cli.main(["--db", db, *args])
+                assert False, f"expected {args} to be rejected"
+            except SystemExit as e:
+                assert e.code == 2
+            assert "1 or more" in capsys.readouterr().err
+        assert not os.path.exists(db)
+    print("✓ --chunk-size, --keep and --workers below 1 rejected")
@@ -0,0 +1,122 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import mood_io
+from mood_repository import TIMESTAMP_FORMAT, MoodRepository
+
+
+def test_round_trip_csv_and_jsonl():
+    """Test exporting and re-importing entries in both formats"""
+    print("Testing streaming import and export...")
+    with tempfile.TemporaryDirectory() as tmp_dir, MoodRepository.in_memory() as source:
+        source.add_entries([
+            ("Calm morning, coffee on the balcony", "2024-05-01 07:30:00", 1714548600),
+            ('Text with "quotes", commas\nand a newline', "2024-05-02 21:15:00", 1714677300),
+        ])
+
+        for fmt in mood_io.FORMATS:
+            path = os.path.join(tmp_dir, f"journal.{fmt}")
+            assert mood_io.export_file(source, path) == 2
+            with MoodRepository.in_memory() as target:
+                assert mood_io.import_file(target, path, chunk_size=1) == 2
+                exported = [entry[1:] for entry in source.iter_entries()]
+                imported = [entry[1:] for entry in target.iter_entries()]
+                assert imported == exported
+            print(f"✓ {fmt} round trip preserved text and timestamps")
+
+
+def test_import_computes_missing_created_at():
+    """Test importing files from other apps that only have text timestamps"""
+    print("\nTesting import without epoch timestamps...")
+    with tempfile.TemporaryDirectory() as tmp_dir, MoodRepository.in_memory() as repo:
+        path = os.path.join(tmp_dir, "other_app.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("timestamp,mood_text\n2024-01-01 10:00:00,first\n2024-01-02 10:00:00,second\n")
+
+        assert mood_io.import_file(repo, path) == 2
+        newest = repo.newest_entries(1)[0]
+        assert newest[1] == "second"
+        assert newest[3] - repo.entries_before(newest, 1)[0][3] == 86400
+        print("✓ created_at derived from the text timestamp")
+
+        try:
+            mood_io.detect_format("journal.txt")
+            assert False, "expected an unsupported format error"
+        except ValueError:
+            print("✓ Unsupported formats rejected")
+
+
+def test_import_skips_blank_lines():
+    """Test that blank lines, e.g. a trailing one left by an editor, are skipped"""
+    print("\nTesting import of files with blank lines...")
+    with tempfile.TemporaryDirectory() as tmp_dir, MoodRepository.in_memory() as repo:
+        files = {
+            "exported.csv": ("mood_text,timestamp,created_at\n\n"
+                             "first,2024-01-01 10:00:00,1704103200\n\n"),
+            "other_app.csv": "timestamp,mood_text\n2024-01-02 10:00:00,second\n\n",
+            "journal.jsonl": '\n{"mood_text": "third", "timestamp": "2024-01-03 10:00:00"}\n\n',
+        }
+        for name, content in files.items():
+            path = os.path.join(tmp_dir, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            assert mood_io.import_file(repo, path) == 1
+        assert [entry[1] for entry in repo.iter_entries(oldest_first=True)] == [
+            "first", "second", "third"]
+        print("✓ Blank lines in CSV and JSON Lines files are skipped")
+
+
+def test_import_normalizes_timestamps():
+    """Test that imported timestamps are parsed and stored in the app's format"""
+    print("\nTesting import of timestamps in other formats...")
+    with tempfile.TemporaryDirectory() as tmp_dir, MoodRepository.in_memory() as repo:
+        path = os.path.join(tmp_dir, "other_app.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"mood_text": "offset", "timestamp": "2024-01-01T10:00:00+05:00"}\n'
+                    '{"mood_text": "short", "timestamp": "2024-01-02T08:30"}\n')
+        assert mood_io.import_file(repo, path) == 2
+        offset, short = repo.iter_entries(oldest_first=True)
+        created_at = int(datetime(2024, 1, 1, 5, tzinfo=timezone.utc).timestamp())
+        assert offset[2:] == (
+            datetime.fromtimestamp(created_at).strftime(TIMESTAMP_FORMAT), created_at)
+        assert short[2] == "2024-01-02 08:30:00"
+        print("✓ ISO 8601 timestamps stored as local 'YYYY-MM-DD HH:MM:SS'")
+
+        path = os.path.join(tmp_dir, "spreadsheet.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("mood_text,timestamp,created_at\nfirst,01/02/2024 10am,1704103200\n")
+        try:
+            mood_io.import_file(repo, path)
+            assert False, "expected an invalid timestamp error"
+        except ValueError as e:
+            assert "01/02/2024 10am" in str(e) and "first" in str(e)
+        assert repo.count() == 2
+        print("✓ Unreadable timestamps rejected with the record they belong to")
+
+
+def test_import_rejects_incomplete_rows():
+    """Test that rows of an exported CSV file are checked like those of other files"""
+    print("\nTesting import of incomplete rows...")
+    rows = {
+        ",2024-01-01 10:00:00,1704103200": "needs mood_text",
+        "first,2024-01-01 10:00:00,yesterday": "Invalid created_at 'yesterday'",
+        "first": "needs mood_text and timestamp",
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir, MoodRepository.in_memory() as repo:
+        path = os.path.join(tmp_dir, "exported.csv")
+        for row, message in rows.items():
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"mood_text,timestamp,created_at\n{row}\n")
+            try:
+                mood_io.import_file(repo, path)
+                assert False, f"expected an error for {row!r}"
+            except ValueError as e:
+                assert message in str(e)
+        assert repo.count() == 0
+        print("✓ Empty text, bad created_at values and short rows rejected")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("mood_text,timestamp,created_at\nsecond,2024-01-02 10:00:00\n")
+        assert mood_io.import_file(repo, path) == 1
+        print("✓ A row without created_at gets it from its timestamp")
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+
+from db_worker import DatabaseWorker
+from mood_metrics import Metrics, format_operation
+from mood_repository import MoodRepository
+from test_db_worker import wait_for
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_statement_and_operation_timings():
+    """Test that traced statements are logged and attributed to operations"""
+    print("Testing query tracing...")
+    with tempfile.TemporaryDirectory() as tmp_dir, MoodRepository.in_memory() as repo:
+        log_path = os.path.join(tmp_dir, "metrics.jsonl")
+        metrics = Metrics(log_path)
+        metrics.attach(repo.conn)
+
+        with metrics.timer('load', entries=2):
+            repo.add_entry("Traced entry")
+            repo.newest_entries(10)
+            metrics.statement_boundary()
+        metrics.detach(repo.conn)
+        repo.count()
+        metrics.close()
+
+        records = read_log(log_path)
+        queries = [record for record in records if record['type'] == 'query']
+        assert any(record['sql'].startswith("INSERT INTO moods") for record in queries)
+        assert any(record['sql'].startswith("SELECT id, mood_text") for record in queries)
+        # Trigger programs are part of the INSERT, not statements of their own
+        assert not any(record['sql'].startswith("--") for record in queries)
+        assert sum(record['sql'].startswith("INSERT INTO moods") for record in queries) == 1
+        # Nothing is traced after detach
+        assert not any("COUNT(*)" in record['sql'] for record in queries)
+        print(f"✓ Logged {len(queries)} statements with latency and VM steps")
+
+        operation = records[-1]
+        assert operation['type'] == 'operation' and operation['name'] == 'load'
+        assert operation['entries'] == 2
+        assert operation['queries'] == len(queries)
+        assert operation['ms'] >= operation['query_ms'] >= operation['slowest_query_ms'] >= 0
+        assert format_operation(operation).startswith("load: ")
+        print("✓ Operation summary counts the queries it issued")
+
+
+def test_worker_jobs_and_log_rotation():
+    """Test job timings from the database worker and rotation of the log"""
+    print("\nTesting job timings and log rotation...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "metrics.jsonl")
+        metrics = Metrics(log_path, max_bytes=2000, backup_count=2)
+        worker = DatabaseWorker(MoodRepository.in_memory).start()
+        worker.metrics = metrics
+        worker.submit(lambda repo: metrics.attach(repo.conn))
+
+        done = []
+        for i in range(40):
+            worker.submit(lambda repo: repo.add_entry("Entry from the worker"), done.append,
+                          description="Saving mood")
+        wait_for(worker, lambda: len(done) == 40)
+        worker.stop()
+        metrics.close()
+
+        assert os.path.exists(log_path + ".1")
+        assert not os.path.exists(log_path + ".3")
+        jobs = [record for record in read_log(log_path) if record['type'] == 'job']
+        assert jobs and all(record['name'] == "Saving mood" and record['ok'] for record in jobs)
+        print("✓ Jobs were timed and the log rotated at its size limit")
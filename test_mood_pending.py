@@ -0,0 +1,228 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import mood_io
+import mood_pending
+import mood_repository
+from db_worker import DatabaseWorker
+from mood_repository import MoodRepository
+
+
+def test_journal_survives_torn_lines(tmp_path):
+    """Test that the journal reads back every complete record and clears"""
+    print("Testing the pending entry journal...")
+    path = mood_pending.pending_path(str(tmp_path / "mood_tracker_config.json"))
+    assert path == str(tmp_path / mood_pending.PENDING_FILE)
+    assert mood_pending.read_pending(path) == []
+
+    journal = mood_pending.PendingJournal(path)
+    records = [{'seq': 10 + i, 'text': f"Entry {i} – café", 'timestamp': f"2024-03-01 09:0{i}:00"}
+               for i in range(3)]
+    for record in records:
+        journal.append(record)
+    # Read while still open, as after a crash
+    assert mood_pending.read_pending(path) == records
+    journal.close()
+    print("✓ Appended records are on disk right away")
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"seq": 13, "text": "Half wri')
+    assert mood_pending.read_pending(path) == records
+    print("✓ A record torn by a crash is skipped")
+
+    journal.clear()
+    assert not os.path.exists(path)
+    journal.clear()
+    print("✓ Clearing removes the journal")
+
+
+def test_commit_and_replay_are_idempotent():
+    """Test that saves commit in one batch and a replayed journal adds nothing twice"""
+    print("\nTesting pending entry commits...")
+    records = [{'seq': 100 + i, 'text': f"Entry {i} #batch", 'timestamp': f"2024-03-01 09:0{i}:00"}
+               for i in range(4)]
+    with MoodRepository.in_memory() as repo:
+        committed = mood_pending.commit_pending(repo, records[:3])
+        assert [seq for seq, _ in committed] == [100, 101, 102]
+        assert [entry[1:3] for _, entry in committed] == [
+            (record['text'], record['timestamp']) for record in records[:3]]
+        assert int(repo.sync_value(mood_pending.COMMITTED_KEY)) == 102
+        assert repo.count(tags=["batch"]) == 3
+        print("✓ Records are committed with their save times and the highest sequence number")
+
+        # A crash after the commit leaves the whole journal behind
+        replayed = mood_pending.replay_pending(repo, records)
+        assert [seq for seq, _ in replayed] == [103]
+        assert repo.count() == 4
+        assert mood_pending.replay_pending(repo, records) == []
+        assert repo.count() == 4
+        print("✓ Replaying a journal only commits the records that were not committed")
+
+
+def test_marker_survives_failed_and_late_batches(monkeypatch):
+    """Test that a failed batch retried with or after a later one is neither lost nor doubled"""
+    print("\nTesting pending commits after a failure...")
+    first = [{'seq': i, 'text': f"First {i}", 'timestamp': "2024-03-01 09:00:00"}
+             for i in (1, 2, 3)]
+    second = [{'seq': i, 'text': f"Second {i}", 'timestamp': "2024-03-01 09:01:00"}
+              for i in (4, 5)]
+    with MoodRepository.in_memory() as repo:
+        def busy(*args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(mood_repository.mood_sentiment, "score_texts", busy)
+            with pytest.raises(sqlite3.OperationalError):
+                mood_pending.commit_pending(repo, first)
+        assert repo.sync_value(mood_pending.COMMITTED_KEY) is None and repo.count() == 0
+
+        # The GUI retries the failed entries together with the ones saved meanwhile
+        assert len(mood_pending.commit_pending(repo, first + second)) == 5
+        assert mood_pending.replay_pending(repo, first + second) == []
+        print("✓ A failed batch commits with the next one and is not replayed")
+
+        # Even a retry that commits after a later batch cannot lower the marker
+        later = [dict(record, seq=record['seq'] + 10) for record in second]
+        mood_pending.commit_pending(repo, later)
+        mood_pending.commit_pending(repo, [dict(record, seq=record['seq'] + 10)
+                                           for record in first])
+        assert int(repo.sync_value(mood_pending.COMMITTED_KEY)) == 15
+        assert mood_pending.replay_pending(repo, later) == []
+        assert repo.count() == 10
+        print("✓ The committed marker only moves forward")
+
+
+def run_jobs(worker):
+    """Poll the worker like the Tk main loop does until it is idle"""
+    deadline = time.monotonic() + 5
+    while worker.busy_for() is not None:
+        assert time.monotonic() < deadline, "timed out waiting for the database worker"
+        time.sleep(0.01)
+    worker.poll()
+
+
+def saves_in_flight(tmp_path):
+    """Return a worker, its PendingSaves and an Event that holds the worker while unset
+
+    Two entries are committing behind the held job and two more are waiting.
+    """
+    worker = DatabaseWorker(lambda: MoodRepository(str(tmp_path / "moods.db"))).start()
+    saves = mood_pending.PendingSaves(
+        worker, mood_pending.PendingJournal(str(tmp_path / mood_pending.PENDING_FILE)))
+    release = threading.Event()
+    worker.submit(lambda repo: release.wait(5), cancellable=False)
+    entries = [saves.add("First"), saves.add("Second")]
+    assert saves.flush()
+    entries += [saves.add("Third"), saves.add("Fourth")]
+    return worker, saves, release, entries
+
+
+def test_reads_and_deletes_queue_behind_a_flush_in_flight(tmp_path):
+    """Test that delete, Clear All and export see entries saved while a flush runs"""
+    print("\nTesting saves while a flush is in flight...")
+    worker, saves, release, entries = saves_in_flight(tmp_path)
+    committed = []
+    saves.on_committed = committed.extend
+    shown = [entries[1][0], entries[3][0]]
+    assert all(entry_id < 0 for entry_id in shown)
+
+    # What delete_selected does, with placeholder ids of both batches
+    saves.flush()
+    deleted = []
+    worker.submit(lambda repo: repo.delete_entries(saves.resolve(shown)), deleted.append)
+    path = str(tmp_path / "export.csv")
+    worker.submit(lambda repo: mood_io.export_file(repo, path), deleted.append)
+    release.set()
+    run_jobs(worker)
+    assert [seq for seq, _ in committed] == [-entry[0] for entry in entries]
+    assert deleted == [2, 2]
+    with open(path, encoding='utf-8') as f:
+        assert [line.split(',')[0] for line in f][1:] == ["First", "Third"]
+    assert not os.path.exists(saves.journal.path)
+    print("✓ Deletes and exports queued after a flush see every saved entry")
+
+    # What clear_all does
+    release.clear()
+    worker.submit(lambda repo: release.wait(5), cancellable=False)
+    saves.add("Fifth")
+    saves.flush()
+    saves.add("Sixth")
+    saves.drop_all()
+    cleared = []
+    worker.submit(lambda repo: repo.delete_all(), cleared.append)
+    release.set()
+    run_jobs(worker)
+    assert saves.pending == [] and cleared == [4]
+    worker.submit(lambda repo: repo.count(), cleared.append)
+    run_jobs(worker)
+    assert cleared[-1] == 0
+    print("✓ Clear All also clears entries saved while a flush was running")
+    worker.stop()
+
+
+def test_batches_behind_a_failed_one_are_retried_with_it(tmp_path, monkeypatch):
+    """Test that no batch commits ahead of a failed one and deleted entries are dropped"""
+    print("\nTesting a failed flush with another one queued...")
+    worker, saves, release, entries = saves_in_flight(tmp_path)
+    errors = []
+    saves.on_failed = errors.append
+    saves.flush()
+
+    def busy(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(mood_repository.mood_sentiment, "score_texts", busy)
+        release.set()
+        run_jobs(worker)
+    assert [str(e) for e in errors] == ["database is locked"]
+    assert [record['text'] for record in saves.pending] == ["First", "Second", "Third", "Fourth"]
+    assert mood_pending.read_pending(saves.journal.path) == [
+        {key: record[key] for key in ('seq', 'text', 'timestamp')} for record in saves.pending]
+    print("✓ The batch queued behind a failed one is not committed ahead of it")
+
+    # Deleting an entry that never committed drops it for good
+    removed = []
+    worker.submit(lambda repo: saves.resolve([entries[0][0]]), removed.append)
+    run_jobs(worker)
+    saves.discard(removed[0])
+    assert [record['text'] for record in saves.pending] == ["Second", "Third", "Fourth"]
+    saves.flush()
+    run_jobs(worker)
+    texts = []
+    worker.submit(lambda repo: [entry[1] for entry in repo.iter_entries(oldest_first=True)],
+                  texts.append)
+    run_jobs(worker)
+    assert texts == [["Second", "Third", "Fourth"]]
+    assert not os.path.exists(saves.journal.path)
+    print("✓ The retry commits the rest in order and empties the journal")
+    worker.stop()
+
+
+def test_sequence_starts_above_the_committed_marker(tmp_path):
+    """Test that saves after the clock was set back are still replayed after a crash"""
+    print("\nTesting the sequence after a clock change...")
+    marker = mood_repository.tombstone_token() + 10 ** 9
+    with MoodRepository(str(tmp_path / "moods.db")) as repo:
+        repo.set_sync_value(mood_pending.COMMITTED_KEY, str(marker))
+    worker = DatabaseWorker(lambda: MoodRepository(str(tmp_path / "moods.db"))).start()
+    saves = mood_pending.PendingSaves(
+        worker, mood_pending.PendingJournal(str(tmp_path / mood_pending.PENDING_FILE)))
+    saves.recover(lambda committed: None)
+    run_jobs(worker)
+    saves.add("After the clock went back")
+    saves.journal.close()
+    assert saves.pending[0]['seq'] > marker
+
+    # As if the app crashed before the commit
+    replayed = []
+    worker.submit(lambda repo: mood_pending.replay_pending(
+        repo, mood_pending.read_pending(saves.journal.path)), replayed.append)
+    run_jobs(worker)
+    assert [entry[1] for _, entry in replayed[0]] == ["After the clock went back"]
+    print("✓ New entries are numbered above the committed marker")
+    worker.stop()
@@ -0,0 +1,317 @@
+import os
+from datetime import datetime, timedelta
+
+from mood_repository import MoodRepository, make_timestamp, period_range, tombstone_token
+
+
+def make_rows(count, start=datetime(2024, 1, 1, 8, 0, 0)):
+    """Return count (mood_text, timestamp, created_at) rows one minute apart"""
+    rows = []
+    for i in range(count):
+        timestamp, created_at = make_timestamp(start + timedelta(minutes=i))
+        rows.append((f"mood {i}", timestamp, created_at))
+    return rows
+
+
+def test_batched_writes_and_paging():
+    """Test batched inserts and deletes and keyset paging in memory"""
+    print("Testing repository batching and paging...")
+    with MoodRepository.in_memory() as repo:
+        assert repo.add_entries(make_rows(250)) == 250
+        assert repo.count() == 250
+        print("✓ Batched insert of 250 entries")
+
+        first_page = repo.newest_entries(100)
+        assert first_page[0][1] == "mood 249"
+        second_page = repo.entries_before(first_page[-1], 100)
+        assert second_page[0][1] == "mood 149"
+        assert repo.entries_after(second_page[0], 100) == first_page
+        print("✓ Keyset paging in both directions")
+
+        deleted = repo.delete_entries([entry[0] for entry in first_page[:10]])
+        assert deleted == 10
+        assert repo.count() == 240
+        assert repo.get_entry(first_page[0][0]) is None
+        print("✓ Batched delete by id")
+
+
+def test_streaming_iterator_and_temp_file():
+    """Test streaming all entries from a temporary database file"""
+    print("\nTesting streaming iterator on a temporary file...")
+    repo = MoodRepository.temporary()
+    path = repo.path
+    entry = repo.add_entry("single entry")
+    repo.add_entries(make_rows(25))
+
+    streamed = list(repo.iter_entries(fetch_size=7))
+    assert len(streamed) == 26
+    assert streamed[0] == entry
+    print("✓ Streamed 26 entries in batches of 7")
+
+    repo.close()
+    assert not os.path.exists(path)
+    print("✓ Temporary database removed on close")
+
+
+def test_full_text_search():
+    """Test ranked, highlighted full-text search that follows inserts and deletes"""
+    print("\nTesting full-text search...")
+    with MoodRepository.in_memory() as repo:
+        repo.add_entries([
+            ("Tired after work, but the walk helped", "2024-03-01 18:00:00", 1709312400),
+            ("Great walk in the park with friends", "2024-03-02 10:00:00", 1709370000),
+            ("Anxious about deadlines", "2024-03-03 09:00:00", 1709452800),
+        ])
+        results = repo.search("walk")
+        assert len(results) == 2
+        assert all("«walk»" in row[1] for row in results)
+        print("✓ Found and highlighted 2 entries for 'walk'")
+
+        # Prefix matching supports search as you type
+        assert [row[1] for row in repo.search("dead")] == ["Anxious about «deadlines»"]
+        assert repo.search("walk park")[0][1].startswith("Great")
+        assert repo.search("") == []
+        print("✓ Prefix and multi-word queries")
+
+        repo.delete_entries([results[0][0]])
+        assert len(repo.search("walk")) == 1
+        print("✓ Index kept in sync on delete")
+
+
+def test_rollups_follow_inserts_and_deletes():
+    """Test that daily and weekly rollups are maintained by triggers"""
+    print("\nTesting statistics rollups...")
+    with MoodRepository.in_memory() as repo:
+        repo.add_entries([
+            ("abcd", "2024-01-01 09:00:00", 1704099600),   # Monday
+            ("ab", "2024-01-01 20:00:00", 1704139200),
+            ("abcdef", "2024-01-02 08:00:00", 1704182400),
+            ("a", "2024-01-08 08:00:00", 1704700800),      # next Monday
+        ])
+        assert repo.daily_stats("2024-01-01", "2024-01-31") == [
+            ("2024-01-01", 2, 6), ("2024-01-02", 1, 6), ("2024-01-08", 1, 1),
+        ]
+        assert repo.weekly_stats() == [("2024-01-08", 1, 1), ("2024-01-01", 3, 12)]
+        print("✓ Rollups updated on insert")
+
+        newest = repo.newest_entries(1)[0]
+        repo.delete_entries([newest[0]])
+        assert repo.weekly_stats() == [("2024-01-01", 3, 12)]
+        print("✓ Empty rollup rows removed on delete")
+
+        summary = repo.stats_summary(today=datetime(2024, 1, 3).date())
+        assert summary['total_entries'] == 3
+        assert summary['days_logged'] == 2
+        assert summary['average_length'] == 4.0
+        assert summary['current_streak'] == 2
+        print("✓ Summary and streak computed from rollups")
+
+
+def test_period_counts_and_range_paging():
+    """Test the year/month/day counts and paging within a date range"""
+    print("\nTesting date range navigation...")
+    with MoodRepository.in_memory() as repo:
+        rows = []
+        for when in (datetime(2023, 12, 31, 23, 30), datetime(2024, 1, 1, 0, 30),
+                     datetime(2024, 1, 15, 12, 0), datetime(2024, 3, 1, 9, 0)):
+            rows += [(f"{when:%Y-%m-%d} {i}", *make_timestamp(when + timedelta(minutes=i)))
+                     for i in range(3)]
+        repo.add_entries(rows)
+
+        assert repo.period_counts() == [("2024", 9), ("2023", 3)]
+        assert repo.period_counts("2024") == [("2024-03", 3), ("2024-01", 6)]
+        assert repo.period_counts("2024-01") == [("2024-01-15", 3), ("2024-01-01", 3)]
+        print("✓ Counts per year, month and day")
+
+        january = period_range("2024-01")
+        assert january == (int(datetime(2024, 1, 1).timestamp()),
+                           int(datetime(2024, 2, 1).timestamp()))
+        assert period_range("2024-12")[1] == int(datetime(2025, 1, 1).timestamp())
+        assert repo.count(within=january) == 6
+
+        first_page = repo.newest_entries(4, within=january)
+        assert [entry[1] for entry in first_page] == [
+            "2024-01-15 2", "2024-01-15 1", "2024-01-15 0", "2024-01-01 2"]
+        second_page = repo.entries_before(first_page[-1], 4, within=january)
+        assert [entry[1] for entry in second_page] == ["2024-01-01 1", "2024-01-01 0"]
+        assert repo.entries_after(second_page[0], 4, within=january) == first_page
+        assert repo.entries_after(first_page[0], 4, within=january) == []
+        assert repo.newest_entries(4, within=period_range("2024-02-10")) == []
+        print("✓ Paging stays within the selected range")
+
+
+def test_soft_delete_undo_and_purge():
+    """Test tombstoned deletes, undo, and purging followed by incremental vacuum"""
+    print("\nTesting soft delete...")
+    with MoodRepository.temporary() as repo:
+        repo.add_entries(make_rows(3000))
+        newest = repo.newest_entries(5)
+        token = tombstone_token()
+        assert repo.delete_entries([entry[0] for entry in newest], token) == 5
+        assert repo.count() == 2995
+        assert repo.get_entry(newest[0][0]) is None
+        assert repo.search("mood 2999") == []
+        assert repo.stats_summary()['total_entries'] == 2995
+        assert repo.restore_entries(token) == 5
+        assert repo.newest_entries(5) == newest
+        assert repo.stats_summary()['total_entries'] == 3000
+        print("✓ Deleted entries are hidden everywhere and can be restored")
+
+        days = repo.daily_stats("2024-01-01", "2024-01-31")
+        assert [day[1] for day in days] == [960, 1440, 600]
+        clear_token = tombstone_token()
+        assert repo.delete_all(clear_token) == 3000
+        assert repo.count() == 0 and repo.newest_entries(5) == []
+        assert repo.stats_summary()['total_entries'] == 0
+        assert repo.restore_entries(clear_token) == 3000
+        assert repo.daily_stats("2024-01-01", "2024-01-31") == days
+        print("✓ Clear All is undone with the rollups rebuilt in bulk")
+
+        repo.delete_entries([newest[0][0]])
+        repo.delete_all()
+        # Tombstones newer than the cutoff are kept for undo
+        assert repo.purge_deleted(clear_token) == 0
+        assert repo.purge_deleted(tombstone_token(), batch_size=1000) == 1000
+        while repo.purge_deleted(tombstone_token(), batch_size=1000):
+            pass
+        assert repo.deleted_count() == 0
+        assert repo.stats_summary()['total_entries'] == 0
+        pages = repo.conn.execute("PRAGMA page_count").fetchone()[0]
+        assert repo.incremental_vacuum(pages) == 0
+        assert repo.conn.execute("PRAGMA page_count").fetchone()[0] < pages
+        print("✓ Tombstones purged in batches and free pages released")
+
+
+def test_archives_stay_transparent():
+    """Test that archived entries are still counted, paged, searched and streamed"""
+    print("\nTesting yearly archives...")
+    repo = MoodRepository.temporary()
+    # One entry every 20 hours from 2019 into 2024
+    repo.add_entries([(f"mood {i} {'rainy' if i % 4 == 0 else 'sunny'}",
+                       *make_timestamp(datetime(2019, 1, 1, 8, 0, 0) + timedelta(hours=20 * i)))
+                      for i in range(2500)])
+    everything = list(repo.iter_entries())
+    stats = repo.stats_summary()
+    trend = repo.daily_trend("2019-01-01", "2025-12-31")
+    within = period_range("2021")
+    in_2021 = [entry for entry in everything if within[0] <= entry[3] < within[1]]
+    rainy = sorted(repo.search("rainy", 5000))
+
+    cutoff = int(datetime(2022, 7, 1).timestamp())
+    archived = 0
+    while True:
+        moved = repo.archive_entries(cutoff, batch_size=400)
+        if not moved:
+            break
+        archived += moved
+    assert archived == sum(1 for entry in everything if entry[3] < cutoff)
+    assert [year for year, _ in repo.archive_years()] == [2019, 2020, 2021, 2022]
+    assert repo.conn.execute("SELECT COUNT(*) FROM moods").fetchone()[0] == 2500 - archived
+    assert sorted(os.listdir(repo.archive_dir)) == [f"moods_{year}.db" for year in range(2019, 2023)]
+    print(f"✓ Archived {archived} entries into 4 yearly files")
+
+    assert repo.count() == 2500
+    assert repo.count(within=within) == len(in_2021)
+    assert repo.stats_summary() == stats
+    assert repo.daily_trend("2019-01-01", "2025-12-31") == trend
+    print("✓ Counts and rollups unchanged")
+
+    paged = page = repo.newest_entries(64)
+    while page:
+        page = repo.entries_before(page[-1], 64)
+        paged = paged + page
+    assert paged == everything
+    page = repo.entries_after(everything[-1], 64)
+    assert page == everything[-65:-1]
+    page = repo.newest_entries(50, within=within)
+    assert page == in_2021[:50]
+    assert repo.entries_before(page[-1], 50, within=within) == in_2021[50:100]
+    assert list(repo.iter_entries()) == everything
+    assert list(repo.iter_entries(oldest_first=True)) == everything[::-1]
+    assert list(repo.iter_entries_since(within[0], limit=100)) == everything[:100]
+    assert repo.get_entry(everything[-1][0]) == everything[-1]
+    assert sorted(repo.search("rainy", 5000)) == rainy
+    # Never more than MAX_ATTACHED_ARCHIVES are attached at once
+    databases = repo.conn.execute("PRAGMA database_list").fetchall()
+    assert len(databases) <= 2 + 4
+    print("✓ Paging, streaming, lookups and search span the archives")
+
+    summaries = repo.year_summaries()
+    assert [row[:2] for row in summaries] == [
+        (year, sum(1 for entry in everything if entry[2].startswith(str(year))))
+        for year in range(2019, 2025)]
+    print("✓ Yearly summaries read every partition")
+
+    archive_dir = repo.archive_dir
+    repo.close()
+    assert not os.path.exists(archive_dir)
+
+
+def test_archived_entries_change_and_sync():
+    """Test deleting, clearing and syncing entries that live in an archive"""
+    print("\nTesting changes to archived entries...")
+    repo = MoodRepository.temporary()
+    repo.add_entries(make_rows(300, start=datetime(2020, 12, 31, 20, 0, 0)))
+    oldest = list(repo.iter_entries(oldest_first=True))
+    while repo.archive_entries(int(datetime(2021, 1, 1, 1, 0, 0).timestamp())):
+        pass
+    assert repo.archive_years() == [(2020, 240), (2021, 60)]
+
+    assert repo.delete_entries([oldest[0][0]]) == 1
+    assert repo.get_entry(oldest[0][0]) is None
+    assert repo.count() == 299 and repo.stats_summary()['total_entries'] == 299
+    assert repo.archive_years() == [(2020, 239), (2021, 60)]
+    print("✓ Archived entry moved back and deleted")
+
+    token = tombstone_token()
+    assert repo.delete_all(token) == 299
+    assert repo.archive_years() == [] and os.listdir(repo.archive_dir) == []
+    assert repo.restore_entries(token) == 299
+    assert repo.count() == 299 and repo.stats_summary()['total_entries'] == 299
+    print("✓ Clear All empties the archives and is undone as usual")
+
+    while repo.archive_entries(int(datetime(2021, 1, 1, 1, 0, 0).timestamp())):
+        pass
+    changes = [change[1:] for change in repo.iter_changes()]
+    assert len(changes) == 300
+    assert sum(1 for change in changes if change[-1]) == 1
+    assert all(change[3] is not None for change in changes if not change[-1])
+    with MoodRepository.in_memory() as other:
+        assert other.apply_changes(changes) == (300, 0)
+        assert other.count() == 299
+    assert repo.apply_changes(changes) == (0, 300)
+    print("✓ Archived entries are exported and recognized when synced back")
+
+    uuid, changed_at, origin, mood_text, timestamp, created_at, _ = changes[1]
+    edited = (uuid, changed_at + 1, origin, "edited", timestamp, created_at, False)
+    assert repo.apply_changes([edited]) == (1, 0)
+    assert repo.get_entry(oldest[1][0])[1] == "edited"
+    assert repo.count() == 299 and repo.stats_summary()['total_entries'] == 299
+    print("✓ Newer versions of archived entries are applied")
+    repo.close()
+
+
+def test_moving_entries_back_is_not_a_change():
+    """Test that un-archiving an entry logs no change and keeps the rollups"""
+    print("\nTesting moves out of an archive...")
+    repo = MoodRepository.temporary()
+    repo.add_entries(make_rows(20, start=datetime(2020, 6, 1, 8, 0, 0)))
+    while repo.score_entries():
+        pass
+    oldest = list(repo.iter_entries(oldest_first=True))
+    while repo.archive_entries(int(datetime(2021, 1, 1).timestamp())):
+        pass
+    assert repo.archive_years() == [(2020, 20)]
+    change = repo.last_change()
+    sentiment_sql = "SELECT SUM(scored_count) FROM mood_daily_sentiment"
+    scored = repo.conn.execute(sentiment_sql).fetchone()[0]
+    assert scored == 20
+
+    assert repo.delete_entries([oldest[0][0]]) == 1
+    assert repo.last_change() == change + 1
+    assert [row[1] for row in repo.iter_changes(change)] == [
+        repo.conn.execute("SELECT uuid FROM moods WHERE id = ?", (oldest[0][0],)).fetchone()[0]]
+    assert repo.conn.execute(sentiment_sql).fetchone()[0] == scored - 1
+    assert repo.stats_summary()['total_entries'] == 19
+    print("✓ Only the delete of an archived entry is logged")
+    repo.close()
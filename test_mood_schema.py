@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import tempfile
+
+import mood_schema
+
+
+def test_migrate_legacy_database():
+    """Test that an original text-timestamp database is migrated in place"""
+    print("Testing schema migration of a legacy database...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'legacy.db')
+
+        # Database as created by the first release of the app
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE moods (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                mood_text TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            )
+        ''')
+        conn.executemany("INSERT INTO moods (mood_text, timestamp) VALUES (?, ?)",
+                         [("older", "2024-01-01 09:00:00"), ("newer", "2024-06-01 18:30:00")])
+        conn.commit()
+        conn.close()
+
+        conn = mood_schema.connect(path)
+        assert mood_schema.schema_version(conn) == mood_schema.SCHEMA_VERSION
+        print(f"✓ Migrated to schema version {mood_schema.SCHEMA_VERSION}")
+
+        rows = conn.execute(
+            "SELECT mood_text, created_at FROM moods ORDER BY created_at DESC, id DESC"
+        ).fetchall()
+        assert [row[0] for row in rows] == ["newer", "older"]
+        assert all(isinstance(row[1], int) for row in rows)
+        print("✓ Existing rows backfilled with epoch timestamps")
+
+        # Writers that only set the text timestamp still get created_at
+        conn.execute("INSERT INTO moods (mood_text, timestamp) VALUES (?, ?)",
+                     ("legacy writer", "2025-01-01 12:00:00"))
+        conn.commit()
+        created_at = conn.execute(
+            "SELECT created_at FROM moods WHERE mood_text = 'legacy writer'"
+        ).fetchone()[0]
+        assert created_at > rows[0][1]
+        print("✓ Trigger fills created_at for text-only inserts")
+
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM moods WHERE deleted_at IS NULL "
+            "ORDER BY created_at DESC, id DESC LIMIT 10"
+        ).fetchall()
+        assert any("idx_moods_live" in row[-1] for row in plan)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == mood_schema.AUTO_VACUUM_INCREMENTAL
+        print("✓ Sorted reads use the index, the database runs in WAL mode with incremental vacuum")
+
+        if mood_schema.has_table(conn, 'moods_fts'):
+            matches = conn.execute(
+                "SELECT rowid FROM moods_fts WHERE moods_fts MATCH 'older'"
+            ).fetchall()
+            assert len(matches) == 1
+            print("✓ Full-text index built for existing rows")
+
+        days = conn.execute("SELECT day, entry_count FROM mood_daily_stats ORDER BY day").fetchall()
+        assert days == [("2024-01-01", 1), ("2024-06-01", 1), ("2025-01-01", 1)]
+        print("✓ Statistics rollups backfilled")
+
+        ids = conn.execute("SELECT uuid FROM moods ORDER BY id").fetchall()
+        assert all(uuid for (uuid,) in ids) and len(set(ids)) == 3
+        assert conn.execute("SELECT COUNT(*) FROM mood_changes").fetchone()[0] >= 3
+        print("✓ Entries have ids and every entry is in the change log")
+
+        # Migrating again is a no-op
+        assert mood_schema.migrate(conn) == mood_schema.SCHEMA_VERSION
+        device_id = mood_schema.device_id(conn)
+        conn.close()
+
+        # Another copy of the original file gives its entries the same ids
+        copy = sqlite3.connect(os.path.join(tmp_dir, 'copy.db'))
+        copy.execute("CREATE TABLE moods (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "mood_text TEXT NOT NULL, timestamp TEXT NOT NULL)")
+        copy.executemany("INSERT INTO moods (mood_text, timestamp) VALUES (?, ?)",
+                         [("older", "2024-01-01 09:00:00"), ("newer", "2024-06-01 18:30:00")])
+        copy.commit()
+        mood_schema.configure_connection(copy)
+        mood_schema.migrate(copy)
+        assert copy.execute("SELECT uuid FROM moods ORDER BY id").fetchall() == ids[:2]
+        assert mood_schema.device_id(copy) != device_id
+        copy.close()
+        print("✓ Copies of one file agree on entry ids but not on device ids")
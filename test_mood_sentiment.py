@@ -0,0 +1,126 @@
+import pytest
+
+import mood_cli
+import mood_sentiment
+from mood_repository import MoodRepository
+
+
+def sentiments(repo):
+    """Return {mood_text: (sentiment, sentiment_version)} of every entry"""
+    rows = repo.conn.execute("SELECT mood_text, sentiment, sentiment_version FROM moods")
+    return {text: (sentiment, version) for text, sentiment, version in rows}
+
+
+def test_scoring_rules():
+    """Test the lexicon, boosters, negations and the range of scores"""
+    print("Testing sentiment scores...")
+    score = mood_sentiment.score_text
+    assert score("Feeling happy and grateful") > score("Feeling happy") > 0
+    assert score("Sad and anxious all day") < score("a bit sad") < 0
+    assert score("Went to the shops") == score("") == 0.0
+    print("✓ Positive, negative and neutral entries score as expected")
+
+    assert score("very happy") > score("happy")
+    assert score("not happy") < 0 < score("not sad")
+    assert score("I don't feel anxious") == score("I don’t feel anxious") > 0
+    assert score("Not sure why, but happy") == score("HAPPY!") == score("happy")
+    print("✓ Boosters strengthen and negations flip the words after them")
+
+    many = " ".join(["wonderful"] * 100)
+    assert 0.99 < score(many) < 1 and -1 < score(many.replace("wonderful", "awful")) < -0.99
+    print("✓ Scores stay between -1 and 1")
+
+
+def test_batches_match_single_scores():
+    """Test that batch scoring, vectorized or not, gives the single-text scores"""
+    print("\nTesting batch scoring...")
+    texts = ["Calm after a long walk", "not very happy", "", "Stressed\nbut hopeful",
+             "Tired", "no", "happy", "Café with friends, so relaxed"] * 50
+    expected = [mood_sentiment.score_text(text) for text in texts]
+    assert mood_sentiment.score_texts(texts) == pytest.approx(expected)
+    assert mood_sentiment.score_texts([]) == []
+    # A text containing the batch separator cannot be split apart again
+    assert mood_sentiment.score_texts(["happy\x00sad", "sad"]) == pytest.approx(
+        [mood_sentiment.score_text("happy\x00sad"), mood_sentiment.score_text("sad")])
+    mode = "NumPy" if mood_sentiment.load_numpy() is not None else "pure Python"
+    print(f"✓ Batches ({mode}) score the same as single texts")
+
+
+def test_entries_are_scored_once_per_lexicon_version(monkeypatch):
+    """Test incremental scoring of saves, bulk inserts and lexicon updates"""
+    print("\nTesting stored sentiment scores...")
+    with MoodRepository.in_memory() as repo:
+        repo.add_entry("Happy to be home")
+        assert sentiments(repo)["Happy to be home"] == (
+            mood_sentiment.score_text("Happy to be home"), mood_sentiment.LEXICON_VERSION)
+        repo.add_entries([(f"Sad day {i}", "2024-03-01 09:00:00", 1709280000 + i)
+                          for i in range(25)])
+        assert repo.unscored_count() == 25
+        print("✓ Saved entries are scored right away, bulk inserts are left for later")
+
+        assert [repo.score_entries(batch_size=10) for _ in range(4)] == [10, 10, 5, 0]
+        assert repo.unscored_count() == 0
+        assert all(version == mood_sentiment.LEXICON_VERSION and sentiment < 0
+                   for text, (sentiment, version) in sentiments(repo).items()
+                   if text.startswith("Sad day"))
+        print("✓ Unscored entries are scored in batches and only once")
+
+        plan = repo.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM moods WHERE sentiment_version < 1")
+        assert any("idx_moods_sentiment_version" in row[-1] for row in plan)
+
+        monkeypatch.setattr(mood_sentiment, "LEXICON_VERSION", mood_sentiment.LEXICON_VERSION + 1)
+        assert repo.unscored_count() == 26
+        assert repo.score_entries() == 26 and repo.unscored_count() == 0
+        print("✓ A new lexicon version rescores every entry")
+
+        # A synced edit of the text needs a new score
+        uuid = repo.conn.execute(
+            "SELECT uuid FROM moods WHERE mood_text = 'Happy to be home'").fetchone()[0]
+        repo.apply_changes([(uuid, 2 ** 60, "other-device", "Lonely at home",
+                             "2024-03-02 09:00:00", 1709366400, False)])
+        assert sentiments(repo)["Lonely at home"] == (None, 0)
+        assert repo.score_entries() == 1
+        assert sentiments(repo)["Lonely at home"][0] < 0
+        print("✓ Entries edited by a sync are scored again")
+
+
+def test_score_command(tmp_path, capsys):
+    """Test the score command"""
+    print("\nTesting the score command...")
+    path = str(tmp_path / "journal.db")
+    with MoodRepository(path) as repo:
+        repo.add_entries([("Grateful", "2024-03-01 09:00:00", 1709280000)])
+    assert mood_cli.main(["--db", path, "score"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "Scored the sentiment of 1 entries"
+    with MoodRepository(path) as repo:
+        assert repo.unscored_count() == 0
+    print("✓ The score command scores what is left")
+
+
+def test_daily_trend_follows_scores_and_deletes():
+    """Test the per-day sentiment rollup read by the trend chart"""
+    print("\nTesting the daily trend...")
+    with MoodRepository.in_memory() as repo:
+        repo.add_entries([("Happy", "2024-03-01 09:00:00", 1709280000),
+                          ("Sad", "2024-03-01 18:00:00", 1709312400),
+                          ("Walked", "2024-03-03 09:00:00", 1709452800)])
+        assert repo.day_range() == ("2024-03-01", "2024-03-03")
+        assert repo.daily_trend("2024-03-01", "2024-03-31") == [
+            ("2024-03-01", 2, None), ("2024-03-03", 1, None)]
+        print("✓ Days without scores have no average")
+
+        repo.score_entries()
+        happy, sad = mood_sentiment.score_text("Happy"), mood_sentiment.score_text("Sad")
+        (day, count, average), last_day = repo.daily_trend("2024-03-01", "2024-03-31")
+        assert (day, count) == ("2024-03-01", 2) and average == pytest.approx((happy + sad) / 2)
+        assert last_day == ("2024-03-03", 1, 0.0)
+        print("✓ Scoring fills in the averages")
+
+        entry_id = repo.conn.execute("SELECT id FROM moods WHERE mood_text = 'Sad'").fetchone()[0]
+        repo.delete_entries([entry_id])
+        assert repo.daily_trend("2024-03-01", "2024-03-01") == [("2024-03-01", 1, pytest.approx(happy))]
+        repo.delete_all()
+        assert repo.daily_trend("2024-03-01", "2024-03-31") == []
+        assert repo.day_range() == (None, None)
+        print("✓ Deleted entries leave the averages")
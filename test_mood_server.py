@@ -0,0 +1,120 @@
+import asyncio
+import os
+import tempfile
+
+import mood_server
+from load_test_mood_server import load_test, request
+from mood_repository import MoodRepository
+from mood_server import MoodServer
+
+
+def run_with_server(check, **options):
+    """Run check(server) against a server on a temporary database"""
+    async def main(path):
+        server = await MoodServer(path, port=0, **options).start()
+        try:
+            await check(server)
+        finally:
+            await server.close()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "server.db")
+        asyncio.run(main(path))
+        with MoodRepository(path) as repo:
+            return repo.count()
+
+
+def test_api_endpoints():
+    """Test adding, listing, searching and statistics over HTTP"""
+    print("Testing the JSON API...")
+
+    async def check(server):
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        status, entry = await request(reader, writer, 'POST', '/moods',
+                                      {'mood_text': "Calm after a long walk"})
+        assert status == 201 and entry['mood_text'] == "Calm after a long walk"
+        await request(reader, writer, 'POST', '/moods', {'mood_text': "Busy day"})
+
+        status, entries = await request(reader, writer, 'GET', '/moods?limit=1')
+        assert status == 200 and [e['mood_text'] for e in entries] == ["Busy day"]
+        status, entries = await request(reader, writer, 'GET', f"/moods?since={entry['created_at']}")
+        assert len(entries) == 2
+        status, found = await request(reader, writer, 'GET', '/search?q=walk')
+        assert [e['id'] for e in found] == [entry['id']]
+        status, stats = await request(reader, writer, 'GET', '/stats')
+        assert stats['total_entries'] == 2
+        print("✓ add, list, search and stats work over one keep-alive connection")
+
+        assert (await request(reader, writer, 'POST', '/moods', {'mood_text': "  "}))[0] == 400
+        assert (await request(reader, writer, 'GET', '/moods?limit=ten'))[0] == 400
+        assert (await request(reader, writer, 'GET', '/moods?limit=-1'))[0] == 400
+        assert (await request(reader, writer, 'GET', '/search?q=x&limit=0'))[0] == 400
+        assert (await request(reader, writer, 'DELETE', '/moods'))[0] == 405
+        assert (await request(reader, writer, 'GET', '/nowhere'))[0] == 404
+        writer.close()
+        print("✓ Bad requests are answered with an error status")
+
+    assert run_with_server(check) == 2
+
+
+def test_token_is_required_when_set():
+    """Test that a server started with a token rejects requests without it"""
+    print("\nTesting API tokens...")
+
+    async def check(server):
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        status, body = await request(reader, writer, 'GET', '/health')
+        assert status == 401 and 'error' in body
+        status, _ = await request(reader, writer, 'GET', '/health', token="secreT")
+        assert status == 401
+        status, _ = await request(reader, writer, 'POST', '/moods', {'mood_text': "Secret"},
+                                  token="secret")
+        assert status == 201
+        writer.close()
+
+    assert run_with_server(check, token="secret") == 1
+    print("✓ Only requests with the token are served")
+
+
+def test_slow_headers_time_out(monkeypatch):
+    """Test that a client trickling header bytes cannot hold a connection open"""
+    print("\nTesting slow clients...")
+    monkeypatch.setattr(mood_server, "IDLE_TIMEOUT_SECONDS", 0.3)
+
+    async def check(server):
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(b"GET /health HTTP/1.1\r\nX-Slow: ")
+        start = asyncio.get_running_loop().time()
+        try:
+            # A byte at a time, each well within the timeout
+            for _ in range(40):
+                writer.write(b"a")
+                await writer.drain()
+                await asyncio.sleep(0.05)
+                if reader.at_eof():
+                    break
+        except ConnectionError:
+            pass
+        assert await asyncio.wait_for(reader.read(), 2) == b""
+        assert asyncio.get_running_loop().time() - start < 1.5
+        writer.close()
+
+    run_with_server(check)
+    print("✓ The connection is closed once the headers take longer than the timeout")
+
+
+def test_bursts_of_writes_share_commits():
+    """Test that concurrent saves are group-committed and all of them are kept"""
+    print("\nTesting group commit under load...")
+    reports = []
+
+    async def check(server):
+        reports.append(await load_test(server.host, server.port, requests=500, concurrency=25))
+
+    saved = run_with_server(check)
+    report = reports[0]
+    assert report['failures'] == 0
+    assert saved == report['entries_written'] == 400
+    assert report['commits'] < report['entries_written'] / 2
+    print(f"✓ {report['entries_written']} entries saved in {report['commits']} commits "
+          f"({report['requests_per_second']} requests/s)")
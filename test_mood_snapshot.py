@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+
+import mood_snapshot
+from mood_repository import MoodRepository
+
+
+def test_snapshot_round_trip_and_change_counter():
+    """Test that a snapshot restores the newest page until the database changes"""
+    print("Testing first-paint snapshots...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, "moods.db")
+        path = mood_snapshot.snapshot_path(os.path.join(tmp_dir, "mood_tracker_config.json"))
+        assert path == os.path.join(tmp_dir, mood_snapshot.SNAPSHOT_FILE)
+        with MoodRepository(db) as repo:
+            for i in range(30):
+                repo.add_entry(f"Entry {i} – café")
+            saved = mood_snapshot.save_snapshot(repo, path, db, 12)
+            assert os.listdir(tmp_dir).count(mood_snapshot.SNAPSHOT_FILE) == 1
+            assert not any(name.endswith('.partial') for name in os.listdir(tmp_dir))
+
+            snapshot = mood_snapshot.load_snapshot(path, db)
+            assert snapshot['entries'] == repo.newest_entries(12)
+            assert snapshot['total_entries'] == 30
+            assert snapshot['change'] == saved['change'] == repo.last_change()
+            print("✓ Newest page and change counter saved and loaded")
+
+            # Anything that changes the visible entries moves the counter on
+            repo.delete_entries([snapshot['entries'][0][0]])
+            assert repo.last_change() != snapshot['change']
+            print("✓ A delete invalidates the snapshot")
+
+        assert mood_snapshot.load_snapshot(path, os.path.join(tmp_dir, "other.db")) is None
+        with open(path, 'w') as f:
+            json.dump(dict(saved, version=mood_snapshot.SNAPSHOT_VERSION + 1), f)
+        assert mood_snapshot.load_snapshot(path, db) is None
+        with open(path, 'w') as f:
+            f.write('{"version": 1, "entr')
+        assert mood_snapshot.load_snapshot(path, db) is None
+        os.remove(path)
+        assert mood_snapshot.load_snapshot(path, db) is None
+        print("✓ Snapshots of other databases, versions or broken files are ignored")
@@ -0,0 +1,161 @@
+import os
+import tempfile
+
+import pytest
+
+import mood_cli
+import mood_sync
+from mood_repository import MoodRepository, tombstone_token
+
+
+def live_entries(repo):
+    """Return {uuid: mood_text} of the live entries"""
+    return dict(repo.conn.execute("SELECT uuid, mood_text FROM moods WHERE deleted_at IS NULL"))
+
+
+def test_deltas_carry_only_new_changes():
+    """Test exporting and applying deltas between two journals"""
+    print("Testing delta sync...")
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            MoodRepository.temporary() as laptop, MoodRepository.temporary() as desktop:
+        assert laptop.device_id != desktop.device_id
+        delta = os.path.join(tmp_dir, "laptop.delta.gz")
+
+        laptop.add_entries([(f"Entry {i}", f"2024-01-{i % 28 + 1:02d} 09:00:00", 1704096000 + i)
+                            for i in range(200)])
+        first = laptop.add_entry("Deleted before the first sync")
+        laptop.delete_entries([first[0]])
+        count, _ = mood_sync.export_changes(laptop, delta)
+        assert count == 201
+        assert mood_sync.apply_delta(desktop, delta) == (201, 0)
+        assert live_entries(desktop) == live_entries(laptop)
+        assert desktop.stats_summary()['total_entries'] == 200
+        print("✓ First delta copies every entry under the same ids")
+
+        laptop.add_entry("Written on the laptop")
+        laptop.delete_entries([laptop.newest_entries(2)[1][0]])
+        assert mood_sync.export_changes(laptop, delta)[0] == 2
+        assert mood_sync.apply_delta(desktop, delta) == (2, 0)
+        assert live_entries(desktop) == live_entries(laptop)
+        assert desktop.count() == laptop.count() == 200
+        print("✓ Later deltas only hold the entries changed since the last export")
+
+        # Changes applied from the laptop come back as echoes and are skipped
+        desktop.add_entry("Written on the desktop")
+        back = os.path.join(tmp_dir, "desktop.delta")
+        mood_sync.export_changes(desktop, back)
+        applied, skipped = mood_sync.apply_delta(laptop, back)
+        assert applied == 1 and skipped > 0
+        assert live_entries(desktop) == live_entries(laptop)
+        assert mood_sync.apply_delta(laptop, back) == (0, applied + skipped)
+        print("✓ Both journals converge and applying a delta twice changes nothing")
+
+        # Purged entries are still exported as deletes
+        gone = laptop.newest_entries(1)[0]
+        laptop.delete_entries([gone[0]], token=1)
+        assert laptop.purge_deleted(older_than=1) == 1
+        mood_sync.export_changes(laptop, delta)
+        mood_sync.apply_delta(desktop, delta)
+        assert gone[1] not in live_entries(desktop).values()
+        assert desktop.stats_summary()['total_entries'] == desktop.count()
+        print("✓ Purged entries are removed from the other journal")
+
+        # A delta that skips changes from its device is refused
+        laptop.add_entry("Never synced")
+        mood_sync.export_changes(laptop, delta)
+        laptop.add_entry("Synced")
+        mood_sync.export_changes(laptop, delta)
+        with pytest.raises(ValueError):
+            mood_sync.apply_delta(desktop, delta)
+        mood_sync.export_changes(laptop, delta, since=0)
+        mood_sync.apply_delta(desktop, delta)
+        assert live_entries(desktop) == live_entries(laptop)
+        print("✓ Missing deltas are detected and a full export recovers")
+
+
+def test_three_computers_keep_an_export_position_each():
+    """Test that deltas exported per destination reach every computer"""
+    print("\nTesting sync between three computers...")
+    with tempfile.TemporaryDirectory() as tmp_dir, MoodRepository.temporary() as laptop, \
+            MoodRepository.temporary() as desktop, MoodRepository.temporary() as phone:
+        delta = os.path.join(tmp_dir, "changes.delta")
+        computers = {'laptop': laptop, 'desktop': desktop, 'phone': phone}
+        for round_ in range(3):
+            for name, repo in computers.items():
+                repo.add_entry(f"Round {round_} on the {name}")
+                for other, target in computers.items():
+                    if other != name:
+                        mood_sync.export_changes(repo, delta, to=other)
+                        mood_sync.apply_delta(target, delta)
+        assert live_entries(laptop) == live_entries(desktop) == live_entries(phone)
+        assert laptop.count() == 9
+        print("✓ Every computer converges with an export position per destination")
+
+        # A single position skips what the phone never received
+        laptop.add_entry("Only for the desktop")
+        mood_sync.export_changes(laptop, delta)
+        mood_sync.apply_delta(desktop, delta)
+        laptop.add_entry("For both")
+        mood_sync.export_changes(laptop, delta)
+        with pytest.raises(ValueError):
+            mood_sync.apply_delta(phone, delta)
+        mood_sync.export_changes(laptop, delta, to='phone')
+        mood_sync.apply_delta(phone, delta)
+        assert live_entries(phone) == live_entries(laptop)
+        print("✓ Without a destination a third computer is refused, with one it catches up")
+
+
+def test_conflicts_resolve_the_same_way_everywhere():
+    """Test that the newest version wins regardless of the order deltas arrive in"""
+    print("\nTesting conflict resolution...")
+    uuid = "0" * 32
+    versions = [
+        (uuid, 100, "device-a", "First version", "2024-05-01 08:00:00", 1714550400, False),
+        (uuid, 200, "device-b", "Edited on b", "2024-05-01 08:00:00", 1714550400, False),
+        (uuid, 200, "device-c", "Edited on c at the same time", "2024-05-02 08:00:00",
+         1714636800, False),
+        (uuid, 150, "device-a", None, None, None, True),
+    ]
+    results = []
+    for order in (versions, versions[::-1], versions[1::2] + versions[::2]):
+        with MoodRepository.in_memory() as repo:
+            for version in order:
+                repo.apply_changes([version])
+            results.append(live_entries(repo))
+            # Rollups follow synced edits that move an entry to another day
+            assert [day for day, _, _ in repo.daily_stats("2024-05-01", "2024-05-31")] == \
+                ["2024-05-02"]
+    assert results == [{uuid: "Edited on c at the same time"}] * 3
+    print("✓ (changed_at, origin) picks the same winner in every order")
+
+    with MoodRepository.in_memory() as repo:
+        repo.apply_changes([versions[0]])
+        repo.delete_all()
+        edit = (uuid, tombstone_token() + 10 ** 6, "device-b") + versions[1][3:]
+        assert repo.apply_changes([edit]) == (1, 0)
+        assert live_entries(repo) == {uuid: "Edited on b"}
+        assert repo.stats_summary()['total_entries'] == 1
+    print("✓ A newer edit brings back an entry removed by Clear All")
+
+
+def test_sync_commands(capsys):
+    """Test the sync-export and sync-apply commands"""
+    print("\nTesting sync commands...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        laptop = os.path.join(tmp_dir, "laptop.db")
+        desktop = os.path.join(tmp_dir, "desktop.db")
+        delta = os.path.join(tmp_dir, "changes.delta")
+        assert mood_cli.main(["--db", laptop, "add", "from the laptop"]) == 0
+        assert mood_cli.main(["--db", laptop, "sync-export", delta]) == 0
+        assert mood_cli.main(["--db", desktop, "sync-apply", delta]) == 0
+        assert mood_cli.main(["--db", laptop, "sync-export", delta]) == 0
+        assert capsys.readouterr().out.splitlines()[-1].startswith("Exported 0 changes")
+        # A new destination starts with every change
+        assert mood_cli.main(["--db", laptop, "sync-export", "--to", "phone", delta]) == 0
+        assert capsys.readouterr().out.splitlines()[-1].startswith("Exported 1 changes")
+        assert mood_cli.main(["--db", desktop, "list"]) == 0
+        assert capsys.readouterr().out.strip().endswith(" - from the laptop")
+        with open(delta, 'w') as f:
+            f.write("mood_text,timestamp\n")
+        assert mood_cli.main(["--db", desktop, "sync-apply", delta]) == 1
+    print("✓ sync-export and sync-apply work")
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import mood_cli
+import mood_repository
+import mood_tags
+from mood_repository import MoodRepository, entry_key, period_range
+
+
+def entry_tags(repo):
+    """Return {mood_text: sorted tag names} of every entry in the index"""
+    rows = repo.conn.execute('''
+        SELECT m.mood_text, t.name FROM moods AS m
+        JOIN mood_tags AS mt ON mt.mood_id = m.id JOIN tags AS t ON t.id = mt.tag_id
+        ORDER BY t.name
+    ''')
+    tags = {}
+    for mood_text, name in rows:
+        tags.setdefault(mood_text, []).append(name)
+    return tags
+
+
+def test_hashtag_parsing():
+    """Test which words count as tags and how names are normalized"""
+    print("Testing hashtag parsing...")
+    extract = mood_tags.extract_tags
+    assert extract("#Work tired, #work again #self-care!") == ["self-care", "work"]
+    assert extract("#café #Straße") == ["café", "strasse"]
+    assert extract("Issue #12, C# and a#b, ##x or #-no") == []
+    assert extract("#" + "a" * mood_tags.MAX_TAG_LENGTH + " #" + "b" * 65) == [
+        "a" * mood_tags.MAX_TAG_LENGTH]
+    print("✓ Hashtags are found, case-folded and deduplicated; numbers and C# are not tags")
+
+    assert mood_tags.parse_filter("#work, Tired  #work") == ["tired", "work"]
+    assert mood_tags.parse_filter(" , #") == []
+    print("✓ Filter input takes tags with or without '#'")
+
+
+def test_tag_filter_pages_and_counts():
+    """Test tag counts and all/any filtered pages, with a period and across pages"""
+    print("\nTesting the tag filter...")
+    start = datetime(2024, 3, 1, 9)
+    with MoodRepository.in_memory() as repo:
+        for i in range(60):
+            text = f"Day {i} #work" if i % 2 == 0 else f"Day {i} #home"
+            if i % 3 == 0:
+                text += " #Tired"
+            repo.add_entry(text, start + timedelta(hours=i))
+        assert repo.tag_counts() == [("home", 30), ("work", 30), ("tired", 20)]
+        assert repo.tag_counts(limit=1) == [("home", 30)]
+        print("✓ Saved entries are tagged right away and counted per tag")
+
+        every = list(repo.iter_entries())
+        for tags, match_all in ((["work"], True), (["work", "tired"], True),
+                                (["work", "#Tired"], False), (["home", "missing"], False)):
+            names = {mood_tags.normalize(name.lstrip('#')) for name in tags}
+            check = all if match_all else any
+            expected = [entry for entry in every
+                        if check(name in mood_tags.extract_tags(entry[1]) for name in names)]
+            assert repo.count(tags=tags, match_all=match_all) == len(expected)
+            pages = [repo.newest_entries(7, tags=tags, match_all=match_all)]
+            while len(pages[-1]) == 7:
+                pages.append(repo.entries_before(pages[-1][-1], 7, tags=tags,
+                                                 match_all=match_all))
+            assert [entry for page in pages for entry in page] == expected
+            assert repo.entries_after(pages[1][0], 7, tags=tags, match_all=match_all) == pages[0]
+        assert repo.count(tags=["work", "missing"]) == 0
+        assert repo.newest_entries(7, tags=["missing"]) == []
+        print("✓ All and any filters page through the same entries as a scan")
+
+        within = period_range("2024-03-02")
+        day = [entry for entry in every if entry[2].startswith("2024-03-02")
+               and "#work" in entry[1]]
+        assert repo.count(within=within, tags=["work"]) == len(day) == 12
+        assert repo.newest_entries(50, within, ["work"]) == day
+        print("✓ Tags combine with a date period")
+
+        sql, params = mood_repository.tag_filter([1, 2], True, 0, 2 ** 40, '<', (2 ** 40, 0))
+        plan = repo.conn.execute("EXPLAIN QUERY PLAN " + mood_repository.TAGGED_SQL.format(
+            sql, 'DESC'), (*params, 10)).fetchall()
+        assert not any("TEMP B-TREE" in row[-1] for row in plan)
+        print("✓ Entries with all tags are read from the index in page order")
+
+
+def test_tag_counts_follow_deletes_and_archives(tmp_path):
+    """Test that counts follow deletes, undo, Clear All, purges and archiving"""
+    print("\nTesting tag counts...")
+    with MoodRepository(str(tmp_path / "moods.db")) as repo:
+        entries = [repo.add_entry(f"Entry {i} #{'gym' if i < 4 else 'rest'} #all",
+                                  datetime(2020 + i % 2, 6, 1, 9, i)) for i in range(8)]
+        counts = dict(repo.tag_counts())
+        assert counts == {"all": 8, "gym": 4, "rest": 4}
+
+        repo.delete_entries([entries[0][0], entries[5][0]], token=5)
+        assert dict(repo.tag_counts()) == {"all": 6, "gym": 3, "rest": 3}
+        assert entries[0] not in repo.newest_entries(10, tags=["gym"])
+        repo.restore_entries(5)
+        assert dict(repo.tag_counts()) == counts
+        repo.delete_all(token=7)
+        assert repo.tag_counts() == [] and repo.count(tags=["all"]) == 0
+        repo.restore_entries(7)
+        assert dict(repo.tag_counts()) == counts
+        print("✓ Deletes, undo and Clear All update the counts")
+
+        assert repo.archive_entries(int(datetime(2021, 1, 1).timestamp())) == 4
+        assert dict(repo.tag_counts()) == counts
+        assert repo.newest_entries(10, tags=["gym"]) == sorted(entries[:4], key=entry_key,
+                                                               reverse=True)
+        assert repo.count(tags=["gym", "all"], within=period_range("2020")) == 2
+        repo.delete_entries([entries[2][0]], token=9)
+        repo.purge_deleted(9)
+        assert dict(repo.tag_counts()) == {"all": 7, "gym": 3, "rest": 4}
+        assert repo.conn.execute(
+            "SELECT COUNT(*) FROM mood_tags WHERE mood_id = ?", (entries[2][0],)).fetchone() == (0,)
+        print("✓ Archived entries keep their tags, purged ones leave the index")
+
+
+def test_backfill_and_synced_edits(monkeypatch, tmp_path, capsys):
+    """Test that bulk inserts, parser updates and synced edits are tagged in batches"""
+    print("\nTesting tag backfill...")
+    path = str(tmp_path / "moods.db")
+    with MoodRepository(path) as repo:
+        repo.add_entries([(f"Run {i} #Outside", "2024-03-01 09:00:00", 1709280000 + i)
+                          for i in range(25)])
+        assert repo.tag_counts() == []
+        assert [repo.tag_entries(batch_size=10) for _ in range(4)] == [10, 10, 5, 0]
+        assert repo.tag_counts() == [("outside", 25)]
+        print("✓ Bulk inserts are tagged in batches and only once")
+
+        plan = repo.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM moods WHERE tags_version < 1")
+        assert any("idx_moods_tags_version" in row[-1] for row in plan)
+
+        monkeypatch.setattr(mood_tags, "TAGS_VERSION", mood_tags.TAGS_VERSION + 1)
+        assert repo.tag_entries() == 25
+        assert repo.tag_counts() == [("outside", 25)]
+        print("✓ A new parser version tags every entry again without double counting")
+
+        uuid = repo.conn.execute(
+            "SELECT uuid FROM moods WHERE mood_text = 'Run 0 #Outside'").fetchone()[0]
+        repo.apply_changes([(uuid, 2 ** 60, "other-device", "Rest day #inside",
+                             "2024-03-02 09:00:00", 1709366400, False)])
+        assert repo.tag_entries() == 1
+        assert entry_tags(repo)["Rest day #inside"] == ["inside"]
+        assert dict(repo.tag_counts()) == {"inside": 1, "outside": 24}
+        assert repo.newest_entries(1, tags=["inside"])[0][3] == 1709366400
+        print("✓ Entries edited by a sync are tagged again")
+
+    assert mood_cli.main(["--db", path, "tags", "--limit", "1"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "#outside: 24"
+    print("✓ The tags command lists the most used tags")
@@ -0,0 +1,95 @@
+import tkinter as tk
+
+from mood_theme import DARK_THEME, LIGHT_THEME, ThemeRegistry
+
+
+class FakeWidget:
+    """Stand-in for a tkinter widget that records configure() calls"""
+
+    def __init__(self, widget_class, children=(), destroyed=False):
+        self.widget_class = widget_class
+        self.children = list(children)
+        self.destroyed = destroyed
+        self.options = {}
+        self.configure_calls = 0
+        self.children_calls = 0
+
+    def winfo_class(self):
+        return self.widget_class
+
+    def winfo_children(self):
+        self.children_calls += 1
+        return self.children
+
+    def configure(self, **options):
+        if self.destroyed:
+            raise tk.TclError("invalid command name")
+        self.configure_calls += 1
+        self.options.update(options)
+
+    def bind(self, sequence, func, add=None):
+        pass
+
+
+def test_registered_widgets_follow_the_theme():
+    """Test that nested widgets are themed and restyled without walking the tree"""
+    print("Testing the theme registry...")
+    listbox = FakeWidget('Listbox')
+    deep_label = FakeWidget('Label')
+    nested = FakeWidget('Frame', [FakeWidget('Frame', [FakeWidget('Frame', [deep_label])])])
+    canvas = FakeWidget('Canvas')
+    root = FakeWidget('Tk', [nested, listbox, canvas])
+
+    registry = ThemeRegistry(LIGHT_THEME)
+    registry.register_tree(root)
+    assert len(registry) == 6
+    assert deep_label.options == {'bg': LIGHT_THEME['bg'], 'fg': LIGHT_THEME['fg']}
+    assert listbox.options['selectbackground'] == LIGHT_THEME['highlight_bg']
+    assert canvas.options == {}
+    print("✓ Registering a tree themes widgets at any depth")
+
+    walks = root.children_calls
+    registry.apply(DARK_THEME)
+    assert root.children_calls == walks
+    assert deep_label.options['bg'] == DARK_THEME['bg']
+    assert root.options == {'bg': DARK_THEME['bg']}
+    assert all(widget.configure_calls == 2 for widget in (root, nested, listbox, deep_label))
+    print("✓ Switching themes restyles each widget once without walking the tree")
+
+    # Panels registered later get the current theme right away
+    panel = registry.register(FakeWidget('Button'))
+    assert panel.options['bg'] == DARK_THEME['button_bg']
+
+    # Widgets destroyed without a Destroy event are dropped on the next restyle
+    panel.destroyed = True
+    registry.unregister(listbox)
+    registry.apply(LIGHT_THEME)
+    assert len(registry) == 5
+    assert listbox.options['bg'] == DARK_THEME['listbox_bg']
+    print("✓ Unregistered and destroyed widgets are no longer themed")
+
+
+class FakeStyle:
+    """Stand-in for ttk.Style that records configured options"""
+
+    def __init__(self):
+        self.options = {}
+        self.maps = {}
+
+    def configure(self, style, **options):
+        self.options.setdefault(style, {}).update(options)
+
+    def map(self, style, **options):
+        self.maps.setdefault(style, {}).update(options)
+
+
+def test_ttk_styles_follow_the_theme():
+    """Test that ttk widgets are themed through their style"""
+    print("\nTesting ttk styles...")
+    style = FakeStyle()
+    registry = ThemeRegistry(LIGHT_THEME, ttk_style=style)
+    assert style.options['Treeview']['fieldbackground'] == LIGHT_THEME['listbox_bg']
+    registry.apply(DARK_THEME)
+    assert style.options['Treeview']['foreground'] == DARK_THEME['listbox_fg']
+    assert style.maps['Treeview']['background'] == [('selected', DARK_THEME['highlight_bg'])]
+    print("✓ Treeview style switched with the theme")
@@ -3,6 +3,8 @@ from datetime import datetime
 import json
 import os
 
+from mood_repository import MoodRepository
+
 def test_theme_and_word_wrap_config():
     """Test the configuration saving and loading for theme and word wrap settings"""
     print("Testing theme and word wrap configuration...")
@@ -55,30 +57,16 @@ def test_database_with_longer_entries():
     """Test the database functionality with longer text entries that would require word wrap"""
     print("\nTesting database with longer text entries...")
     
-    # Connect to the database
+    # Connect to a throwaway database; the schema is created on open
     try:
-        conn = sqlite3.connect('mood_tracker.db')
+        repo = MoodRepository.temporary()
+        conn = repo.conn
         cursor = conn.cursor()
-        print("✓ Database connection successful")
+        print("✓ Database connection and table creation successful")
     except sqlite3.Error as e:
         print(f"✗ Database connection failed: {e}")
         return False
     
-    # Create table if it doesn't exist
-    try:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS moods (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                mood_text TEXT NOT NULL,
-                timestamp TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        print("✓ Table creation successful")
-    except sqlite3.Error as e:
-        print(f"✗ Table creation failed: {e}")
-        return False
-    
     # Insert a test mood entry with longer text
     try:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -122,7 +110,7 @@ def test_database_with_longer_entries():
         return False
     
     # Close the connection
-    conn.close()
+    repo.close()
     print("✓ Database connection closed")
     
     print("All database tests with longer entries passed successfully!")
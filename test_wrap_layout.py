@@ -0,0 +1,51 @@
+from wrap_layout import WrapLayout, wrap_text
+
+
+class FakeFont:
+    """Stand-in for tkinter.font.Font with a fixed 8 pixel character width"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def measure(self, text):
+        self.calls += 1
+        return 8 * len(text)
+
+
+def test_wrap_text_respects_pixel_width():
+    """Test that wrapped lines never exceed the available width"""
+    print("Testing pixel based word wrap...")
+    font = FakeFont()
+    text = ("This is a longer mood entry that would require word wrapping to display properly. "
+            "I'm feeling a mix of emotions today.")
+    lines = wrap_text(text, 200, font.measure)
+
+    assert len(lines) > 1
+    assert " ".join(lines) == " ".join(text.split())
+    for line in lines:
+        assert font.measure(line) <= 200
+    print(f"✓ Wrapped into {len(lines)} lines within 200 pixels")
+
+    # A single word wider than the line is kept whole
+    assert wrap_text("supercalifragilistic", 40, font.measure) == ["supercalifragilistic"]
+    print("✓ Over-long words are kept on their own line")
+
+
+def test_wrap_layout_cache():
+    """Test that layouts are memoized per (entry id, width) and bounded"""
+    print("\nTesting wrap layout cache...")
+    font = FakeFont()
+    layout = WrapLayout(font, max_cached_entries=2)
+    text = "feeling good about the week ahead"
+
+    first = layout.wrap(1, text, 100)
+    calls = font.calls
+    assert layout.wrap(1, text, 100) == first
+    assert font.calls == calls
+    print("✓ Repeated layout served from cache")
+
+    assert layout.wrap(1, text, 400) != first
+    layout.wrap(2, text, 100)
+    assert (1, 100) not in layout._lines
+    assert len(layout._lines) == 2
+    print("✓ Least recently used layout evicted")
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+
+
+def wrap_text(text, width, measure):
+    """Greedily wrap text into lines no wider than width pixels.
+
+    measure is called with a string and returns its width in pixels, e.g.
+    tkinter.font.Font.measure. Words wider than a whole line are kept on a
+    line of their own rather than being split.
+    """
+    space_width = measure(" ")
+    lines = []
+    current_line = ""
+    current_width = 0
+
+    for word in text.split():
+        word_width = measure(word)
+        if not current_line:
+            current_line, current_width = word, word_width
+        elif current_width + space_width + word_width <= width:
+            current_line += " " + word
+            current_width += space_width + word_width
+        else:
+            lines.append(current_line)
+            current_line, current_width = word, word_width
+
+    if current_line:
+        lines.append(current_line)
+    return lines or [""]
+
+
+class WrapLayout:
+    """Font-aware word wrap with a bounded LRU cache of wrapped lines"""
+
+    def __init__(self, font, max_cached_entries=4096, max_cached_words=20000):
+        self.font = font
+        self.max_cached_entries = max_cached_entries
+        self.max_cached_words = max_cached_words
+        self._lines = OrderedDict()
+        self._word_widths = {}
+
+    def measure(self, text):
+        """Return the pixel width of text, remembering widths of single words"""
+        width = self._word_widths.get(text)
+        if width is None:
+            if len(self._word_widths) >= self.max_cached_words:
+                self._word_widths.clear()
+            width = self._word_widths[text] = self.font.measure(text)
+        return width
+
+    def wrap(self, key, text, width):
+        """Return the wrapped lines for text, memoized per (key, width)"""
+        cache_key = (key, width)
+        lines = self._lines.get(cache_key)
+        if lines is not None:
+            self._lines.move_to_end(cache_key)
+            return lines
+
+        lines = tuple(wrap_text(text, width, self.measure))
+        self._lines[cache_key] = lines
+        if len(self._lines) > self.max_cached_entries:
+            self._lines.popitem(last=False)
+        return lines
+
+    def clear(self):
+        """Drop all cached layouts, e.g. after the font changes"""
+        self._lines.clear()
+        self._word_widths.clear()